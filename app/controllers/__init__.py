@@ -19,3 +19,8 @@ from .reporte_crud import *
 from .tipo_factura_crud import *
 from .tipo_ingreso_crud import *
 from .tipo_pago_crud import *
+from .checkout_crud import *
+from .impresion_crud import *
+from .ventas_diarias_crud import *
+from .archivo_productos_crud import *
+from .movimientos_inventario_crud import *
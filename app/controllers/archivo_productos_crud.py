@@ -0,0 +1,432 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import csv
+import os
+
+from app.database.dinero import a_centavos, desde_centavos
+from app.models.productos import Productos, Marcas, Categorias
+from app.controllers.producto_crud import MARGEN_REVENTA, calcular_precio, catalogo
+from app.controllers.movimientos_inventario_crud import conciliar_inventario
+
+# Importación y exportación del catálogo de productos en CSV o XLSX. Los
+# archivos se leen y se escriben fila por fila (nunca se cargan completos en
+# memoria) y los productos se guardan por lotes: un INSERT ... ON CONFLICT
+# (executemany) y una transacción por lote.
+
+# Columnas del archivo, en el orden en que se exportan
+COLUMNAS_ARCHIVO = [
+    "Codigo",
+    "Nombre",
+    "Marca",
+    "Categoria",
+    "Precio_costo",
+    "Precio_venta_normal",
+    "Precio_venta_mayor",
+    "Precio_venta_reventa",
+    "Stock_actual",
+    "Stock_min",
+    "Stock_max",
+]
+COLUMNAS_OBLIGATORIAS = ("Codigo", "Nombre", "Precio_costo", "Precio_venta_normal", "Precio_venta_mayor")
+COLUMNAS_STOCK = ("Stock_actual", "Stock_min", "Stock_max")
+
+# Valores de los productos nuevos cuando el archivo no los trae (los mismos
+# del formulario de productos)
+MARCA_PREDETERMINADA = "Predeterminado"
+CATEGORIA_PREDETERMINADA = "Predeterminado"
+STOCK_PREDETERMINADO = {"Stock_actual": 0, "Stock_min": 3, "Stock_max": 99}
+
+TAMANO_LOTE = int(os.getenv("SYSTOCK_IMPORTACION_LOTE", 500))
+
+
+def _normalizar_columna(nombre):
+    return str(nombre or "").strip().lower().replace(" ", "_")
+
+
+def _texto(valor):
+    return "" if valor is None else str(valor).strip()
+
+
+def _entero(valor, columna):
+    texto = _texto(valor)
+    try:
+        numero = float(texto)
+    except ValueError:
+        raise ValueError(f"{columna} no es un número: {texto!r}")
+    if not numero.is_integer() or numero < 0:
+        raise ValueError(f"{columna} debe ser un entero positivo: {texto!r}")
+    return int(numero)
+
+
+def _monto(valor, columna):
+    centavos = a_centavos(valor if isinstance(valor, (int, float)) else _texto(valor))
+    if centavos is None:
+        raise ValueError(f"Falta {columna}")
+    if centavos < 0:
+        raise ValueError(f"{columna} no puede ser negativo")
+    return desde_centavos(centavos)
+
+
+def _leer_csv(ruta):
+    """Genera (número de fila, valores) de un CSV; detecta ',' o ';'."""
+    tamano = os.path.getsize(ruta) or 1
+    with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+        muestra = archivo.read(8192)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+
+        leidos = 0
+
+        def lineas():
+            nonlocal leidos
+            for linea in archivo:
+                leidos += len(linea)
+                yield linea
+
+        for numero, valores in enumerate(csv.reader(lineas(), dialecto), start=1):
+            yield numero, valores, min(leidos / tamano, 1)
+
+
+def _leer_xlsx(ruta):
+    """Genera (número de fila, valores) de la primera hoja de un XLSX."""
+    from openpyxl import load_workbook  # Solo se necesita para archivos .xlsx
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = hoja.max_row or 0
+        for numero, valores in enumerate(hoja.iter_rows(values_only=True), start=1):
+            yield numero, list(valores), numero / total if total else 0
+    finally:
+        libro.close()
+
+
+def leer_archivo_productos(ruta):
+    """
+    Lee un archivo de productos (CSV o XLSX) fila por fila.
+    :param ruta: Ruta del archivo.
+    :return: Generador de (número de fila, diccionario {columna: valor}, avance
+        entre 0 y 1). Las filas vacías se omiten.
+    """
+    lector = _leer_xlsx if str(ruta).lower().endswith(".xlsx") else _leer_csv
+    filas = lector(ruta)
+
+    encabezado = None
+    for numero, valores, avance in filas:
+        if encabezado is None:
+            columnas = {_normalizar_columna(c): c for c in COLUMNAS_ARCHIVO}
+            encabezado = [columnas.get(_normalizar_columna(valor)) for valor in valores]
+            faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in encabezado]
+            if faltantes:
+                raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+            continue
+        if not any(_texto(valor) for valor in valores):
+            continue
+        fila = {
+            columna: valor
+            for columna, valor in zip(encabezado, valores)
+            if columna is not None
+        }
+        yield numero, fila, avance
+
+    if encabezado is None:
+        raise ValueError("El archivo está vacío.")
+
+
+def validar_fila_producto(fila):
+    """
+    Convierte una fila del archivo en los valores de un producto.
+    :param fila: Diccionario {columna: valor} leído del archivo.
+    :return: Diccionario con los valores del producto y los nombres de marca
+        y categoría.
+    :raises ValueError: Si falta un dato o tiene un formato no válido.
+    """
+    codigo = _entero(fila.get("Codigo"), "Codigo")
+    nombre = _texto(fila.get("Nombre"))
+    if not nombre:
+        raise ValueError("Falta el nombre")
+
+    precio_costo = _monto(fila.get("Precio_costo"), "Precio_costo")
+    precio_venta_normal = _monto(fila.get("Precio_venta_normal"), "Precio_venta_normal")
+    precio_venta_mayor = _monto(fila.get("Precio_venta_mayor"), "Precio_venta_mayor")
+    if _texto(fila.get("Precio_venta_reventa")):
+        precio_venta_reventa = _monto(fila.get("Precio_venta_reventa"), "Precio_venta_reventa")
+    else:
+        precio_venta_reventa = calcular_precio(precio_costo, MARGEN_REVENTA)
+
+    producto = {
+        "ID_Producto": codigo,
+        "Nombre": nombre,
+        "Marca": _texto(fila.get("Marca")) or MARCA_PREDETERMINADA,
+        "Categoria": _texto(fila.get("Categoria")) or CATEGORIA_PREDETERMINADA,
+        "Precio_costo": precio_costo,
+        "Precio_venta_normal": precio_venta_normal,
+        "Precio_venta_mayor": precio_venta_mayor,
+        "Precio_venta_reventa": precio_venta_reventa,
+        "Ganancia_Producto_normal": desde_centavos(a_centavos(precio_venta_normal) - a_centavos(precio_costo)),
+        "Ganancia_Producto_mayor": desde_centavos(a_centavos(precio_venta_mayor) - a_centavos(precio_costo)),
+        "Ganancia_Producto_reventa": desde_centavos(a_centavos(precio_venta_reventa) - a_centavos(precio_costo)),
+    }
+    for columna in COLUMNAS_STOCK:
+        if _texto(fila.get(columna)):
+            producto[columna] = _entero(fila.get(columna), columna)
+        else:
+            producto[columna] = STOCK_PREDETERMINADO[columna]
+    producto["Estado"] = producto["Stock_actual"] > 0
+    return producto
+
+
+class MapaNombres:
+    """
+    Nombres de marcas o categorías con su ID, cargados una sola vez. Los
+    nombres nuevos se insertan juntos al guardar cada lote.
+    """
+
+    def __init__(self, db: Session, modelo, columna_id):
+        self.modelo = modelo
+        self.columna_id = columna_id
+        self._sin_confirmar = set()
+        self.ids = {
+            nombre.strip().lower(): id_
+            for id_, nombre in db.query(columna_id, modelo.Nombre).order_by(columna_id.desc())
+        }
+
+    def resolver(self, db: Session, nombres):
+        """
+        Devuelve {nombre: ID}, creando en un solo INSERT los que no existen.
+        """
+        nuevos = {}
+        for nombre in nombres:
+            if nombre.lower() not in self.ids:
+                nuevos.setdefault(nombre.lower(), nombre)
+        if nuevos:
+            db.execute(insert(self.modelo), [{"Nombre": nombre} for nombre in nuevos.values()])
+            creados = db.query(self.columna_id, self.modelo.Nombre).filter(
+                self.modelo.Nombre.in_(list(nuevos.values()))
+            )
+            for id_, nombre in creados:
+                if nombre.strip().lower() not in self.ids:
+                    self.ids[nombre.strip().lower()] = id_
+                    self._sin_confirmar.add(nombre.strip().lower())
+        return {nombre: self.ids[nombre.lower()] for nombre in nombres}
+
+    def confirmar(self):
+        self._sin_confirmar.clear()
+
+    def descartar(self):
+        """Olvida los nombres creados en una transacción que se revirtió."""
+        for nombre in self._sin_confirmar:
+            self.ids.pop(nombre, None)
+        self._sin_confirmar.clear()
+
+
+def _consulta_guardar_productos(columnas_archivo):
+    """
+    INSERT ... ON CONFLICT de PRODUCTOS. En los productos existentes solo
+    se actualizan las columnas que trae el archivo.
+    """
+    tabla = Productos.__table__
+    consulta = sqlite_insert(tabla)
+    excluido = consulta.excluded
+    columnas = [
+        "Nombre",
+        "Precio_costo",
+        "Precio_venta_normal",
+        "Precio_venta_mayor",
+        "Ganancia_Producto_normal",
+        "Ganancia_Producto_mayor",
+    ]
+    if "Precio_venta_reventa" in columnas_archivo:
+        columnas += ["Precio_venta_reventa", "Ganancia_Producto_reventa"]
+    if "Marca" in columnas_archivo:
+        columnas.append("ID_Marca")
+    if "Categoria" in columnas_archivo:
+        columnas.append("ID_Categoria")
+    columnas += [columna for columna in COLUMNAS_STOCK if columna in columnas_archivo]
+    if "Stock_actual" in columnas_archivo:
+        columnas.append("Estado")
+
+    valores = {columna: excluido[columna] for columna in columnas}
+    if "Precio_venta_reventa" not in columnas_archivo:
+        # Se conserva el precio de reventa; su ganancia sigue al nuevo costo
+        valores["Ganancia_Producto_reventa"] = tabla.c.Precio_venta_reventa - excluido.Precio_costo
+    return consulta.on_conflict_do_update(index_elements=["ID_Producto"], set_=valores)
+
+
+def _guardar_lote(db: Session, lote, marcas, categorias, consulta):
+    """Guarda un lote de productos validados sin confirmar la transacción."""
+    ids_marca = marcas.resolver(db, {producto["Marca"] for _, producto in lote})
+    ids_categoria = categorias.resolver(db, {producto["Categoria"] for _, producto in lote})
+    codigos = [producto["ID_Producto"] for _, producto in lote]
+    existentes = {
+        id_producto
+        for (id_producto,) in db.query(Productos.ID_Producto).filter(Productos.ID_Producto.in_(codigos))
+    }
+
+    filas = []
+    for _, producto in lote:
+        fila = {
+            columna: valor
+            for columna, valor in producto.items()
+            if columna not in ("Marca", "Categoria")
+        }
+        fila["ID_Marca"] = ids_marca[producto["Marca"]]
+        fila["ID_Categoria"] = ids_categoria[producto["Categoria"]]
+        filas.append(fila)
+    db.execute(consulta, filas)
+    # El stock cargado desde el archivo queda en el kardex
+    conciliar_inventario(db, "Importacion", codigos)
+
+    nuevos = len(set(codigos) - existentes)
+    return nuevos, len(set(codigos)) - nuevos
+
+
+# Importar productos desde un archivo
+def importar_productos(db: Session, ruta, tamano_lote: int = TAMANO_LOTE, informar=None):
+    """
+    Importa (crea o actualiza) productos desde un CSV o XLSX. Las marcas y
+    categorías que no existen se crean. Cada lote se guarda en su propia
+    transacción; si un lote falla se reintenta fila por fila para rechazar
+    solo las filas con error.
+
+    Columnas: Codigo, Nombre, Precio_costo, Precio_venta_normal y
+    Precio_venta_mayor son obligatorias; Marca, Categoria,
+    Precio_venta_reventa, Stock_actual, Stock_min y Stock_max son opcionales.
+    En los productos existentes las columnas que el archivo no trae no se
+    modifican; en los nuevos toman los valores del formulario de productos.
+
+    :param db: Sesión de base de datos.
+    :param ruta: Ruta del archivo (.csv o .xlsx).
+    :param tamano_lote: Filas por transacción.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Diccionario con creados, actualizados y rechazados (lista de
+        tuplas (número de fila, motivo)).
+    """
+    marcas = MapaNombres(db, Marcas, Marcas.ID_Marca)
+    categorias = MapaNombres(db, Categorias, Categorias.ID_Categoria)
+    resultado = {"creados": 0, "actualizados": 0, "rechazados": []}
+    consulta = None
+    lote = []
+
+    def guardar(lote):
+        try:
+            creados, actualizados = _guardar_lote(db, lote, marcas, categorias, consulta)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            marcas.descartar()
+            categorias.descartar()
+            if len(lote) == 1:
+                resultado["rechazados"].append((lote[0][0], str(e)))
+                return
+            # Separar las filas que fallan del resto del lote
+            for fila in lote:
+                guardar([fila])
+            return
+        marcas.confirmar()
+        categorias.confirmar()
+        resultado["creados"] += creados
+        resultado["actualizados"] += actualizados
+
+    try:
+        for numero, fila, avance in leer_archivo_productos(ruta):
+            if consulta is None:
+                consulta = _consulta_guardar_productos(fila.keys())
+            try:
+                lote.append((numero, validar_fila_producto(fila)))
+            except ValueError as e:
+                resultado["rechazados"].append((numero, str(e)))
+                continue
+
+            if len(lote) >= tamano_lote:
+                guardar(lote)
+                lote = []
+                if informar:
+                    informar(avance * 100, f"Importando fila {numero}")
+        if lote:
+            guardar(lote)
+    finally:
+        # Los productos se escribieron sin el ORM: también se recarga el
+        # índice de autocompletado
+        catalogo.recargar()
+
+    return resultado
+
+
+def _filas_productos(db: Session, tamano_lote):
+    """Productos con marca y categoría, leídos por bloques del cursor."""
+    consulta = (
+        select(
+            Productos.ID_Producto,
+            Productos.Nombre,
+            Marcas.Nombre,
+            Categorias.Nombre,
+            Productos.Precio_costo,
+            Productos.Precio_venta_normal,
+            Productos.Precio_venta_mayor,
+            Productos.Precio_venta_reventa,
+            Productos.Stock_actual,
+            Productos.Stock_min,
+            Productos.Stock_max,
+        )
+        .outerjoin(Marcas, Marcas.ID_Marca == Productos.ID_Marca)
+        .outerjoin(Categorias, Categorias.ID_Categoria == Productos.ID_Categoria)
+        .order_by(Productos.ID_Producto)
+        .execution_options(yield_per=tamano_lote)
+    )
+    return db.execute(consulta)
+
+
+# Exportar el catálogo de productos a un archivo
+def exportar_productos(db: Session, ruta, tamano_lote: int = TAMANO_LOTE, informar=None):
+    """
+    Exporta todos los productos a un CSV o XLSX (según la extensión) con las
+    mismas columnas que acepta importar_productos. Las filas se leen y se
+    escriben por bloques; el archivo se escribe con otro nombre y se
+    renombra al terminar.
+    :param db: Sesión de base de datos.
+    :param ruta: Ruta del archivo (.csv o .xlsx).
+    :param tamano_lote: Filas leídas por bloque.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Diccionario con la ruta y la cantidad de productos exportados.
+    """
+    ruta = str(ruta)
+    es_xlsx = ruta.lower().endswith(".xlsx")
+    temporal = ruta + ".tmp"
+    total = db.query(func.count(Productos.ID_Producto)).scalar() or 1
+    exportados = 0
+
+    try:
+        if es_xlsx:
+            from openpyxl import Workbook  # Solo se necesita para archivos .xlsx
+
+            libro = Workbook(write_only=True)
+            hoja = libro.create_sheet("Productos")
+            escribir = hoja.append
+        else:
+            archivo = open(temporal, "w", newline="", encoding="utf-8-sig")
+            escribir = csv.writer(archivo).writerow
+
+        try:
+            escribir(COLUMNAS_ARCHIVO)
+            for fila in _filas_productos(db, tamano_lote):
+                escribir(list(fila))
+                exportados += 1
+                if informar and exportados % tamano_lote == 0:
+                    informar(exportados * 95 / total, f"Exportando {exportados} productos")
+        finally:
+            if not es_xlsx:
+                archivo.close()
+        if es_xlsx:
+            libro.save(temporal)
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    return {"ruta": ruta, "productos": exportados}
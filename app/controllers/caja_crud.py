@@ -1,9 +1,22 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, event, func, inspect, update
 from datetime import datetime
 
-from app.models.caja import Caja
+from app.models.caja import Caja, get_local_time
 from app.models.usuarios import Usuarios
+from app.models.egresos import Egresos
+from app.models.facturas import Facturas, MetodoPago
+from app.models.ingresos import Ingresos
+from app.models.pago_credito import PagoCredito
+from app.models.tipo_ingresos import TipoIngreso
+from app.controllers.ingresos_crud import obtener_ingresos
+from app.controllers.movimientos_inventario_crud import registrar_saldos_inventario
+
+# Los totales de la caja abierta (Monto_Efectivo, Monto_Transaccion y
+# Monto_Final_calculado) se llevan al día en la misma transacción que guarda
+# cada venta, abono o egreso; la pantalla de caja y el cierre los leen
+# directamente. Una caja con totales en NULL (abierta antes de este cambio)
+# se concilia contra los ingresos y egresos la primera vez que se consulta.
 
 
 # Crear una nueva caja
@@ -12,9 +25,9 @@ def crear_caja(
     monto_base: float,
     estado: bool,
     id_usuario: int,
-    monto_efectivo: float =None,
-    monto_transaccion: float=None,
-    monto_final_calculado: float = None,
+    monto_efectivo: float = 0.0,
+    monto_transaccion: float = 0.0,
+    monto_final_calculado: float = 0.0,
     fecha_cierre: datetime = None,
 ):
     """
@@ -185,3 +198,290 @@ def eliminar_caja(db: Session, id_caja: int):
     db.delete(caja_existente)
     db.commit()
     return True
+
+
+def repartir_monto(monto, metodo_pago: str):
+    """
+    Reparte el monto de un abono o egreso entre efectivo y transacción.
+    :param monto: Monto del movimiento.
+    :param metodo_pago: Nombre del método de pago.
+    :return: Tupla (efectivo, transaccion).
+    """
+    monto = float(monto or 0)
+    return (monto, 0.0) if metodo_pago == "Efectivo" else (0.0, monto)
+
+
+def sumar_a_caja_abierta(db: Session, efectivo: float = 0.0, transaccion: float = 0.0):
+    """
+    Suma montos (negativos para restar) a los totales de la caja abierta,
+    sin confirmar la transacción.
+    :param db: Sesión de base de datos.
+    :param efectivo: Monto en efectivo.
+    :param transaccion: Monto por transacción.
+    :return: Cantidad de cajas actualizadas (0 si no hay caja abierta).
+    """
+    if not efectivo and not transaccion:
+        return 0
+    caja = Caja.__table__
+    resultado = db.execute(
+        update(caja)
+        .where(caja.c.Estado == True)
+        .values(
+            Monto_Efectivo=caja.c.Monto_Efectivo + efectivo,
+            Monto_Transaccion=caja.c.Monto_Transaccion + transaccion,
+            Monto_Final_calculado=caja.c.Monto_Final_calculado + efectivo + transaccion,
+        )
+    )
+    return resultado.rowcount
+
+
+def _aporte_tipo_ingreso(db: Session, tipo: TipoIngreso, desde: datetime):
+    """Monto (efectivo, transaccion) de un ingreso si cae en el turno que empieza en `desde`."""
+    if tipo is None:
+        return 0.0, 0.0
+    if tipo.ID_Factura is not None:
+        fila = (
+            db.query(Facturas.Monto_efectivo, Facturas.Monto_TRANSACCION)
+            .filter(Facturas.ID_Factura == tipo.ID_Factura, Facturas.Fecha_Factura >= desde)
+            .first()
+        )
+        return (float(fila[0] or 0), float(fila[1] or 0)) if fila else (0.0, 0.0)
+    if tipo.ID_Pago_Credito is not None:
+        fila = (
+            db.query(PagoCredito.Monto, MetodoPago.Nombre)
+            .outerjoin(MetodoPago, PagoCredito.ID_Metodo_Pago == MetodoPago.ID_Metodo_Pago)
+            .filter(
+                PagoCredito.ID_Pago_Credito == tipo.ID_Pago_Credito,
+                PagoCredito.Fecha_Registro >= desde,
+            )
+            .first()
+        )
+        return repartir_monto(fila[0], fila[1]) if fila else (0.0, 0.0)
+    return 0.0, 0.0
+
+
+def _factura_cobrada_en_turno(db: Session, id_factura: int, desde: datetime):
+    """Indica si la factura tiene un ingreso de venta dentro del turno."""
+    return (
+        db.query(Ingresos.ID_Ingreso)
+        .join(TipoIngreso, Ingresos.ID_Tipo_Ingreso == TipoIngreso.ID_Tipo_Ingreso)
+        .join(Facturas, TipoIngreso.ID_Factura == Facturas.ID_Factura)
+        .filter(Facturas.ID_Factura == id_factura, Facturas.Fecha_Factura >= desde)
+        .first()
+        is not None
+    )
+
+
+def _egreso_en_turno(db: Session, id_egreso: int, desde: datetime):
+    return (
+        db.query(Egresos.ID_Egreso)
+        .filter(Egresos.ID_Egreso == id_egreso, Egresos.Fecha_Egreso >= desde)
+        .first()
+        is not None
+    )
+
+
+def _valor_anterior(objeto, atributo):
+    """Valor del atributo antes de los cambios pendientes del ORM."""
+    historial = inspect(objeto).attrs[atributo].history
+    return historial.deleted[0] if historial.deleted else getattr(objeto, atributo)
+
+
+def _nombre_metodo_pago(db: Session, id_metodo_pago):
+    metodo = db.get(MetodoPago, id_metodo_pago) if id_metodo_pago is not None else None
+    return metodo.Nombre if metodo else None
+
+
+@event.listens_for(Session, "before_flush")
+def acumular_movimientos_caja(session, flush_context, instances):
+    """
+    Lleva a los totales de la caja abierta los ingresos y egresos que el ORM
+    va a escribir, y los cambios de monto de facturas ya cobradas en el turno.
+    """
+    objetos = [
+        objeto
+        for objeto in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(objeto, (Ingresos, Egresos, Facturas))
+    ]
+    if not objetos:
+        return
+
+    apertura = session.query(Caja.Fecha_Apertura).filter(Caja.Estado == True).scalar()
+    if apertura is None:
+        return
+
+    efectivo = transaccion = 0.0
+    for objeto in objetos:
+        nuevo = objeto in session.new
+        eliminado = objeto in session.deleted
+
+        if isinstance(objeto, Ingresos) and (nuevo or eliminado):
+            tipo = objeto.tipoingreso
+            if tipo is None and objeto.ID_Tipo_Ingreso is not None:
+                tipo = session.get(TipoIngreso, objeto.ID_Tipo_Ingreso)
+            signo = 1 if nuevo else -1
+            aporte_efectivo, aporte_transaccion = _aporte_tipo_ingreso(session, tipo, apertura)
+            efectivo += signo * aporte_efectivo
+            transaccion += signo * aporte_transaccion
+
+        elif isinstance(objeto, Egresos):
+            if nuevo:
+                antes = (0.0, 0.0)
+            elif not _egreso_en_turno(session, objeto.ID_Egreso, apertura):
+                continue
+            else:
+                antes = repartir_monto(
+                    _valor_anterior(objeto, "Monto_Egreso"),
+                    _nombre_metodo_pago(session, _valor_anterior(objeto, "ID_Metodo_Pago")),
+                )
+            despues = (0.0, 0.0) if eliminado else repartir_monto(
+                objeto.Monto_Egreso, _nombre_metodo_pago(session, objeto.ID_Metodo_Pago)
+            )
+            efectivo += antes[0] - despues[0]
+            transaccion += antes[1] - despues[1]
+
+        elif isinstance(objeto, Facturas) and not nuevo:
+            if not eliminado and not session.is_modified(objeto):
+                continue
+            if not _factura_cobrada_en_turno(session, objeto.ID_Factura, apertura):
+                continue
+            antes = (
+                float(_valor_anterior(objeto, "Monto_efectivo") or 0),
+                float(_valor_anterior(objeto, "Monto_TRANSACCION") or 0),
+            )
+            despues = (0.0, 0.0) if eliminado else (
+                float(objeto.Monto_efectivo or 0),
+                float(objeto.Monto_TRANSACCION or 0),
+            )
+            efectivo += despues[0] - antes[0]
+            transaccion += despues[1] - antes[1]
+
+    sumar_a_caja_abierta(session, efectivo, transaccion)
+
+
+# Recalcular los totales de una caja desde los ingresos y egresos
+def calcular_totales_caja(db: Session, caja: Caja):
+    """
+    Recalcula los totales de una caja recorriendo los ingresos y egresos de
+    su turno (entre la apertura y el cierre).
+    :param db: Sesión de base de datos.
+    :param caja: Objeto Caja.
+    :return: Tupla (efectivo, transaccion).
+    """
+    efectivo = transaccion = 0.0
+    for ingreso in obtener_ingresos(db, caja.Fecha_Apertura, caja.Fecha_Cierre):
+        if ingreso.tipo_ingreso == "Venta":
+            efectivo += float(ingreso.monto_efectivo or 0)
+            transaccion += float(ingreso.monto_transaccion or 0)
+        else:
+            aporte = repartir_monto(ingreso.monto, ingreso.metodo_pago)
+            efectivo += aporte[0]
+            transaccion += aporte[1]
+
+    egresos = (
+        db.query(MetodoPago.Nombre, func.sum(Egresos.Monto_Egreso))
+        .outerjoin(MetodoPago, Egresos.ID_Metodo_Pago == MetodoPago.ID_Metodo_Pago)
+        .filter(Egresos.Fecha_Egreso >= caja.Fecha_Apertura)
+    )
+    if caja.Fecha_Cierre:
+        egresos = egresos.filter(Egresos.Fecha_Egreso <= caja.Fecha_Cierre)
+    for metodo_pago, total in egresos.group_by(MetodoPago.Nombre).all():
+        aporte = repartir_monto(total, metodo_pago)
+        efectivo -= aporte[0]
+        transaccion -= aporte[1]
+
+    return efectivo, transaccion
+
+
+# Conciliar los totales guardados de una caja
+def conciliar_caja(db: Session, id_caja: int, corregir: bool = False):
+    """
+    Compara los totales guardados de una caja con los recalculados desde los
+    ingresos y egresos del turno.
+    :param db: Sesión de base de datos.
+    :param id_caja: ID de la caja.
+    :param corregir: Si es True guarda los totales recalculados.
+    :return: Diccionario con los totales guardados, los calculados y la
+        diferencia, o None si la caja no existe.
+    """
+    caja = db.query(Caja).filter(Caja.ID_Caja == id_caja).first()
+    if not caja:
+        return None
+
+    efectivo, transaccion = calcular_totales_caja(db, caja)
+    guardado = {
+        "efectivo": caja.Monto_Efectivo,
+        "transaccion": caja.Monto_Transaccion,
+    }
+    diferencia = {
+        "efectivo": round(efectivo - float(caja.Monto_Efectivo or 0), 2),
+        "transaccion": round(transaccion - float(caja.Monto_Transaccion or 0), 2),
+    }
+    cuadra = (
+        caja.Monto_Efectivo is not None
+        and caja.Monto_Transaccion is not None
+        and not diferencia["efectivo"]
+        and not diferencia["transaccion"]
+    )
+
+    if corregir and not cuadra:
+        caja.Monto_Efectivo = efectivo
+        caja.Monto_Transaccion = transaccion
+        caja.Monto_Final_calculado = efectivo + transaccion
+        db.commit()
+
+    return {
+        "guardado": guardado,
+        "calculado": {"efectivo": efectivo, "transaccion": transaccion},
+        "diferencia": diferencia,
+        "cuadra": cuadra,
+    }
+
+
+# Obtener los totales de la caja abierta
+def obtener_totales_caja_abierta(db: Session):
+    """
+    Obtiene los totales acumulados de la caja abierta.
+    :param db: Sesión de base de datos.
+    :return: Diccionario con efectivo, transaccion y total, o None si no hay
+        caja abierta.
+    """
+    caja = buscar_caja_abierta(db)
+    if not caja:
+        return None
+    if caja.Monto_Efectivo is None or caja.Monto_Transaccion is None:
+        conciliar_caja(db, caja.ID_Caja, corregir=True)
+    efectivo = float(caja.Monto_Efectivo or 0)
+    transaccion = float(caja.Monto_Transaccion or 0)
+    return {
+        "id_caja": caja.ID_Caja,
+        "efectivo": efectivo,
+        "transaccion": transaccion,
+        "total": efectivo + transaccion,
+    }
+
+
+# Cerrar la caja abierta
+def cerrar_caja(db: Session, id_caja: int, fecha_cierre: datetime = None):
+    """
+    Cierra una caja con los totales acumulados durante el turno.
+    :param db: Sesión de base de datos.
+    :param id_caja: ID de la caja a cerrar.
+    :param fecha_cierre: Fecha de cierre (por defecto, la hora local actual).
+    :return: Objeto Caja cerrado o None si no existe o ya estaba cerrada.
+    """
+    caja = db.query(Caja).filter(Caja.ID_Caja == id_caja, Caja.Estado == True).first()
+    if not caja:
+        return None
+    if caja.Monto_Efectivo is None or caja.Monto_Transaccion is None:
+        conciliar_caja(db, caja.ID_Caja, corregir=True)
+
+    caja.Monto_Final_calculado = float(caja.Monto_Efectivo) + float(caja.Monto_Transaccion)
+    caja.Estado = False
+    # Misma hora local que la apertura, las facturas y los egresos del turno
+    caja.Fecha_Cierre = fecha_cierre or get_local_time()
+    # Punto de control del kardex por turno
+    registrar_saldos_inventario(db)
+    db.commit()
+    db.refresh(caja)
+    return caja
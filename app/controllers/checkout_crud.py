@@ -0,0 +1,437 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, delete, select, bindparam, case, func
+from datetime import datetime
+
+from app.database.dinero import sumar_montos
+from app.models.facturas import Facturas
+from app.models.detalle_facturas import DetalleFacturas
+from app.models.productos import Productos
+from app.models.tipo_ingresos import TipoIngreso
+from app.models.ingresos import Ingresos
+from app.models.venta_credito import VentaCredito
+from app.models.historial import HistorialModificacion
+from app.controllers.producto_crud import catalogo
+from app.controllers.detalle_factura_crud import calcular_ganancia_detalle
+from app.controllers.ventas_diarias_crud import recalcular_dias
+from app.controllers.movimientos_inventario_crud import (
+    mover_stock,
+    registrar_devolucion_facturas,
+)
+
+
+def agrupar_items(items):
+    """
+    Agrupa las líneas del carrito por producto.
+    :param items: Lista de tuplas (id_producto, cantidad, precio_unitario).
+    :return: Diccionario {id_producto: cantidad total}.
+    """
+    cantidades = {}
+    for id_producto, cantidad, _ in items:
+        id_producto = int(id_producto)
+        cantidades[id_producto] = cantidades.get(id_producto, 0) + int(cantidad)
+    return cantidades
+
+
+# Registrar una venta completa
+def registrar_venta(
+    db: Session,
+    items,
+    id_cliente,
+    id_usuario,
+    id_metodo_pago: int,
+    id_tipo_factura: int,
+    monto_efectivo: float,
+    monto_transaccion: float,
+    descuento: float = 0.0,
+    estado: bool = True,
+    domicilio: bool = False,
+    registrar_ingreso: bool = True,
+    total_deuda: float = None,
+    fecha_limite: datetime = None,
+):
+    """
+    Registra una venta completa en una sola transacción: factura, detalles
+    (con el costo de cada producto), descuento de stock, venta a crédito
+    (opcional), ingreso y resumen diario (solo si la venta se cobra).
+    Si algún producto no tiene stock suficiente se lanza StockInsuficiente
+    con el detalle de cada línea y no se registra nada.
+    :param db: Sesión de base de datos.
+    :param items: Lista de tuplas (id_producto, cantidad, precio_unitario).
+    :param id_cliente: ID del cliente.
+    :param id_usuario: ID del usuario que registra la venta.
+    :param id_metodo_pago: ID del método de pago.
+    :param id_tipo_factura: ID del tipo de factura (1: Detal, 2: Reventa, 3: Mayorista).
+    :param monto_efectivo: Monto pagado en efectivo.
+    :param monto_transaccion: Monto pagado mediante transacción.
+    :param descuento: Descuento aplicado.
+    :param estado: Estado de la factura (True: Pagada, False: Pendiente).
+    :param domicilio: Indica si la venta incluye domicilio.
+    :param registrar_ingreso: Si es True se registra el ingreso de la venta.
+    :param total_deuda: Total de la deuda si la venta es a crédito (opcional).
+    :param fecha_limite: Fecha límite de pago de la venta a crédito (opcional).
+    :return: ID de la factura creada.
+    """
+    if not items:
+        raise ValueError("La venta no tiene productos.")
+
+    cantidades = agrupar_items(items)
+
+    try:
+        factura = Facturas(
+            Monto_efectivo=monto_efectivo,
+            Monto_TRANSACCION=monto_transaccion,
+            Descuento=descuento,
+            Estado=estado,
+            ID_Metodo_Pago=id_metodo_pago,
+            ID_Tipo_Factura=id_tipo_factura,
+            ID_Cliente=id_cliente,
+            ID_Usuario=id_usuario,
+            Domicilio=domicilio,
+        )
+        db.add(factura)
+        db.flush()  # Obtener el ID sin confirmar la transacción
+        id_factura = factura.ID_Factura
+
+        # Descontar stock de todos los productos en un solo UPDATE
+        # condicional (executemany); sin stock suficiente no se registra nada
+        mover_stock(
+            db,
+            {id_producto: -cantidad for id_producto, cantidad in cantidades.items()},
+            "Venta",
+            id_factura,
+        )
+
+        # Costo de cada producto al momento de la venta
+        costos = dict(
+            db.query(Productos.ID_Producto, Productos.Precio_costo)
+            .filter(Productos.ID_Producto.in_(cantidades))
+            .all()
+        )
+
+        # Detalles de la factura en un solo INSERT (executemany)
+        detalles = []
+        for id_producto, cantidad, precio_unitario in items:
+            subtotal = int(cantidad) * precio_unitario
+            precio_costo = costos.get(int(id_producto))
+            detalles.append(
+                {
+                    "ID_Factura": id_factura,
+                    "ID_Producto": int(id_producto),
+                    "Cantidad": int(cantidad),
+                    "Precio_unitario": precio_unitario,
+                    "Subtotal": subtotal,
+                    "Precio_costo": precio_costo,
+                    "Ganancia": calcular_ganancia_detalle(cantidad, subtotal, precio_costo),
+                }
+            )
+        db.execute(insert(DetalleFacturas), detalles)
+
+        if total_deuda is not None:
+            db.add(
+                VentaCredito(
+                    Total_Deuda=total_deuda,
+                    Saldo_Pendiente=total_deuda,
+                    Fecha_Limite=fecha_limite,
+                    ID_Factura=id_factura,
+                )
+            )
+
+        if registrar_ingreso:
+            # El ingreso de venta suma la factura a VENTAS_DIARIAS (after_flush
+            # de ventas_diarias_crud); las pendientes y a crédito se suman
+            # cuando se registra su ingreso
+            tipo_ingreso = TipoIngreso(Tipo_Ingreso="Venta", ID_Factura=id_factura)
+            db.add(tipo_ingreso)
+            db.flush()
+            db.add(Ingresos(ID_Tipo_Ingreso=tipo_ingreso.ID_Tipo_Ingreso))
+
+        db.commit()
+        catalogo.invalidar(*cantidades)
+        return id_factura
+
+    except Exception:
+        db.rollback()
+        raise
+
+
+# Cancelar ventas pendientes devolviendo el stock
+def cancelar_ventas(db: Session, ids_factura):
+    """
+    Cancela facturas pendientes en una sola transacción: devuelve al stock
+    las cantidades vendidas con un único UPDATE ... FROM sobre el detalle,
+    elimina el detalle, el historial y las facturas, y recalcula el resumen
+    diario de los días afectados. Si alguna factura no se puede cancelar no
+    se modifica ninguna.
+    :param db: Sesión de base de datos.
+    :param ids_factura: IDs de las facturas a cancelar.
+    :return: Lista de IDs de los productos cuyo stock se devolvió.
+    """
+    ids_factura = sorted({int(id_factura) for id_factura in ids_factura})
+    if not ids_factura:
+        return []
+
+    try:
+        facturas = (
+            db.query(Facturas.ID_Factura, Facturas.Fecha_Factura, Facturas.Estado)
+            .filter(Facturas.ID_Factura.in_(ids_factura))
+            .all()
+        )
+        encontradas = {factura.ID_Factura for factura in facturas}
+        for id_factura in ids_factura:
+            if id_factura not in encontradas:
+                raise ValueError(f"La factura {id_factura} no existe.")
+        for factura in facturas:
+            if factura.Estado:
+                raise ValueError(f"La factura {factura.ID_Factura} ya está pagada.")
+        credito = (
+            db.query(VentaCredito.ID_Factura)
+            .filter(VentaCredito.ID_Factura.in_(ids_factura))
+            .first()
+        )
+        if credito:
+            raise ValueError(f"La factura {credito.ID_Factura} no es una factura de venta.")
+
+        # Cantidades vendidas por producto en todas las facturas
+        vendidos = (
+            select(
+                DetalleFacturas.ID_Producto,
+                func.sum(DetalleFacturas.Cantidad).label("Cantidad"),
+            )
+            .where(
+                DetalleFacturas.ID_Factura.in_(ids_factura),
+                DetalleFacturas.ID_Producto.isnot(None),
+            )
+            .group_by(DetalleFacturas.ID_Producto)
+            .subquery()
+        )
+        productos = Productos.__table__
+        ids_producto = db.execute(
+            update(productos)
+            .where(productos.c.ID_Producto == vendidos.c.ID_Producto)
+            .values(
+                Stock_actual=productos.c.Stock_actual + vendidos.c.Cantidad,
+                Estado=case(
+                    (productos.c.Stock_actual + vendidos.c.Cantidad > 0, True),
+                    else_=False,
+                ),
+            )
+            .returning(productos.c.ID_Producto)
+        ).scalars().all()
+
+        registrar_devolucion_facturas(db, ids_factura)
+
+        # Dependientes primero (las llaves foráneas están activas); la cola
+        # de impresión queda sin referencia por su ON DELETE SET NULL
+        for tabla in (DetalleFacturas, HistorialModificacion):
+            db.execute(
+                delete(tabla)
+                .where(tabla.ID_Factura.in_(ids_factura))
+                .execution_options(synchronize_session=False)
+            )
+        db.execute(
+            delete(Facturas)
+            .where(Facturas.ID_Factura.in_(ids_factura))
+            .execution_options(synchronize_session=False)
+        )
+
+        recalcular_dias(db, [factura.Fecha_Factura for factura in facturas])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.expire_all()
+    catalogo.invalidar(*ids_producto)
+    return ids_producto
+
+
+# Modificar una venta registrada
+def modificar_venta(
+    db: Session,
+    id_factura: int,
+    items,
+    id_usuario,
+    id_metodo_pago: int = None,
+    monto_efectivo: float = None,
+    monto_transaccion: float = None,
+    total_deuda: float = None,
+    fecha_limite: datetime = None,
+    descripcion: str = "Factura actualizada",
+):
+    """
+    Aplica a una factura el carrito editado en una sola transacción: compara
+    las líneas guardadas con las nuevas y ajusta el stock, actualiza, inserta
+    y elimina las líneas del detalle con una sentencia por tipo de cambio, y
+    registra el historial de modificación en la misma confirmación.
+    Las líneas que ya existían conservan su precio unitario; las nuevas usan
+    el precio del carrito.
+    :param db: Sesión de base de datos.
+    :param id_factura: ID de la factura.
+    :param items: Lista de tuplas (id_producto, cantidad, precio_unitario).
+    :param id_usuario: ID del usuario que modifica la factura.
+    :param id_metodo_pago: Nuevo ID del método de pago (opcional).
+    :param monto_efectivo: Nuevo monto pagado en efectivo (opcional).
+    :param monto_transaccion: Nuevo monto pagado por transacción (opcional).
+    :param total_deuda: Nueva deuda total si la venta es a crédito (opcional).
+    :param fecha_limite: Nueva fecha límite de pago del crédito (opcional).
+    :param descripcion: Descripción del historial de modificación.
+    :return: Diccionario con la cantidad de líneas agregadas, modificadas y
+        eliminadas.
+    """
+    if not items:
+        raise ValueError("La venta no tiene productos.")
+
+    cantidades = agrupar_items(items)
+    precios = {}
+    for id_producto, _, precio_unitario in items:
+        precios.setdefault(int(id_producto), precio_unitario)
+
+    try:
+        factura = db.get(Facturas, int(id_factura))
+        if factura is None:
+            raise ValueError(f"La factura {id_factura} no existe.")
+        id_factura = factura.ID_Factura
+
+        lineas = (
+            db.query(
+                DetalleFacturas.ID_Detalle_Factura,
+                DetalleFacturas.ID_Producto,
+                DetalleFacturas.Cantidad,
+                DetalleFacturas.Precio_unitario,
+                DetalleFacturas.Precio_costo,
+            )
+            .filter(
+                DetalleFacturas.ID_Factura == id_factura,
+                DetalleFacturas.ID_Producto.isnot(None),
+            )
+            .order_by(DetalleFacturas.ID_Detalle_Factura)
+            .all()
+        )
+
+        # Cantidades guardadas por producto; si un producto tiene varias
+        # líneas se conserva la primera con el total y se eliminan las demás
+        actuales = {}
+        conservadas = {}
+        eliminadas = []
+        for linea in lineas:
+            actuales[linea.ID_Producto] = actuales.get(linea.ID_Producto, 0) + int(linea.Cantidad)
+            if linea.ID_Producto in conservadas or linea.ID_Producto not in cantidades:
+                eliminadas.append(linea.ID_Detalle_Factura)
+            else:
+                conservadas[linea.ID_Producto] = linea
+
+        modificadas = []
+        for id_producto, linea in conservadas.items():
+            cantidad = cantidades[id_producto]
+            if cantidad == actuales[id_producto] and cantidad == int(linea.Cantidad):
+                continue
+            subtotal = cantidad * linea.Precio_unitario
+            modificadas.append(
+                {
+                    "b_id_detalle": linea.ID_Detalle_Factura,
+                    "b_cantidad": cantidad,
+                    "b_subtotal": subtotal,
+                    "b_ganancia": calcular_ganancia_detalle(cantidad, subtotal, linea.Precio_costo),
+                }
+            )
+
+        nuevos = [id_producto for id_producto in cantidades if id_producto not in conservadas]
+        costos = dict(
+            db.query(Productos.ID_Producto, Productos.Precio_costo)
+            .filter(Productos.ID_Producto.in_(nuevos))
+            .all()
+        ) if nuevos else {}
+        agregadas = []
+        for id_producto in nuevos:
+            cantidad = cantidades[id_producto]
+            subtotal = cantidad * precios[id_producto]
+            precio_costo = costos.get(id_producto)
+            agregadas.append(
+                {
+                    "ID_Factura": id_factura,
+                    "ID_Producto": id_producto,
+                    "Cantidad": cantidad,
+                    "Precio_unitario": precios[id_producto],
+                    "Subtotal": subtotal,
+                    "Precio_costo": precio_costo,
+                    "Ganancia": calcular_ganancia_detalle(cantidad, subtotal, precio_costo),
+                }
+            )
+
+        # Diferencia de stock por producto (positiva: se vende más)
+        diferencias = {
+            id_producto: diferencia
+            for id_producto in set(actuales) | set(cantidades)
+            if (diferencia := cantidades.get(id_producto, 0) - actuales.get(id_producto, 0))
+        }
+
+        detalles = DetalleFacturas.__table__
+        if eliminadas:
+            db.execute(delete(detalles).where(detalles.c.ID_Detalle_Factura.in_(eliminadas)))
+        if modificadas:
+            db.execute(
+                update(detalles)
+                .where(detalles.c.ID_Detalle_Factura == bindparam("b_id_detalle"))
+                .values(
+                    Cantidad=bindparam("b_cantidad"),
+                    Subtotal=bindparam("b_subtotal", type_=detalles.c.Subtotal.type),
+                    Ganancia=bindparam("b_ganancia", type_=detalles.c.Ganancia.type),
+                ),
+                modificadas,
+            )
+        if agregadas:
+            db.execute(insert(detalles), agregadas)
+
+        mover_stock(
+            db,
+            {id_producto: -diferencia for id_producto, diferencia in diferencias.items()},
+            "Edicion",
+            id_factura,
+        )
+
+        if total_deuda is not None:
+            venta_credito = (
+                db.query(VentaCredito).filter(VentaCredito.ID_Factura == id_factura).first()
+            )
+            if venta_credito is None:
+                raise ValueError(f"La factura {id_factura} no es una venta a crédito.")
+            pagado = sumar_montos([venta_credito.Total_Deuda, -venta_credito.Saldo_Pendiente])
+            saldo = sumar_montos([total_deuda, -pagado])
+            if saldo < 0:
+                raise ValueError("La nueva deuda es menor que lo ya abonado.")
+            venta_credito.Total_Deuda = total_deuda
+            venta_credito.Saldo_Pendiente = saldo
+            if fecha_limite is not None:
+                venta_credito.Fecha_Limite = fecha_limite
+
+        # La factura se modifica desde el ORM para que la caja y la caché de
+        # tickets registren el cambio
+        if id_metodo_pago is not None:
+            factura.ID_Metodo_Pago = id_metodo_pago
+        if monto_efectivo is not None:
+            factura.Monto_efectivo = monto_efectivo
+        if monto_transaccion is not None:
+            factura.Monto_TRANSACCION = monto_transaccion
+        factura.ID_Usuario = id_usuario
+        db.add(
+            HistorialModificacion(
+                Descripcion=descripcion, ID_Factura=id_factura, ID_Usuario=id_usuario
+            )
+        )
+        db.flush()
+
+        recalcular_dias(db, [factura.Fecha_Factura])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.expire_all()
+    catalogo.invalidar(*diferencias)
+    return {
+        "agregadas": len(agregadas),
+        "modificadas": len(modificadas),
+        "eliminadas": len(eliminadas),
+    }
@@ -1,5 +1,50 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select, update
+from app.database.dinero import a_centavos, desde_centavos
 from app.models.detalle_facturas import DetalleFacturas
+from app.models.productos import Productos
+
+# Cada línea guarda el costo del producto al momento de la venta y su
+# ganancia (subtotal menos costo, antes del descuento de la factura). Las
+# líneas que se crean o editan desde el ORM lo toman del producto al guardar;
+# registrar_venta lo incluye en su INSERT.
+
+
+def calcular_ganancia_detalle(cantidad, subtotal, precio_costo):
+    """
+    Calcula la ganancia de una línea de factura en centavos exactos.
+    :param cantidad: Cantidad vendida.
+    :param subtotal: Subtotal de la línea.
+    :param precio_costo: Costo unitario del producto.
+    :return: Ganancia en pesos o None si no se conoce el costo.
+    """
+    if precio_costo is None or subtotal is None:
+        return None
+    return desde_centavos(a_centavos(subtotal) - int(cantidad or 0) * a_centavos(precio_costo))
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_costo_detalles(session, flush_context, instances):
+    """Guarda el costo y la ganancia de las líneas nuevas o modificadas."""
+    for detalle in (*session.new, *session.dirty):
+        if not isinstance(detalle, DetalleFacturas):
+            continue
+        atributos = inspect(detalle).attrs
+        if detalle in session.dirty and not any(
+            atributos[campo].history.has_changes()
+            for campo in ("Cantidad", "Subtotal", "ID_Producto", "Precio_costo")
+        ):
+            continue
+        if detalle.ID_Producto is not None and (
+            detalle.Precio_costo is None or atributos.ID_Producto.history.deleted
+        ):
+            with session.no_autoflush:
+                producto = session.get(Productos, detalle.ID_Producto)
+            if producto is not None:
+                detalle.Precio_costo = producto.Precio_costo
+        detalle.Ganancia = calcular_ganancia_detalle(
+            detalle.Cantidad, detalle.Subtotal, detalle.Precio_costo
+        )
 
 
 # Crear un detalle de factura
@@ -34,6 +79,35 @@ def crear_detalle_factura(
     return nuevo_detalle
 
 
+# Completar el costo de las líneas anteriores al registro de costos
+def completar_costos_detalles(db: Session):
+    """
+    Completa el costo y la ganancia de las líneas que no los tienen (ventas
+    anteriores a este registro o respaldos antiguos) con el costo actual del
+    producto. No confirma la transacción.
+    :param db: Sesión de base de datos.
+    :return: Cantidad de líneas completadas.
+    """
+    costo_producto = (
+        select(Productos.Precio_costo)
+        .where(Productos.ID_Producto == DetalleFacturas.ID_Producto)
+        .scalar_subquery()
+    )
+    resultado = db.execute(
+        update(DetalleFacturas)
+        .where(DetalleFacturas.Precio_costo.is_(None))
+        .values(Precio_costo=costo_producto)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(DetalleFacturas)
+        .where(DetalleFacturas.Ganancia.is_(None), DetalleFacturas.Precio_costo.isnot(None))
+        .values(Ganancia=DetalleFacturas.Subtotal - DetalleFacturas.Cantidad * DetalleFacturas.Precio_costo)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount
+
+
 # Obtener todos los detalles de facturas
 def obtener_detalles_facturas(db: Session):
     """
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
-from sqlalchemy import func, case
+from sqlalchemy import func, case, tuple_
+from datetime import datetime, timedelta
 from app.models.facturas import Facturas, MetodoPago, TipoFactura
 from app.models.detalle_facturas import DetalleFacturas
 from app.models.clientes import Clientes
@@ -175,6 +176,71 @@ def obtener_facturas(db: Session):
     return facturas
 
 
+def obtener_facturas_pagina(
+    db: Session, despues_de: tuple = None, limite: int = 100, busqueda: str = None
+):
+    """
+    Obtiene una página de facturas, de la más reciente a la más antigua,
+    usando paginación por clave (Fecha_Factura, ID_Factura) en lugar de OFFSET.
+    :param db: Sesión de base de datos.
+    :param despues_de: Tupla (Fecha_Factura, ID_Factura) de la última fila de la página anterior.
+    :param limite: Cantidad máxima de facturas por página.
+    :param busqueda: Texto a buscar (opcional), con los mismos criterios que buscar_facturas.
+    :return: Lista de facturas.
+    """
+    # Última modificación de cada factura, sin duplicar filas por historial
+    ultima_modificacion = (
+        db.query(func.max(HistorialModificacion.Fecha_Modificacion))
+        .filter(HistorialModificacion.ID_Factura == Facturas.ID_Factura)
+        .correlate(Facturas)
+        .scalar_subquery()
+    )
+
+    consulta = (
+        db.query(
+            Facturas.ID_Factura,
+            Facturas.Fecha_Factura,
+            Facturas.Monto_efectivo,
+            Facturas.Monto_TRANSACCION,
+            Facturas.Estado,
+            Facturas.Domicilio,
+            Clientes.Nombre.label("cliente"),
+            Usuarios.Usuario.label("usuario"),
+            MetodoPago.Nombre.label("metodopago"),
+            TipoFactura.Nombre.label("tipofactura"),
+            ultima_modificacion.label("fecha_modificacion"),
+        )
+        .join(Usuarios, Facturas.ID_Usuario == Usuarios.ID_Usuario)
+        .join(MetodoPago, Facturas.ID_Metodo_Pago == MetodoPago.ID_Metodo_Pago)
+        .join(TipoFactura, Facturas.ID_Tipo_Factura == TipoFactura.ID_Tipo_Factura)
+        .join(Clientes, Facturas.ID_Cliente == Clientes.ID_Cliente)
+    )
+
+    if busqueda:
+        consulta = consulta.filter(
+            or_(
+                Facturas.ID_Factura.like(f"%{busqueda}%"),
+                Facturas.Fecha_Factura.like(f"%{busqueda}%"),
+                TipoFactura.Nombre.like(f"%{busqueda}%"),
+                Clientes.Nombre.like(f"%{busqueda}%"),
+                MetodoPago.Nombre.like(f"%{busqueda}%"),
+                Facturas.Estado.like(f"%{busqueda}%"),
+            )
+        )
+
+    if despues_de is not None:
+        fecha, id_factura = despues_de
+        consulta = consulta.filter(
+            tuple_(Facturas.Fecha_Factura, Facturas.ID_Factura) < tuple_(fecha, id_factura)
+        )
+
+    return (
+        consulta.order_by(Facturas.Fecha_Factura.desc(), Facturas.ID_Factura.desc())
+        .limit(limite)
+        .all()
+    )
+
+
 def buscar_facturas(db: Session, busqueda: str):
     """
     Busca facturas en la base de datos.
@@ -249,42 +315,6 @@ def obtener_factura_por_id(db: Session, id_factura: int):
 
     return facturas
 
-def obtener_reporte_facturas(db: Session, fecha_inicio, fecha_fin=None):
-    subquery_ganancia = (
-        func.sum(
-            DetalleFacturas.Cantidad * 
-            case(
-                (Facturas.ID_Tipo_Factura == 1, Productos.Ganancia_Producto_normal),
-                (Facturas.ID_Tipo_Factura == 2, Productos.Ganancia_Producto_mayor),
-                else_=0
-            )
-        )
-    )
-
-    query = (
-        db.query(
-            Facturas.ID_Factura,
-            TipoIngreso.Tipo_Ingreso,
-            Facturas.Monto_efectivo,
-            Facturas.Monto_TRANSACCION,
-            Facturas.Fecha_Factura,
-            (subquery_ganancia - Facturas.Descuento).label("ganancia_por_factura")  # Se resta solo una vez
-        )
-        .join(TipoIngreso, TipoIngreso.ID_Factura == Facturas.ID_Factura)
-        .join(DetalleFacturas, DetalleFacturas.ID_Factura == Facturas.ID_Factura)
-        .join(Productos, Productos.ID_Producto == DetalleFacturas.ID_Producto)
-        .group_by(Facturas.ID_Factura, TipoIngreso.Tipo_Ingreso, Facturas.Descuento, Facturas.Monto_efectivo, Facturas.Monto_TRANSACCION, Facturas.Fecha_Factura)
-    )
-
-    # Filtrar por fecha
-    if fecha_fin:
-        query = query.filter(and_(Facturas.Fecha_Factura >= fecha_inicio, Facturas.Fecha_Factura <= fecha_fin))
-    else:
-        query = query.filter(func.date(Facturas.Fecha_Factura) == fecha_inicio)
-
-    return query.all()
-
-
 # Actualizar una factura
 def actualizar_factura(
     db: Session,
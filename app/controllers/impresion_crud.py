@@ -0,0 +1,117 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from app.models.cola_impresion import TrabajoImpresion
+from datetime import datetime
+import json
+
+
+# Guardar un trabajo en la bandeja de impresión
+def crear_trabajo_impresion(db: Session, titulo: str, documento, id_factura: int = None):
+    """
+    Guarda un documento en la bandeja de salida de impresión.
+    :param db: Sesión de base de datos.
+    :param titulo: Nombre del trabajo (por ejemplo, 'Ticket de Venta').
+    :param documento: Lista de comandos de impresión.
+    :param id_factura: ID de la factura asociada (opcional).
+    :return: ID del trabajo creado.
+    """
+    trabajo = TrabajoImpresion(
+        Titulo=titulo,
+        Documento=json.dumps(documento, ensure_ascii=False),
+        ID_Factura=id_factura,
+    )
+    db.add(trabajo)
+    db.commit()
+    return trabajo.ID_Trabajo
+
+
+# Obtener los trabajos pendientes
+def obtener_trabajos_impresion_pendientes(db: Session, limite: int = 20):
+    """
+    Obtiene los trabajos pendientes en orden de llegada. Los tickets se
+    imprimen en ese orden: uno que falla retiene a los siguientes hasta que
+    se imprime.
+    :param db: Sesión de base de datos.
+    :param limite: Cantidad máxima de trabajos.
+    :return: Lista de trabajos.
+    """
+    return (
+        db.query(TrabajoImpresion)
+        .filter(TrabajoImpresion.Estado == "PENDIENTE")
+        .order_by(TrabajoImpresion.ID_Trabajo)
+        .limit(limite)
+        .all()
+    )
+
+
+# Obtener el último ticket de una factura
+def obtener_ultimo_documento_factura(db: Session, id_factura: int, titulo: str = None):
+    """
+    Obtiene el último documento enviado a imprimir para una factura.
+    :param db: Sesión de base de datos.
+    :param id_factura: ID de la factura.
+    :param titulo: Título del trabajo (opcional), para no confundir el
+        ticket de la factura con los comprobantes de sus abonos.
+    :return: Lista de comandos de impresión o None si no hay ninguno.
+    """
+    consulta = db.query(TrabajoImpresion.Documento).filter(TrabajoImpresion.ID_Factura == id_factura)
+    if titulo is not None:
+        consulta = consulta.filter(TrabajoImpresion.Titulo == titulo)
+    documento = (
+        consulta
+        .order_by(TrabajoImpresion.ID_Trabajo.desc())
+        .limit(1)
+        .scalar()
+    )
+    return json.loads(documento) if documento else None
+
+
+# Marcar un trabajo como impreso
+def marcar_trabajo_impreso(db: Session, id_trabajo: int):
+    """
+    Marca un trabajo de la bandeja como impreso.
+    :param db: Sesión de base de datos.
+    :param id_trabajo: ID del trabajo.
+    """
+    db.execute(
+        update(TrabajoImpresion)
+        .where(TrabajoImpresion.ID_Trabajo == id_trabajo)
+        .values(Estado="IMPRESO", Fecha_Impresion=datetime.now(), Ultimo_Error=None)
+    )
+    db.commit()
+
+
+# Registrar un intento fallido
+def registrar_fallo_impresion(db: Session, id_trabajo: int, error: str, proximo_intento: datetime):
+    """
+    Registra un intento fallido y programa el siguiente. El trabajo sigue
+    PENDIENTE: la cola lo reintenta hasta que se imprime.
+    :param db: Sesión de base de datos.
+    :param id_trabajo: ID del trabajo.
+    :param error: Descripción del error.
+    :param proximo_intento: Fecha del siguiente intento.
+    :return: Cantidad de intentos fallidos del trabajo.
+    """
+    trabajo = db.get(TrabajoImpresion, id_trabajo)
+    if not trabajo:
+        return None
+    trabajo.Intentos = (trabajo.Intentos or 0) + 1
+    trabajo.Ultimo_Error = str(error)[:255]
+    trabajo.Proximo_Intento = proximo_intento
+    db.commit()
+    return trabajo.Intentos
+
+
+# Contar los trabajos por estado
+def contar_trabajos_impresion(db: Session):
+    """
+    Cuenta los trabajos de la bandeja agrupados por estado.
+    :param db: Sesión de base de datos.
+    :return: Diccionario {estado: cantidad}.
+    """
+    filas = (
+        db.query(TrabajoImpresion.Estado, func.count(TrabajoImpresion.ID_Trabajo))
+        .group_by(TrabajoImpresion.Estado)
+        .all()
+    )
+    return dict(filas)
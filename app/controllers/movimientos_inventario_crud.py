@@ -0,0 +1,401 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, insert, update, delete, select, bindparam, case, func, literal, or_
+from datetime import date, datetime, timedelta
+
+from app.models.productos import Productos
+from app.models.detalle_facturas import DetalleFacturas
+from app.models.movimientos_inventario import (
+    MovimientoInventario,
+    SaldoInventario,
+    get_local_time,
+)
+from app.controllers.producto_crud import catalogo
+
+# Kardex de inventario: cada cambio de PRODUCTOS.Stock_actual se registra en
+# MOVIMIENTOS_INVENTARIO en la misma transacción. Las ventas, cancelaciones
+# y ediciones de facturas escriben sus movimientos con sentencias en bloque;
+# los cambios hechos desde el ORM (crear o editar un producto) los registra
+# el hook de before_flush. SALDOS_INVENTARIO guarda puntos de control para
+# consultar el stock a una fecha sin recorrer todo el histórico.
+
+# Movimientos que corresponden a ventas (para la rotación)
+TIPOS_VENTA = ("Venta", "Cancelacion", "Edicion")
+
+
+def registrar_movimientos(db: Session, tipo: str, cantidades, id_factura: int = None):
+    """
+    Registra movimientos de inventario en un solo INSERT, sin confirmar la
+    transacción.
+    :param db: Sesión de base de datos.
+    :param tipo: Tipo de movimiento.
+    :param cantidades: Diccionario {id_producto: cantidad}; positiva si entra
+        stock y negativa si sale. Las cantidades en cero se omiten.
+    :param id_factura: ID de la factura que origina el movimiento (opcional).
+    :return: Cantidad de movimientos registrados.
+    """
+    filas = [
+        {
+            "Tipo": tipo,
+            "Cantidad": int(cantidad),
+            "ID_Producto": int(id_producto),
+            "ID_Factura": id_factura,
+        }
+        for id_producto, cantidad in cantidades.items()
+        if cantidad
+    ]
+    if filas:
+        db.execute(insert(MovimientoInventario), filas)
+    return len(filas)
+
+
+def registrar_devolucion_facturas(db: Session, ids_factura):
+    """
+    Registra como cancelación las cantidades vendidas en las facturas, con un
+    INSERT ... SELECT sobre su detalle. Debe llamarse antes de eliminar el
+    detalle; no confirma la transacción.
+    :param db: Sesión de base de datos.
+    :param ids_factura: IDs de las facturas canceladas.
+    """
+    tabla = MovimientoInventario.__table__
+    db.execute(
+        insert(tabla).from_select(
+            ["Fecha", "Tipo", "Cantidad", "ID_Producto", "ID_Factura"],
+            select(
+                literal(get_local_time(), tabla.c.Fecha.type),
+                literal("Cancelacion"),
+                func.sum(DetalleFacturas.Cantidad),
+                DetalleFacturas.ID_Producto,
+                DetalleFacturas.ID_Factura,
+            )
+            .where(
+                DetalleFacturas.ID_Factura.in_(ids_factura),
+                DetalleFacturas.ID_Producto.isnot(None),
+            )
+            .group_by(DetalleFacturas.ID_Factura, DetalleFacturas.ID_Producto),
+        )
+    )
+
+
+class StockInsuficiente(ValueError):
+    """
+    Una o más líneas piden más unidades de las que hay en stock.
+    faltantes: lista de tuplas (id_producto, nombre, pedido, disponible);
+    nombre y disponible son None si el producto no existe.
+    """
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        lineas = [
+            f"{nombre} (código {id_producto}): pedido {pedido}, disponible {disponible}"
+            if disponible is not None
+            else f"Producto {id_producto} no encontrado"
+            for id_producto, nombre, pedido, disponible in faltantes
+        ]
+        super().__init__("Stock insuficiente:\n" + "\n".join(lineas))
+
+
+def _buscar_faltantes(db: Session, cantidades):
+    """Líneas de salida que el stock actual no alcanza a cubrir."""
+    salidas = {id_producto: -cantidad for id_producto, cantidad in cantidades.items() if cantidad < 0}
+    existentes = {
+        fila.ID_Producto: fila
+        for fila in db.query(Productos.ID_Producto, Productos.Nombre, Productos.Stock_actual)
+        .filter(Productos.ID_Producto.in_(list(cantidades)))
+        .all()
+    }
+    faltantes = []
+    for id_producto in cantidades:
+        producto = existentes.get(id_producto)
+        if producto is None:
+            faltantes.append((id_producto, None, salidas.get(id_producto, 0), None))
+        elif id_producto in salidas and producto.Stock_actual < salidas[id_producto]:
+            faltantes.append(
+                (id_producto, producto.Nombre, salidas[id_producto], producto.Stock_actual)
+            )
+    return faltantes
+
+
+def mover_stock(db: Session, cantidades, tipo: str, id_factura: int = None):
+    """
+    Suma (o resta) cantidades al stock con un UPDATE condicional por
+    producto en un solo executemany: una salida solo se aplica si hay stock
+    suficiente (Stock_actual >= cantidad), así dos terminales que venden el
+    mismo producto no pierden descuentos. Registra los movimientos en el
+    kardex sin confirmar ni revertir la transacción.
+    Antes del UPDATE se buscan las líneas sin stock dentro de la misma
+    transacción; si hay alguna se lanza StockInsuficiente sin modificar
+    nada. Si otra terminal descuenta el stock entre esa consulta y el
+    UPDATE, este puede quedar aplicado a medias: se lanza StockInsuficiente
+    y el llamador debe revertir la transacción.
+    :param db: Sesión de base de datos.
+    :param cantidades: Diccionario {id_producto: cantidad}; positiva si entra
+        stock y negativa si sale.
+    :param tipo: Tipo de movimiento.
+    :param id_factura: ID de la factura que origina el movimiento (opcional).
+    :return: Cantidad de productos actualizados.
+    """
+    cantidades = {int(i): int(c) for i, c in cantidades.items() if c}
+    if not cantidades:
+        return 0
+    faltantes = _buscar_faltantes(db, cantidades)
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+    productos = Productos.__table__
+    diferencia = bindparam("b_cantidad")
+    resultado = db.execute(
+        update(productos)
+        .where(
+            productos.c.ID_Producto == bindparam("b_id_producto"),
+            or_(diferencia >= 0, productos.c.Stock_actual + diferencia >= 0),
+        )
+        .values(
+            Stock_actual=productos.c.Stock_actual + diferencia,
+            Estado=case((productos.c.Stock_actual + diferencia > 0, True), else_=False),
+        ),
+        [
+            {"b_id_producto": id_producto, "b_cantidad": cantidad}
+            for id_producto, cantidad in cantidades.items()
+        ],
+    )
+    if resultado.rowcount != len(cantidades):
+        # Otra terminal vendió entre la consulta y el UPDATE
+        raise StockInsuficiente(_buscar_faltantes(db, cantidades))
+    registrar_movimientos(db, tipo, cantidades, id_factura)
+    return len(cantidades)
+
+
+# Ajustar el stock de varios productos en una sola transacción
+def ajustar_stock(db: Session, cantidades, tipo: str = "Ajuste"):
+    """
+    Suma (o resta) cantidades al stock de los productos con mover_stock y
+    confirma la transacción.
+    :param db: Sesión de base de datos.
+    :param cantidades: Diccionario {id_producto: cantidad a sumar}.
+    :param tipo: Tipo de movimiento.
+    :return: Cantidad de productos actualizados.
+    """
+    try:
+        actualizados = mover_stock(db, cantidades, tipo)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.expire_all()
+    catalogo.invalidar(*(int(i) for i in cantidades))
+    return actualizados
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_movimientos_productos(session, flush_context, instances):
+    """Registra los cambios de stock de productos creados o editados desde el ORM."""
+    for producto in (*session.new, *session.dirty):
+        if not isinstance(producto, Productos) or producto.ID_Producto is None:
+            continue
+        if producto in session.new:
+            cantidad, tipo = producto.Stock_actual or 0, "Inicial"
+        else:
+            historial = inspect(producto).attrs.Stock_actual.history
+            if not historial.has_changes() or not historial.deleted:
+                continue
+            cantidad, tipo = (producto.Stock_actual or 0) - (historial.deleted[0] or 0), "Ajuste"
+        if cantidad:
+            session.add(
+                MovimientoInventario(
+                    Tipo=tipo, Cantidad=int(cantidad), ID_Producto=producto.ID_Producto
+                )
+            )
+
+
+def _ultimos_saldos(antes_de: datetime = None):
+    """Último punto de control de cada producto (anterior a la fecha, si se indica)."""
+    ultimo = select(
+        SaldoInventario.ID_Producto,
+        func.max(SaldoInventario.ID_Movimiento).label("ID_Movimiento"),
+    ).group_by(SaldoInventario.ID_Producto)
+    if antes_de is not None:
+        ultimo = ultimo.where(SaldoInventario.Fecha < antes_de)
+    ultimo = ultimo.subquery()
+    return (
+        select(SaldoInventario.ID_Producto, SaldoInventario.ID_Movimiento, SaldoInventario.Saldo)
+        .join(
+            ultimo,
+            (ultimo.c.ID_Producto == SaldoInventario.ID_Producto)
+            & (ultimo.c.ID_Movimiento == SaldoInventario.ID_Movimiento),
+        )
+        .subquery()
+    )
+
+
+# Stock de los productos según el kardex
+def obtener_stock_a_fecha(db: Session, fecha=None, ids_producto=None):
+    """
+    Calcula el stock de los productos a partir del último punto de control
+    y los movimientos posteriores.
+    :param db: Sesión de base de datos.
+    :param fecha: Fecha (date) o fecha y hora (datetime); se cuentan los
+        movimientos anteriores a ella. Sin fecha, el stock actual del kardex.
+    :param ids_producto: IDs de los productos (opcional; por defecto todos).
+    :return: Diccionario {id_producto: stock}.
+    """
+    if isinstance(fecha, date) and not isinstance(fecha, datetime):
+        fecha = datetime.combine(fecha, datetime.min.time())
+
+    saldos = _ultimos_saldos(fecha)
+    puntos = select(saldos.c.ID_Producto, saldos.c.Saldo)
+    movimientos = (
+        select(MovimientoInventario.ID_Producto, func.sum(MovimientoInventario.Cantidad))
+        .outerjoin(saldos, saldos.c.ID_Producto == MovimientoInventario.ID_Producto)
+        .where(MovimientoInventario.ID_Movimiento > func.coalesce(saldos.c.ID_Movimiento, 0))
+        .group_by(MovimientoInventario.ID_Producto)
+    )
+    if fecha is not None:
+        movimientos = movimientos.where(MovimientoInventario.Fecha < fecha)
+    if ids_producto is not None:
+        ids_producto = [int(i) for i in ids_producto]
+        puntos = puntos.where(saldos.c.ID_Producto.in_(ids_producto))
+        movimientos = movimientos.where(MovimientoInventario.ID_Producto.in_(ids_producto))
+
+    stock = dict(db.execute(puntos).all())
+    for id_producto, cantidad in db.execute(movimientos).all():
+        stock[id_producto] = stock.get(id_producto, 0) + int(cantidad or 0)
+    return stock
+
+
+def conciliar_inventario(db: Session, tipo: str = "Ajuste", ids_producto=None):
+    """
+    Registra un movimiento por la diferencia entre PRODUCTOS.Stock_actual y
+    el kardex (stock cargado sin movimientos: bases anteriores, importación
+    de archivos o respaldos). No confirma la transacción.
+    :param db: Sesión de base de datos.
+    :param tipo: Tipo de los movimientos de diferencia.
+    :param ids_producto: IDs de los productos (opcional; por defecto todos).
+    :return: Cantidad de movimientos registrados.
+    """
+    kardex = obtener_stock_a_fecha(db, ids_producto=ids_producto)
+    consulta = db.query(Productos.ID_Producto, Productos.Stock_actual)
+    if ids_producto is not None:
+        consulta = consulta.filter(Productos.ID_Producto.in_([int(i) for i in ids_producto]))
+    diferencias = {
+        id_producto: stock - kardex.get(id_producto, 0)
+        for id_producto, stock in consulta.all()
+        if stock != kardex.get(id_producto, 0)
+    }
+    return registrar_movimientos(db, tipo, diferencias)
+
+
+def registrar_saldos_inventario(db: Session, reconstruir: bool = False):
+    """
+    Guarda un punto de control para cada producto con movimientos nuevos
+    desde su último saldo, con un solo INSERT ... SELECT. Se llama al cerrar
+    la caja; no confirma la transacción.
+    :param db: Sesión de base de datos.
+    :param reconstruir: Si es True se borran los puntos de control y se
+        vuelven a calcular desde todos los movimientos.
+    :return: Cantidad de puntos de control registrados.
+    """
+    if reconstruir:
+        db.execute(delete(SaldoInventario))
+
+    saldos = _ultimos_saldos()
+    movimientos = MovimientoInventario
+    resultado = db.execute(
+        insert(SaldoInventario).from_select(
+            ["ID_Producto", "ID_Movimiento", "Fecha", "Saldo"],
+            select(
+                movimientos.ID_Producto,
+                func.max(movimientos.ID_Movimiento),
+                func.max(movimientos.Fecha),
+                func.coalesce(saldos.c.Saldo, 0) + func.sum(movimientos.Cantidad),
+            )
+            .outerjoin(saldos, saldos.c.ID_Producto == movimientos.ID_Producto)
+            .where(movimientos.ID_Movimiento > func.coalesce(saldos.c.ID_Movimiento, 0))
+            .group_by(movimientos.ID_Producto, saldos.c.Saldo),
+        )
+    )
+    return resultado.rowcount
+
+
+# Kardex de un producto
+def obtener_movimientos_producto(db: Session, id_producto: int, desde: date = None, hasta: date = None):
+    """
+    Obtiene los movimientos de un producto con el saldo después de cada uno.
+    :param db: Sesión de base de datos.
+    :param id_producto: ID del producto.
+    :param desde: Primer día (opcional).
+    :param hasta: Último día (opcional).
+    :return: Lista de tuplas (movimiento, saldo).
+    """
+    consulta = db.query(MovimientoInventario).filter(MovimientoInventario.ID_Producto == id_producto)
+    saldo = 0
+    if desde is not None:
+        consulta = consulta.filter(
+            MovimientoInventario.Fecha >= datetime.combine(desde, datetime.min.time())
+        )
+        saldo = obtener_stock_a_fecha(db, desde, [id_producto]).get(int(id_producto), 0)
+    if hasta is not None:
+        consulta = consulta.filter(
+            MovimientoInventario.Fecha
+            < datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+        )
+
+    resultado = []
+    for movimiento in consulta.order_by(MovimientoInventario.ID_Movimiento).all():
+        saldo += movimiento.Cantidad
+        resultado.append((movimiento, saldo))
+    return resultado
+
+
+# Rotación de inventario en un rango de días
+def obtener_rotacion_inventario(db: Session, desde: date, hasta: date):
+    """
+    Calcula la rotación de cada producto en el rango: unidades vendidas
+    (ventas menos cancelaciones y ediciones) sobre el stock promedio entre
+    el inicio y el final del rango.
+    :param db: Sesión de base de datos.
+    :param desde: Primer día.
+    :param hasta: Último día.
+    :return: Lista de diccionarios con ID_Producto, Nombre, Stock_inicial,
+        Unidades_vendidas, Otros_movimientos, Stock_final y Rotacion,
+        ordenada por unidades vendidas.
+    """
+    inicio = datetime.combine(desde, datetime.min.time())
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+    ventas = case((MovimientoInventario.Tipo.in_(TIPOS_VENTA), MovimientoInventario.Cantidad), else_=0)
+    movimientos = (
+        db.query(
+            MovimientoInventario.ID_Producto,
+            func.sum(ventas).label("Ventas"),
+            func.sum(MovimientoInventario.Cantidad).label("Total"),
+        )
+        .filter(MovimientoInventario.Fecha >= inicio, MovimientoInventario.Fecha < fin)
+        .group_by(MovimientoInventario.ID_Producto)
+        .all()
+    )
+    if not movimientos:
+        return []
+
+    ids = [fila.ID_Producto for fila in movimientos]
+    stock_inicial = obtener_stock_a_fecha(db, inicio, ids)
+    nombres = dict(
+        db.query(Productos.ID_Producto, Productos.Nombre).filter(Productos.ID_Producto.in_(ids)).all()
+    )
+
+    resultado = []
+    for fila in movimientos:
+        inicial = stock_inicial.get(fila.ID_Producto, 0)
+        final = inicial + int(fila.Total or 0)
+        vendidas = -int(fila.Ventas or 0)
+        promedio = (inicial + final) / 2
+        resultado.append(
+            {
+                "ID_Producto": fila.ID_Producto,
+                "Nombre": nombres.get(fila.ID_Producto),
+                "Stock_inicial": inicial,
+                "Unidades_vendidas": vendidas,
+                "Otros_movimientos": int(fila.Total or 0) + vendidas,
+                "Stock_final": final,
+                "Rotacion": round(vendidas / promedio, 2) if promedio > 0 else None,
+            }
+        )
+    resultado.sort(key=lambda fila: fila["Unidades_vendidas"], reverse=True)
+    return resultado
@@ -1,10 +1,16 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import update
+from datetime import datetime
 from app.models.pago_credito import (
     PagoCredito,
 )
 
 from app.models.pago_credito import PagoCredito, TipoPago
-from app.models.facturas import MetodoPago
+from app.models.facturas import Facturas, MetodoPago
+from app.models.venta_credito import VentaCredito
+from app.models.tipo_ingresos import TipoIngreso
+from app.models.ingresos import Ingresos
+from app.database.dinero import a_centavos, sumar_montos
 
 
 # Crear un nuevo pago de crédito
@@ -157,3 +163,106 @@ def eliminar_pago_credito(db: Session, id_pago_credito: int):
     db.delete(pago_credito_existente)
     db.commit()
     return True
+
+
+# Registrar un abono a una venta a crédito
+def registrar_abono(
+    db: Session,
+    id_venta_credito: int,
+    monto_efectivo: float,
+    monto_transaccion: float,
+    id_metodo_pago: int,
+    fecha_limite: datetime = None,
+):
+    """
+    Registra un abono en una sola transacción: descuenta el saldo pendiente,
+    guarda el pago, suma los montos a la factura y registra el ingreso.
+    El saldo se descuenta con un UPDATE condicionado a que alcance, así dos
+    equipos que abonan a la vez no pueden pagar de más.
+    :param db: Sesión de base de datos.
+    :param id_venta_credito: ID de la venta a crédito.
+    :param monto_efectivo: Parte del abono pagada en efectivo.
+    :param monto_transaccion: Parte del abono pagada mediante transacción.
+    :param id_metodo_pago: ID del método de pago.
+    :param fecha_limite: Nueva fecha límite de pago (opcional).
+    :return: Diccionario con ID_Pago_Credito, ID_Factura, Total_Deuda,
+        Saldo_Pendiente, Estado, Fecha_Limite y Abonos (lista de tuplas
+        (fecha, método, monto), incluido el nuevo), lo que necesita el
+        comprobante junto con el ticket de la factura.
+    :raises ValueError: Si el abono no es mayor a cero o supera el saldo.
+    """
+    monto = sumar_montos([monto_efectivo, monto_transaccion])
+    if a_centavos(monto) <= 0:
+        raise ValueError("El abono debe ser mayor a cero.")
+
+    valores = {"Saldo_Pendiente": VentaCredito.Saldo_Pendiente - monto}
+    if fecha_limite is not None:
+        valores["Fecha_Limite"] = fecha_limite
+
+    try:
+        venta = db.execute(
+            update(VentaCredito)
+            .where(
+                VentaCredito.ID_Venta_Credito == id_venta_credito,
+                VentaCredito.Saldo_Pendiente >= monto,
+            )
+            .values(**valores)
+            .returning(
+                VentaCredito.ID_Factura,
+                VentaCredito.Total_Deuda,
+                VentaCredito.Saldo_Pendiente,
+                VentaCredito.Fecha_Limite,
+            )
+            .execution_options(synchronize_session="fetch")
+        ).first()
+        if venta is None:
+            raise ValueError("El abono supera el saldo pendiente de la venta a crédito.")
+
+        pagada = a_centavos(venta.Saldo_Pendiente) == 0
+        id_tipo_pago = (
+            db.query(TipoPago.ID_Tipo_Pago)
+            .filter(TipoPago.Nombre == ("Pago Total" if pagada else "Abono"))
+            .scalar()
+        )
+        pago = PagoCredito(
+            Monto=monto,
+            ID_Venta_Credito=id_venta_credito,
+            ID_Metodo_Pago=id_metodo_pago,
+            ID_Tipo_Pago=id_tipo_pago,
+        )
+        db.add(pago)
+        db.flush()
+        tipo_ingreso = TipoIngreso(Tipo_Ingreso="Abono", ID_Pago_Credito=pago.ID_Pago_Credito)
+        db.add(tipo_ingreso)
+        db.flush()
+        db.add(Ingresos(ID_Tipo_Ingreso=tipo_ingreso.ID_Tipo_Ingreso))
+
+        factura = db.get(Facturas, venta.ID_Factura, populate_existing=True)
+        factura.Monto_efectivo = sumar_montos([factura.Monto_efectivo, monto_efectivo])
+        factura.Monto_TRANSACCION = sumar_montos([factura.Monto_TRANSACCION, monto_transaccion])
+        factura.ID_Metodo_Pago = id_metodo_pago
+        factura.Estado = pagada
+        db.flush()
+
+        # Historial de abonos (con el nuevo) para el comprobante
+        abonos = (
+            db.query(PagoCredito.Fecha_Registro, MetodoPago.Nombre, PagoCredito.Monto)
+            .join(MetodoPago, PagoCredito.ID_Metodo_Pago == MetodoPago.ID_Metodo_Pago)
+            .filter(PagoCredito.ID_Venta_Credito == id_venta_credito)
+            .order_by(PagoCredito.ID_Pago_Credito)
+            .all()
+        )
+        abono = {
+            "ID_Pago_Credito": pago.ID_Pago_Credito,
+            "ID_Factura": venta.ID_Factura,
+            "Total_Deuda": venta.Total_Deuda,
+            "Saldo_Pendiente": venta.Saldo_Pendiente,
+            "Estado": pagada,
+            "Fecha_Limite": venta.Fecha_Limite,
+            "Abonos": [tuple(fila) for fila in abonos],
+        }
+        db.commit()
+        return abono
+    except Exception:
+        db.rollback()
+        raise
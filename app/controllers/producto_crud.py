@@ -1,11 +1,14 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy import or_
+from sqlalchemy import func, event, inspect, update, bindparam
+from sqlalchemy import or_, text, column, Integer, Float
 from app.models.productos import Productos
 from app.models.productos import Marcas
 from app.models.productos import Categorias
 from app.models.facturas import Facturas
 from app.models.detalle_facturas import DetalleFacturas
+from app.models.ventas_diarias import VentaDiaria
+from app.database.dinero import a_centavos, desde_centavos, redondear_monto
+import threading
 
 
 def redondear_a_cientos(numero):
@@ -22,6 +25,12 @@ def redondear_a_cientos(numero):
     return ((numero // 100) + 1) * 100
 
 
+# Margen sobre el costo de cada precio de venta
+MARGEN_NORMAL = 0.5
+MARGEN_MAYOR = 0.35
+MARGEN_REVENTA = 0.31
+
+
 def calcular_ganancia(precio_venta, precio_costo):
     return precio_venta - precio_costo
 
@@ -52,7 +61,7 @@ def crear_producto(
     estado = cambiar_estado(stock_actual)
 
     if not precio_venta_reventa:
-        precio_venta_reventa = calcular_precio(precio_costo, 0.31)
+        precio_venta_reventa = calcular_precio(precio_costo, MARGEN_REVENTA)
 
     ganancia_producto_normal = calcular_ganancia(precio_venta_normal, precio_costo)
     ganancia_producto_mayor = calcular_ganancia(precio_venta_mayor, precio_costo)
@@ -82,16 +91,25 @@ def crear_producto(
 
 
 def obtener_productos_mas_vendidos(db: Session, limite=20):
+    """
+    Obtiene los productos con más unidades vendidas desde el resumen
+    VENTAS_DIARIAS.
+    :param db: Sesión de base de datos.
+    :param limite: Cantidad máxima de productos.
+    :return: Lista de filas con ID_Producto, Nombre, Total_Unidades_Vendidas
+        y Total_Ganado.
+    """
+    unidades = func.sum(VentaDiaria.Cantidad)
     resultados = (
         db.query(
-            Productos.ID_Producto,
-            Productos.Nombre,
-            func.sum(DetalleFacturas.Cantidad).label("Total_Unidades_Vendidas"),
-            func.sum(DetalleFacturas.Subtotal).label("Total_Ganado"),
+            VentaDiaria.ID_Producto,
+            func.coalesce(Productos.Nombre, "Producto eliminado").label("Nombre"),
+            unidades.label("Total_Unidades_Vendidas"),
+            func.sum(VentaDiaria.Total_Ventas).label("Total_Ganado"),
         )
-        .join(DetalleFacturas, Productos.ID_Producto == DetalleFacturas.ID_Producto)
-        .group_by(Productos.ID_Producto, Productos.Nombre)
-        .order_by(func.sum(DetalleFacturas.Cantidad).desc())
+        .outerjoin(Productos, Productos.ID_Producto == VentaDiaria.ID_Producto)
+        .group_by(VentaDiaria.ID_Producto, Productos.Nombre)
+        .order_by(unidades.desc())
         .limit(limite)
         .all()
     )
@@ -124,8 +142,11 @@ def obtener_productos(db: Session):
     return productos
 
 
-def obtener_producto_por_id(db: Session, id_producto: int):
-    productos = (
+def consultar_productos_catalogo(db: Session):
+    """
+    Consulta base del catálogo: producto con precios, stock, marca y categoría.
+    """
+    return (
         db.query(
             Productos.ID_Producto,
             Productos.Nombre,
@@ -144,35 +165,268 @@ def obtener_producto_por_id(db: Session, id_producto: int):
         )
         .join(Marcas, Productos.ID_Marca == Marcas.ID_Marca)
         .join(Categorias, Productos.ID_Categoria == Categorias.ID_Categoria)
-        .filter(Productos.ID_Producto == id_producto)
-        .all()
     )
-    return productos
 
 
-def buscar_productos(db: Session, busqueda: str):
+class CatalogoProductos:
+    """
+    Caché en memoria del catálogo de productos, por ID_Producto, compartida
+    por todo el proceso. Se llena con una sola consulta la primera vez; desde
+    ahí las lecturas no tocan SQLite salvo para productos invalidados o que
+    no están en memoria (creados por otra terminal). Las escrituras
+    confirmadas sobre PRODUCTOS invalidan las entradas afectadas.
+    """
+
+    def __init__(self):
+        self._productos = {}
+        self._completo = False
+        self._lock = threading.RLock()
+        self._suscriptores = []
+        self._recargas = []
+        self.aciertos = 0
+        self.fallos = 0
+
+    def cargar(self, db: Session):
+        """Carga el catálogo completo en memoria."""
+        with self._lock:
+            self._productos = {
+                producto.ID_Producto: producto
+                for producto in consultar_productos_catalogo(db).all()
+            }
+            self._completo = True
+
+    def obtener(self, db: Session, id_producto):
+        """
+        Devuelve la fila del producto o None si no existe.
+        :param db: Sesión de base de datos (solo se usa en fallos de caché).
+        :param id_producto: ID del producto (entero o texto numérico).
+        """
+        try:
+            id_producto = int(id_producto)
+        except (TypeError, ValueError):
+            return None
+
+        with self._lock:
+            if not self._completo:
+                self.cargar(db)
+
+            if id_producto in self._productos:
+                self.aciertos += 1
+                return self._productos[id_producto]
+
+            # Invalidado o creado por otra terminal: una consulta por clave
+            self.fallos += 1
+            producto = (
+                consultar_productos_catalogo(db)
+                .filter(Productos.ID_Producto == id_producto)
+                .first()
+            )
+            if producto:
+                self._productos[id_producto] = producto
+            return producto
+
+    def invalidar(self, *ids_producto):
+        """Descarta las entradas indicadas; se recargan en la próxima lectura."""
+        with self._lock:
+            for id_producto in ids_producto:
+                self._productos.pop(int(id_producto), None)
+
+    def suscribir(self, funcion):
+        """
+        Registra una función que recibe (id_producto, nombre) cada vez que un
+        producto se crea o cambia de nombre, y (id_producto, None) si se elimina.
+        """
+        self._suscriptores.append(funcion)
+
+    def notificar(self, id_producto, nombre):
+        """Avisa a los suscriptores del cambio de un producto."""
+        for funcion in self._suscriptores:
+            funcion(id_producto, nombre)
+
+    def suscribir_recarga(self, funcion):
+        """
+        Registra una función sin argumentos que se llama cuando el catálogo
+        se recarga por completo tras una escritura masiva.
+        """
+        self._recargas.append(funcion)
+
+    def recargar(self):
+        """
+        Descarta todo el catálogo después de una escritura masiva fuera del
+        ORM (importación de archivos o respaldos) y avisa a los suscriptores
+        de recarga, que no reciben los cambios fila por fila.
+        """
+        self.limpiar()
+        for funcion in self._recargas:
+            funcion()
+
+    def limpiar(self):
+        """Descarta todo el catálogo; se recarga completo en la próxima lectura."""
+        with self._lock:
+            self._productos = {}
+            self._completo = False
+
+    def estadisticas(self):
+        """Devuelve los contadores de aciertos y fallos de la caché."""
+        with self._lock:
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "productos": len(self._productos),
+            }
+
+
+catalogo = CatalogoProductos()
+
+
+def _cambios_pendientes(session):
+    """Cambios del catálogo escritos en la transacción y aún sin confirmar."""
+    return session.info.setdefault(
+        "catalogo_pendiente", {"limpiar": False, "ids": set(), "nombres": {}}
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def registrar_productos_modificados(session, flush_context):
+    """Anota los productos que el ORM escribió; se aplican al confirmar."""
+    objetos = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(objeto, (Marcas, Categorias)) for objeto in objetos):
+        _cambios_pendientes(session)["limpiar"] = True  # Un cambio de nombre afecta a muchos productos
+
+    productos = [
+        objeto
+        for objeto in objetos
+        if isinstance(objeto, Productos) and objeto.ID_Producto is not None
+    ]
+    if not productos:
+        return
+
+    pendientes = _cambios_pendientes(session)
+    for producto in productos:
+        pendientes["ids"].add(producto.ID_Producto)
+        if producto in session.deleted:
+            pendientes["nombres"][producto.ID_Producto] = None
+        elif producto in session.new or inspect(producto).attrs.Nombre.history.has_changes():
+            pendientes["nombres"][producto.ID_Producto] = producto.Nombre
+
+
+@event.listens_for(Session, "after_commit")
+def invalidar_productos_modificados(session):
+    """Invalida en el catálogo y avisa a los suscriptores los cambios confirmados."""
+    pendientes = session.info.pop("catalogo_pendiente", None)
+    if not pendientes:
+        return
+    if pendientes["limpiar"]:
+        catalogo.limpiar()
+    else:
+        catalogo.invalidar(*pendientes["ids"])
+    for id_producto, nombre in pendientes["nombres"].items():
+        catalogo.notificar(id_producto, nombre)
+
+
+@event.listens_for(Session, "after_rollback")
+def descartar_productos_modificados(session):
+    """
+    Descarta los cambios revertidos. Las entradas se invalidan igual: una
+    lectura entre el flush y el rollback pudo guardar valores no confirmados.
+    """
+    pendientes = session.info.pop("catalogo_pendiente", None)
+    if not pendientes:
+        return
+    if pendientes["limpiar"]:
+        catalogo.limpiar()
+    else:
+        catalogo.invalidar(*pendientes["ids"])
+
+
+def obtener_producto_por_id(db: Session, id_producto: int):
+    """
+    Obtiene un producto por su ID desde el catálogo en memoria.
+    :param db: Sesión de base de datos.
+    :param id_producto: ID del producto.
+    :return: Lista con el producto, o lista vacía si no existe.
+    """
+    producto = catalogo.obtener(db, id_producto)
+    return [producto] if producto else []
+
+
+def indice_busqueda_disponible(db: Session):
+    """
+    Indica si existe el índice FTS5 de productos (PRODUCTOS_FTS).
+    El resultado positivo se guarda para no consultarlo en cada búsqueda.
+    """
+    global _indice_busqueda
+    if not _indice_busqueda:
+        _indice_busqueda = (
+            db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'PRODUCTOS_FTS'")
+            ).first()
+            is not None
+        )
+    return _indice_busqueda
+
+
+_indice_busqueda = False
+
+
+def buscar_productos(db: Session, busqueda: str, limite: int = 100):
+    """
+    Busca productos por nombre, código, marca o categoría.
+    Con tres o más caracteres usa el índice FTS5 (trigramas) ordenado por
+    relevancia; con menos, o si el índice no existe, usa LIKE.
+    :param db: Sesión de base de datos.
+    :param busqueda: Texto a buscar.
+    :param limite: Número máximo de resultados.
+    :return: Lista de productos encontrados.
+    """
     if not busqueda:
         return None
 
-    productos = (
-        db.query(
-            Productos.ID_Producto,
-            Productos.Nombre,
-            Productos.Precio_costo,
-            Productos.Precio_venta_normal,
-            Productos.Precio_venta_mayor,
-            Productos.Precio_venta_reventa,
-            Productos.Ganancia_Producto_normal,
-            Productos.Ganancia_Producto_mayor,
-            Productos.Ganancia_Producto_reventa,
-            Productos.Stock_actual,
-            Productos.Stock_min,
-            Productos.Stock_max,
-            Productos.Estado,
-            Marcas.Nombre.label("marcas"),
-            Categorias.Nombre.label("categorias"),
+    consulta = db.query(
+        Productos.ID_Producto,
+        Productos.Nombre,
+        Productos.Precio_costo,
+        Productos.Precio_venta_normal,
+        Productos.Precio_venta_mayor,
+        Productos.Precio_venta_reventa,
+        Productos.Ganancia_Producto_normal,
+        Productos.Ganancia_Producto_mayor,
+        Productos.Ganancia_Producto_reventa,
+        Productos.Stock_actual,
+        Productos.Stock_min,
+        Productos.Stock_max,
+        Productos.Estado,
+        Marcas.Nombre.label("marcas"),
+        Categorias.Nombre.label("categorias"),
+    )
+
+    if len(busqueda) >= 3 and indice_busqueda_disponible(db):
+        # La búsqueda completa se pasa como una frase: coincidencia por subcadena
+        frase = '"' + busqueda.replace('"', '""') + '"'
+        coincidencias = (
+            text(
+                # Nombre y código pesan más que marca y categoría
+                "SELECT rowid AS ID_Producto, "
+                "bm25(PRODUCTOS_FTS, 10.0, 10.0, 1.0, 1.0) AS rank "
+                "FROM PRODUCTOS_FTS WHERE PRODUCTOS_FTS MATCH :frase "
+                "ORDER BY rank LIMIT :limite"
+            )
+            .bindparams(frase=frase, limite=limite)
+            .columns(column("ID_Producto", Integer), column("rank", Float))
+            .subquery("coincidencias")
         )
-        .join(Marcas, Productos.ID_Marca == Marcas.ID_Marca)
+        return (
+            consulta.join(
+                coincidencias, coincidencias.c.ID_Producto == Productos.ID_Producto
+            )
+            .join(Marcas, Productos.ID_Marca == Marcas.ID_Marca)
+            .join(Categorias, Productos.ID_Categoria == Categorias.ID_Categoria)
+            .order_by(coincidencias.c.rank)
+            .all()
+        )
+
+    productos = (
+        consulta.join(Marcas, Productos.ID_Marca == Marcas.ID_Marca)
         .join(Categorias, Productos.ID_Categoria == Categorias.ID_Categoria)
         .filter(
             or_(
@@ -182,6 +436,7 @@ def buscar_productos(db: Session, busqueda: str):
                 Categorias.Nombre.like(f"%{busqueda}%"),
             )
         )
+        .limit(limite)
         .all()
     )
     return productos
@@ -213,11 +468,11 @@ def actualizar_producto(
         producto_existente.Precio_costo = precio_costo
 
     if precio_costo and not precio_venta_normal:
-        producto_existente.Precio_venta_normal = calcular_precio(precio_costo, 0.5)
+        producto_existente.Precio_venta_normal = calcular_precio(precio_costo, MARGEN_NORMAL)
     if precio_costo and not precio_venta_mayor:
-        producto_existente.Precio_venta_mayor = calcular_precio(precio_costo, 0.35)
+        producto_existente.Precio_venta_mayor = calcular_precio(precio_costo, MARGEN_MAYOR)
     if precio_costo and not precio_venta_reventa:
-        producto_existente.Precio_venta_reventa = calcular_precio(precio_costo, 0.31)
+        producto_existente.Precio_venta_reventa = calcular_precio(precio_costo, MARGEN_REVENTA)
 
     if precio_venta_normal:
         producto_existente.Precio_venta_normal = precio_venta_normal
@@ -258,6 +513,125 @@ def actualizar_producto(
     return producto_existente
 
 
+# Reajustar precios de varios productos a la vez
+def reajustar_precios(
+    db: Session,
+    id_marca: int = None,
+    id_categoria: int = None,
+    ids_producto=None,
+    precio_costo: float = None,
+    variacion: float = None,
+    simular: bool = False,
+):
+    """
+    Cambia el costo de todos los productos que cumplen los filtros y
+    recalcula sus tres precios de venta (con los márgenes MARGEN_NORMAL,
+    MARGEN_MAYOR y MARGEN_REVENTA, igual que actualizar_producto) y sus
+    ganancias. Todos los productos se guardan en un solo UPDATE
+    (executemany) y una sola transacción.
+    :param db: Sesión de base de datos.
+    :param id_marca: Solo productos de esta marca (opcional).
+    :param id_categoria: Solo productos de esta categoría (opcional).
+    :param ids_producto: Solo estos productos (opcional).
+    :param precio_costo: Nuevo costo para todos los productos.
+    :param variacion: Variación del costo actual (0.1 = +10 %, -0.05 = -5 %).
+    :param simular: Si es True no guarda nada y solo devuelve la vista previa.
+    :return: Lista de diccionarios con ID_Producto, Nombre y los valores
+        anteriores y nuevos de Precio_costo, Precio_venta_normal,
+        Precio_venta_mayor y Precio_venta_reventa.
+    """
+    if (precio_costo is None) == (variacion is None):
+        raise ValueError("Indique un nuevo costo o una variación, no ambos.")
+    if id_marca is None and id_categoria is None and ids_producto is None:
+        raise ValueError("Indique una marca, una categoría o una lista de productos.")
+
+    consulta = db.query(
+        Productos.ID_Producto,
+        Productos.Nombre,
+        Productos.Precio_costo,
+        Productos.Precio_venta_normal,
+        Productos.Precio_venta_mayor,
+        Productos.Precio_venta_reventa,
+    )
+    if id_marca is not None:
+        consulta = consulta.filter(Productos.ID_Marca == id_marca)
+    if id_categoria is not None:
+        consulta = consulta.filter(Productos.ID_Categoria == id_categoria)
+    if ids_producto is not None:
+        consulta = consulta.filter(Productos.ID_Producto.in_([int(i) for i in ids_producto]))
+
+    cambios = []
+    for producto in consulta.order_by(Productos.ID_Producto):
+        if precio_costo is not None:
+            nuevo_costo = redondear_monto(precio_costo)
+        else:
+            nuevo_costo = redondear_monto(producto.Precio_costo * (1 + variacion))
+        if nuevo_costo < 0:
+            raise ValueError(f"El costo del producto {producto.ID_Producto} quedaría negativo.")
+        cambios.append(
+            {
+                "ID_Producto": producto.ID_Producto,
+                "Nombre": producto.Nombre,
+                "Precio_costo": (producto.Precio_costo, nuevo_costo),
+                "Precio_venta_normal": (
+                    producto.Precio_venta_normal,
+                    calcular_precio(nuevo_costo, MARGEN_NORMAL),
+                ),
+                "Precio_venta_mayor": (
+                    producto.Precio_venta_mayor,
+                    calcular_precio(nuevo_costo, MARGEN_MAYOR),
+                ),
+                "Precio_venta_reventa": (
+                    producto.Precio_venta_reventa,
+                    calcular_precio(nuevo_costo, MARGEN_REVENTA),
+                ),
+            }
+        )
+    if simular or not cambios:
+        return cambios
+
+    def ganancia(cambio, columna):
+        return desde_centavos(a_centavos(cambio[columna][1]) - a_centavos(cambio["Precio_costo"][1]))
+
+    productos = Productos.__table__
+    dinero = productos.c.Precio_costo.type
+    try:
+        db.execute(
+            update(productos)
+            .where(productos.c.ID_Producto == bindparam("b_id_producto"))
+            .values(
+                Precio_costo=bindparam("b_costo", type_=dinero),
+                Precio_venta_normal=bindparam("b_normal", type_=dinero),
+                Precio_venta_mayor=bindparam("b_mayor", type_=dinero),
+                Precio_venta_reventa=bindparam("b_reventa", type_=dinero),
+                Ganancia_Producto_normal=bindparam("b_ganancia_normal", type_=dinero),
+                Ganancia_Producto_mayor=bindparam("b_ganancia_mayor", type_=dinero),
+                Ganancia_Producto_reventa=bindparam("b_ganancia_reventa", type_=dinero),
+            ),
+            [
+                {
+                    "b_id_producto": cambio["ID_Producto"],
+                    "b_costo": cambio["Precio_costo"][1],
+                    "b_normal": cambio["Precio_venta_normal"][1],
+                    "b_mayor": cambio["Precio_venta_mayor"][1],
+                    "b_reventa": cambio["Precio_venta_reventa"][1],
+                    "b_ganancia_normal": ganancia(cambio, "Precio_venta_normal"),
+                    "b_ganancia_mayor": ganancia(cambio, "Precio_venta_mayor"),
+                    "b_ganancia_reventa": ganancia(cambio, "Precio_venta_reventa"),
+                }
+                for cambio in cambios
+            ],
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # El UPDATE no pasa por el ORM
+    catalogo.invalidar(*(cambio["ID_Producto"] for cambio in cambios))
+    return cambios
+
+
 def eliminar_producto(db: Session, id_producto: int):
     producto_existente = (
         db.query(Productos).filter(Productos.ID_Producto == id_producto).first()
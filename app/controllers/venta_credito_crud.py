@@ -4,7 +4,8 @@ from datetime import datetime
 from app.models.venta_credito import (
     VentaCredito,
 )
-from app.models.facturas import Facturas
+from app.models.facturas import Facturas, MetodoPago
+from app.models.pago_credito import PagoCredito, TipoPago
 from app.models.usuarios import Usuarios
 from app.models.clientes import Clientes
 
@@ -66,6 +67,69 @@ def obtener_ventas_credito(db: Session):
     return ventas_credito
 
 
+# Obtener el libro de créditos (ventas con sus pagos)
+def obtener_libro_creditos(db: Session):
+    """
+    Obtiene todas las ventas a crédito con sus pagos ya agrupados, en dos
+    consultas (ventas y pagos) sin importar el tamaño de la cartera.
+    :param db: Sesión de base de datos.
+    :return: Lista de diccionarios {"venta": {...}, "pagos": [...]}.
+    """
+    ventas = (
+        db.query(
+            VentaCredito.ID_Venta_Credito,
+            VentaCredito.Total_Deuda,
+            VentaCredito.Saldo_Pendiente,
+            VentaCredito.Fecha_Registro,
+        )
+        .join(Facturas, VentaCredito.ID_Factura == Facturas.ID_Factura)
+        .join(Usuarios, Facturas.ID_Usuario == Usuarios.ID_Usuario)
+        .join(Clientes, Facturas.ID_Cliente == Clientes.ID_Cliente)
+        .order_by(VentaCredito.ID_Venta_Credito)
+        .all()
+    )
+
+    pagos = (
+        db.query(
+            PagoCredito.ID_Venta_Credito,
+            PagoCredito.ID_Pago_Credito,
+            PagoCredito.Monto,
+            PagoCredito.Fecha_Registro,
+            MetodoPago.Nombre.label("metodo_pago"),
+            TipoPago.Nombre.label("tipo_pago"),
+        )
+        .outerjoin(MetodoPago, PagoCredito.ID_Metodo_Pago == MetodoPago.ID_Metodo_Pago)
+        .outerjoin(TipoPago, PagoCredito.ID_Tipo_Pago == TipoPago.ID_Tipo_Pago)
+        .order_by(PagoCredito.ID_Venta_Credito, PagoCredito.ID_Pago_Credito)
+        .all()
+    )
+
+    pagos_por_venta = {}
+    for pago in pagos:
+        pagos_por_venta.setdefault(pago.ID_Venta_Credito, []).append(
+            {
+                "ID_Pago_Credito": pago.ID_Pago_Credito,
+                "Monto": pago.Monto,
+                "Fecha_Registro": pago.Fecha_Registro,
+                "Metodo_Pago": pago.metodo_pago or "Desconocido",
+                "Tipo_Pago": pago.tipo_pago or "Desconocido",
+            }
+        )
+
+    return [
+        {
+            "venta": {
+                "ID_Venta_Credito": venta.ID_Venta_Credito,
+                "Total_Deuda": venta.Total_Deuda,
+                "Saldo_Pendiente": venta.Saldo_Pendiente,
+                "Fecha_Registro": venta.Fecha_Registro,
+            },
+            "pagos": pagos_por_venta.get(venta.ID_Venta_Credito, []),
+        }
+        for venta in ventas
+    ]
+
+
 # Obtener una venta a crédito por ID
 def obtener_ventaCredito_id(db: Session, id_venta_credito: int):
     """
@@ -0,0 +1,305 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+
+from app.database.dinero import a_centavos, desde_centavos
+from app.models.facturas import Facturas, TipoFactura
+from app.models.detalle_facturas import DetalleFacturas
+from app.models.productos import Productos
+from app.models.tipo_ingresos import TipoIngreso
+from app.models.ventas_diarias import VentaDiaria
+
+# VENTAS_DIARIAS solo incluye las ventas cobradas: facturas con un ingreso
+# de tipo 'Venta', igual que la tabla de ingresos del análisis financiero.
+# Una factura se acumula en la misma transacción que crea su ingreso de
+# venta (al cobrarla en la venta o después). Si una factura se edita o se
+# elimina desde el ORM, los días afectados se vuelven a calcular desde el
+# detalle de facturas.
+
+# Campos de la factura que cambian el resumen
+CAMPOS_FACTURA_RESUMEN = ("ID_Tipo_Factura", "ID_Metodo_Pago", "Descuento", "Fecha_Factura")
+
+
+def repartir_descuento(descuento: int, subtotales):
+    """
+    Reparte el descuento de una factura entre sus líneas en proporción a su
+    subtotal, en centavos y sin perder ni sobrar ninguno.
+    :param descuento: Descuento en centavos.
+    :param subtotales: Subtotales de las líneas en centavos.
+    :return: Lista con el descuento de cada línea.
+    """
+    partes = [0] * len(subtotales)
+    if not descuento or not subtotales:
+        return partes
+    total = sum(subtotales)
+    if total <= 0:
+        partes[0] = descuento
+        return partes
+    partes = [descuento * subtotal // total for subtotal in subtotales]
+    # El resto del redondeo va a la línea de mayor subtotal
+    mayor = max(range(len(subtotales)), key=subtotales.__getitem__)
+    partes[mayor] += descuento - sum(partes)
+    return partes
+
+
+def _consultar_lineas(db: Session, *filtros):
+    """Líneas de las facturas cobradas con los datos que necesita el resumen."""
+    cobrada = (
+        db.query(TipoIngreso.ID_Tipo_Ingreso)
+        .filter(
+            TipoIngreso.ID_Factura == Facturas.ID_Factura,
+            TipoIngreso.Tipo_Ingreso == "Venta",
+        )
+        .exists()
+    )
+    return (
+        db.query(
+            Facturas.ID_Factura,
+            Facturas.Fecha_Factura,
+            Facturas.ID_Tipo_Factura,
+            Facturas.ID_Metodo_Pago,
+            Facturas.Descuento,
+            DetalleFacturas.ID_Producto,
+            Productos.ID_Categoria,
+            DetalleFacturas.Cantidad,
+            DetalleFacturas.Subtotal,
+            # Costo guardado en la línea; el del producto solo si no lo tiene
+            func.coalesce(DetalleFacturas.Precio_costo, Productos.Precio_costo).label("Precio_costo"),
+        )
+        .join(DetalleFacturas, DetalleFacturas.ID_Factura == Facturas.ID_Factura)
+        .outerjoin(Productos, Productos.ID_Producto == DetalleFacturas.ID_Producto)
+        .filter(
+            Facturas.ID_Tipo_Factura.isnot(None),
+            Facturas.ID_Metodo_Pago.isnot(None),
+            DetalleFacturas.ID_Producto.isnot(None),
+            cobrada,
+            *filtros,
+        )
+        .order_by(Facturas.ID_Factura)
+        .all()
+    )
+
+
+def resumir_lineas(lineas):
+    """
+    Agrupa líneas de factura por día, tipo de factura, método de pago y
+    producto. Los montos se suman en centavos.
+    :param lineas: Filas de _consultar_lineas.
+    :return: Diccionario {(fecha, tipo, metodo, producto): [categoria,
+        cantidad, ventas, costo, descuento]}.
+    """
+    facturas = {}
+    for linea in lineas:
+        facturas.setdefault(linea.ID_Factura, []).append(linea)
+
+    resumen = {}
+    for lineas_factura in facturas.values():
+        subtotales = [a_centavos(linea.Subtotal) or 0 for linea in lineas_factura]
+        descuentos = repartir_descuento(
+            a_centavos(lineas_factura[0].Descuento) or 0, subtotales
+        )
+        for linea, subtotal, descuento in zip(lineas_factura, subtotales, descuentos):
+            fecha = linea.Fecha_Factura
+            fecha = fecha.date() if isinstance(fecha, datetime) else fecha
+            clave = (fecha, linea.ID_Tipo_Factura, linea.ID_Metodo_Pago, linea.ID_Producto)
+            fila = resumen.setdefault(clave, [linea.ID_Categoria, 0, 0, 0, 0])
+            fila[1] += int(linea.Cantidad)
+            fila[2] += subtotal
+            fila[3] += int(linea.Cantidad) * (a_centavos(linea.Precio_costo) or 0)
+            fila[4] += descuento
+    return resumen
+
+
+def _acumular(db: Session, resumen):
+    """Suma el resumen a VENTAS_DIARIAS (insertando las filas que falten)."""
+    if not resumen:
+        return
+    tabla = VentaDiaria.__table__
+    consulta = sqlite_insert(tabla)
+    consulta = consulta.on_conflict_do_update(
+        index_elements=["Fecha", "ID_Tipo_Factura", "ID_Metodo_Pago", "ID_Producto"],
+        set_={
+            "ID_Categoria": consulta.excluded.ID_Categoria,
+            "Cantidad": tabla.c.Cantidad + consulta.excluded.Cantidad,
+            "Total_Ventas": tabla.c.Total_Ventas + consulta.excluded.Total_Ventas,
+            "Total_Costo": tabla.c.Total_Costo + consulta.excluded.Total_Costo,
+            "Total_Descuento": tabla.c.Total_Descuento + consulta.excluded.Total_Descuento,
+        },
+    )
+    db.execute(
+        consulta,
+        [
+            {
+                "Fecha": fecha,
+                "ID_Tipo_Factura": id_tipo_factura,
+                "ID_Metodo_Pago": id_metodo_pago,
+                "ID_Producto": id_producto,
+                "ID_Categoria": id_categoria,
+                "Cantidad": cantidad,
+                "Total_Ventas": desde_centavos(ventas),
+                "Total_Costo": desde_centavos(costo),
+                "Total_Descuento": desde_centavos(descuento),
+            }
+            for (fecha, id_tipo_factura, id_metodo_pago, id_producto), (
+                id_categoria, cantidad, ventas, costo, descuento
+            ) in resumen.items()
+        ],
+    )
+
+
+# Acumular ventas cobradas en el resumen diario
+def registrar_ventas_cobradas(db: Session, ids_factura, excluir_dias=()):
+    """
+    Suma a VENTAS_DIARIAS las facturas que se acaban de cobrar, sin
+    confirmar la transacción (se confirma junto con el ingreso).
+    :param db: Sesión de base de datos.
+    :param ids_factura: IDs de las facturas.
+    :param excluir_dias: Días que se recalculan completos y no se suman.
+    """
+    lineas = _consultar_lineas(db, Facturas.ID_Factura.in_(list(ids_factura)))
+    _acumular(
+        db,
+        resumir_lineas(l for l in lineas if _fecha_de(l.Fecha_Factura) not in excluir_dias),
+    )
+
+
+def _reconstruir_dias(db: Session, desde: date = None, hasta: date = None):
+    """Vuelve a calcular el resumen del rango de días, sin confirmar."""
+    borrar = db.query(VentaDiaria)
+    filtros = []
+    if desde is not None:
+        borrar = borrar.filter(VentaDiaria.Fecha >= desde)
+        filtros.append(Facturas.Fecha_Factura >= datetime.combine(desde, datetime.min.time()))
+    if hasta is not None:
+        borrar = borrar.filter(VentaDiaria.Fecha <= hasta)
+        filtros.append(
+            Facturas.Fecha_Factura < datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+        )
+    borrar.delete(synchronize_session=False)
+    _acumular(db, resumir_lineas(_consultar_lineas(db, *filtros)))
+
+
+# Reconstruir el resumen diario (respaldo histórico o corrección)
+def reconstruir_ventas_diarias(db: Session, desde: date = None, hasta: date = None):
+    """
+    Vuelve a calcular VENTAS_DIARIAS desde el detalle de facturas para un
+    rango de días (o para todo el histórico).
+    :param db: Sesión de base de datos.
+    :param desde: Primer día a reconstruir (opcional).
+    :param hasta: Último día a reconstruir (opcional).
+    :return: Cantidad de filas del resumen en el rango.
+    """
+    _reconstruir_dias(db, desde, hasta)
+    db.commit()
+    consulta = db.query(func.count(VentaDiaria.ID_Venta_Diaria))
+    if desde is not None:
+        consulta = consulta.filter(VentaDiaria.Fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.filter(VentaDiaria.Fecha <= hasta)
+    return consulta.scalar()
+
+
+def recalcular_dias(db: Session, dias):
+    """
+    Vuelve a calcular el resumen de cada uno de los días indicados, sin
+    confirmar la transacción.
+    :param db: Sesión de base de datos.
+    :param dias: Fechas (date o datetime) a recalcular.
+    """
+    for dia in sorted({_fecha_de(d) for d in dias if d}):
+        _reconstruir_dias(db, dia, dia)
+
+
+def _fecha_de(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+@event.listens_for(Session, "after_flush")
+def actualizar_ventas_diarias_modificadas(session, flush_context):
+    """
+    Suma las facturas con un ingreso de venta nuevo (cobradas en la venta o
+    después) y recalcula los días de las facturas editadas o eliminadas
+    desde el ORM, o cuyo ingreso de venta se eliminó.
+    """
+    ids = set()
+    dias = set()
+    cobradas = set()
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, TipoIngreso):
+            if objeto.ID_Factura is None or objeto.Tipo_Ingreso != "Venta":
+                continue
+            if objeto in session.new:
+                cobradas.add(objeto.ID_Factura)
+            else:
+                ids.add(objeto.ID_Factura)
+        elif isinstance(objeto, DetalleFacturas):
+            if objeto.ID_Factura is not None:
+                ids.add(objeto.ID_Factura)
+            historial = inspect(objeto).attrs.ID_Factura.history
+            ids.update(i for i in historial.deleted if i is not None)
+        elif isinstance(objeto, Facturas) and objeto not in session.new:
+            atributos = inspect(objeto).attrs
+            if objeto in session.deleted:
+                dias.add(_fecha_de(objeto.Fecha_Factura))
+            elif any(atributos[campo].history.has_changes() for campo in CAMPOS_FACTURA_RESUMEN):
+                ids.add(objeto.ID_Factura)
+                dias.update(_fecha_de(f) for f in atributos.Fecha_Factura.history.deleted if f)
+    if ids:
+        fechas = session.query(Facturas.Fecha_Factura).filter(Facturas.ID_Factura.in_(ids)).all()
+        dias.update(_fecha_de(fecha) for (fecha,) in fechas if fecha)
+    if dias:
+        recalcular_dias(session, dias)
+    # Los días recalculados ya incluyen las facturas cobradas en este flush
+    cobradas -= ids
+    if cobradas:
+        registrar_ventas_cobradas(session, cobradas, excluir_dias=dias)
+
+
+# Ganancias por día y tipo de factura
+def obtener_ganancias_diarias(db: Session, fecha_inicio, fecha_fin=None):
+    """
+    Obtiene las ventas, costos, descuentos y ganancias por día y tipo de
+    factura desde VENTAS_DIARIAS.
+    :param db: Sesión de base de datos.
+    :param fecha_inicio: Fecha inicial (AAAA-MM-DD).
+    :param fecha_fin: Fecha final (AAAA-MM-DD, opcional; por defecto el mismo día).
+    :return: Lista de filas con Fecha, Tipo_Factura, Unidades, Ventas,
+        Costo, Descuento y Ganancia.
+    """
+    desde = date.fromisoformat(str(fecha_inicio)[:10])
+    hasta = date.fromisoformat(str(fecha_fin)[:10]) if fecha_fin else desde
+    ventas = func.sum(VentaDiaria.Total_Ventas)
+    costo = func.sum(VentaDiaria.Total_Costo)
+    descuento = func.sum(VentaDiaria.Total_Descuento)
+    return (
+        db.query(
+            VentaDiaria.Fecha,
+            TipoFactura.Nombre.label("Tipo_Factura"),
+            func.sum(VentaDiaria.Cantidad).label("Unidades"),
+            ventas.label("Ventas"),
+            costo.label("Costo"),
+            descuento.label("Descuento"),
+            (ventas - costo - descuento).label("Ganancia"),
+        )
+        .join(TipoFactura, TipoFactura.ID_Tipo_Factura == VentaDiaria.ID_Tipo_Factura)
+        .filter(VentaDiaria.Fecha.between(desde, hasta))
+        .group_by(VentaDiaria.Fecha, TipoFactura.Nombre)
+        .order_by(VentaDiaria.Fecha, TipoFactura.Nombre)
+        .all()
+    )
+
+
+if __name__ == "__main__":
+    # Reconstrucción manual: python -m app.controllers.ventas_diarias_crud [desde [hasta]]
+    import sys
+    from app.database.database import SessionLocal, init_db
+
+    init_db()
+    argumentos = [date.fromisoformat(valor) for valor in sys.argv[1:3]]
+    db = SessionLocal()
+    try:
+        filas = reconstruir_ventas_diarias(db, *argumentos)
+        print(f"VENTAS_DIARIAS reconstruido: {filas} filas")
+    finally:
+        db.close()
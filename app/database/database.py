@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, configure_mappers
 from pathlib import Path
+import atexit
 import os
 
 # Obtener la carpeta segura para almacenar la base de datos
@@ -12,9 +13,42 @@ app_data_dir.mkdir(parents=True, exist_ok=True)  # Crea el directorio si no exis
 DATABASE_PATH = app_data_dir / "systock.db"
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"  # Formato correcto para SQLAlchemy
 
+# Perfil de conexión SQLite aplicado en cada conexión nueva.
+# Cada valor se puede sobrescribir con una variable de entorno
+# SYSTOCK_PRAGMA_<NOMBRE> (por ejemplo SYSTOCK_PRAGMA_CACHE_SIZE=-131072).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # Lectores (reportes) no bloquean al escritor (ventas)
+    "synchronous": "NORMAL",  # Seguro con WAL, evita un fsync por commit
+    "cache_size": -65536,  # Negativo = KiB (64 MB de caché de páginas)
+    "mmap_size": 268435456,  # 256 MB de lectura mapeada en memoria
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # Milisegundos de espera si otra conexión escribe
+    "foreign_keys": "ON",
+}
+
+
+def obtener_perfil_sqlite():
+    """Devuelve el perfil de PRAGMAs con las sobrescrituras del entorno."""
+    perfil = {}
+    for nombre, valor in SQLITE_PRAGMAS.items():
+        perfil[nombre] = os.getenv(f"SYSTOCK_PRAGMA_{nombre.upper()}", valor)
+    return perfil
+
+
 # Crear el motor de conexión
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
+
+@event.listens_for(engine, "connect")
+def aplicar_perfil_sqlite(dbapi_connection, connection_record):
+    """Aplica el perfil de PRAGMAs a cada conexión que abre el motor."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for nombre, valor in obtener_perfil_sqlite().items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+    finally:
+        cursor.close()
+
 # Base para los modelos
 Base = declarative_base()
 
@@ -39,6 +73,9 @@ def init_db():
         analisis_financiero,
         reporte,
         historial,
+        cola_impresion,
+        ventas_diarias,
+        movimientos_inventario,
     )  # Importar los modelos
 
     try:
@@ -47,3 +84,219 @@ def init_db():
         print(f"Error al configurar los mappers: {e}")
 
     Base.metadata.create_all(bind=engine)
+    migrar_esquema()
+    crear_indices()
+    crear_indice_busqueda()
+
+
+# Versión del esquema guardada en PRAGMA user_version. Las bases anteriores
+# (versión 0) guardaban los montos como float en pesos.
+VERSION_CENTAVOS = 1  # Montos como enteros en centavos
+VERSION_VENTAS_DIARIAS = 2  # Resumen VENTAS_DIARIAS poblado con el histórico
+VERSION_COSTO_DETALLE = 3  # Costo y ganancia guardados en DETALLE_FACTURAS
+VERSION_KARDEX = 4  # Stock inicial de cada producto en MOVIMIENTOS_INVENTARIO
+VERSION_VENTAS_COBRADAS = 5  # VENTAS_DIARIAS sin las ventas pendientes ni a crédito
+VERSION_EGRESOS_HORA_LOCAL = 6  # EGRESOS.Fecha_Egreso en hora de Bogotá y no en UTC
+VERSION_ESQUEMA = VERSION_EGRESOS_HORA_LOCAL
+
+
+def columnas_dinero():
+    """
+    Columnas de montos (tipo Dinero) de cada tabla.
+    :return: Diccionario {tabla: [columnas]}.
+    """
+    from app.database.dinero import Dinero
+
+    columnas = {}
+    for tabla in Base.metadata.sorted_tables:
+        nombres = [c.name for c in tabla.columns if isinstance(c.type, Dinero)]
+        if nombres:
+            columnas[tabla.name] = nombres
+    return columnas
+
+
+def agregar_columnas_faltantes(conexion):
+    """
+    Agrega a las tablas existentes las columnas nuevas de los modelos.
+    create_all no modifica tablas ya creadas. Solo se agregan columnas que
+    admiten NULL, las que SQLite acepta con ALTER TABLE ADD COLUMN.
+    :param conexion: Conexión dentro de la transacción de la migración.
+    """
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {
+            fila[1] for fila in conexion.execute(text(f"PRAGMA table_info({tabla.name})"))
+        }
+        if not existentes:
+            continue
+        for columna in tabla.columns:
+            if columna.name in existentes or not columna.nullable:
+                continue
+            tipo = columna.type.compile(dialect=conexion.dialect)
+            conexion.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"))
+
+
+def migrar_esquema():
+    """
+    Lleva la base a VERSION_ESQUEMA en una sola transacción: la versión se
+    guarda junto con los datos migrados, así una migración interrumpida se
+    repite completa en el siguiente arranque.
+    """
+    with engine.begin() as conexion:
+        version = conexion.execute(text("PRAGMA user_version")).scalar() or 0
+        if version >= VERSION_ESQUEMA:
+            return
+
+        agregar_columnas_faltantes(conexion)
+
+        if version < VERSION_CENTAVOS:
+            for tabla, columnas in columnas_dinero().items():
+                asignaciones = ", ".join(
+                    f"{columna} = CAST(ROUND({columna} * 100) AS INTEGER)" for columna in columnas
+                )
+                conexion.execute(text(f"UPDATE {tabla} SET {asignaciones}"))
+
+        if version < VERSION_EGRESOS_HORA_LOCAL:
+            # Fecha_Egreso se guardaba con CURRENT_TIMESTAMP de SQLite (UTC);
+            # Bogotá está en UTC-5 todo el año (sin horario de verano)
+            conexion.execute(
+                text(
+                    "UPDATE EGRESOS SET Fecha_Egreso = datetime(Fecha_Egreso, '-5 hours') "
+                    "WHERE Fecha_Egreso IS NOT NULL"
+                )
+            )
+
+        from sqlalchemy.orm import Session
+        from app.controllers.detalle_factura_crud import completar_costos_detalles
+        from app.controllers.ventas_diarias_crud import reconstruir_ventas_diarias
+        from app.controllers.movimientos_inventario_crud import (
+            conciliar_inventario,
+            registrar_saldos_inventario,
+        )
+
+        # La sesión se une a la transacción de la migración sin confirmarla
+        with Session(bind=conexion) as db:
+            if version < VERSION_COSTO_DETALLE:
+                # Las ventas anteriores no guardaban el costo: se toma el
+                # actual del producto, antes de armar el resumen diario
+                completar_costos_detalles(db)
+                db.commit()
+            if version < VERSION_VENTAS_COBRADAS:
+                # Las versiones 2 a 4 sumaban también las ventas sin cobrar
+                reconstruir_ventas_diarias(db)
+            if version < VERSION_KARDEX:
+                # El stock existente es el saldo inicial del kardex
+                conciliar_inventario(db, "Inicial")
+                registrar_saldos_inventario(db)
+                db.commit()
+
+        conexion.execute(text(f"PRAGMA user_version = {VERSION_ESQUEMA}"))
+
+
+def crear_indices():
+    """
+    Crea los índices declarados en los modelos que aún no existan.
+    create_all omite las tablas ya creadas, por lo que las bases existentes
+    no reciben índices nuevos sin este paso. Es idempotente.
+    """
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(bind=engine, checkfirst=True)
+
+
+# Índice de texto completo (FTS5, trigramas) sobre nombre, código, marca y
+# categoría de PRODUCTOS. rowid = ID_Producto. Los triggers solo se disparan
+# con cambios en columnas indexadas, no con movimientos de stock.
+PRODUCTOS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS PRODUCTOS_FTS USING fts5(
+        Nombre, Codigo, Marca, Categoria, tokenize = 'trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS PRODUCTOS_FTS_AI AFTER INSERT ON PRODUCTOS BEGIN
+        -- INSERT OR REPLACE (importación de respaldos) no dispara el DELETE
+        DELETE FROM PRODUCTOS_FTS WHERE rowid = new.ID_Producto;
+        INSERT INTO PRODUCTOS_FTS (rowid, Nombre, Codigo, Marca, Categoria)
+        VALUES (
+            new.ID_Producto, new.Nombre, CAST(new.ID_Producto AS TEXT),
+            (SELECT Nombre FROM MARCAS WHERE ID_Marca = new.ID_Marca),
+            (SELECT Nombre FROM CATEGORIAS WHERE ID_Categoria = new.ID_Categoria)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS PRODUCTOS_FTS_AU
+    AFTER UPDATE OF ID_Producto, Nombre, ID_Marca, ID_Categoria ON PRODUCTOS BEGIN
+        DELETE FROM PRODUCTOS_FTS WHERE rowid = old.ID_Producto;
+        INSERT INTO PRODUCTOS_FTS (rowid, Nombre, Codigo, Marca, Categoria)
+        VALUES (
+            new.ID_Producto, new.Nombre, CAST(new.ID_Producto AS TEXT),
+            (SELECT Nombre FROM MARCAS WHERE ID_Marca = new.ID_Marca),
+            (SELECT Nombre FROM CATEGORIAS WHERE ID_Categoria = new.ID_Categoria)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS PRODUCTOS_FTS_AD AFTER DELETE ON PRODUCTOS BEGIN
+        DELETE FROM PRODUCTOS_FTS WHERE rowid = old.ID_Producto;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS MARCAS_FTS_AU AFTER UPDATE OF Nombre ON MARCAS BEGIN
+        UPDATE PRODUCTOS_FTS SET Marca = new.Nombre
+        WHERE rowid IN (SELECT ID_Producto FROM PRODUCTOS WHERE ID_Marca = new.ID_Marca);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS CATEGORIAS_FTS_AU AFTER UPDATE OF Nombre ON CATEGORIAS BEGIN
+        UPDATE PRODUCTOS_FTS SET Categoria = new.Nombre
+        WHERE rowid IN (
+            SELECT ID_Producto FROM PRODUCTOS WHERE ID_Categoria = new.ID_Categoria
+        );
+    END
+    """,
+]
+
+
+def crear_indice_busqueda():
+    """
+    Crea el índice FTS5 de productos y sus triggers si no existen, y lo
+    llena con los productos actuales la primera vez. Es idempotente.
+    """
+    try:
+        with engine.begin() as conexion:
+            existe = conexion.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'PRODUCTOS_FTS'")
+            ).first()
+            for sentencia in PRODUCTOS_FTS_DDL:
+                conexion.execute(text(sentencia))
+            if not existe:
+                conexion.execute(
+                    text(
+                        """
+                        INSERT INTO PRODUCTOS_FTS (rowid, Nombre, Codigo, Marca, Categoria)
+                        SELECT p.ID_Producto, p.Nombre, CAST(p.ID_Producto AS TEXT),
+                               m.Nombre, c.Nombre
+                        FROM PRODUCTOS p
+                        LEFT JOIN MARCAS m ON m.ID_Marca = p.ID_Marca
+                        LEFT JOIN CATEGORIAS c ON c.ID_Categoria = p.ID_Categoria
+                        """
+                    )
+                )
+    except Exception as e:
+        # SQLite sin FTS5: buscar_productos usa la búsqueda con LIKE
+        print(f"Error al crear el índice de búsqueda de productos: {e}")
+
+
+def cerrar_db():
+    """Optimiza las estadísticas del planificador y cierra las conexiones."""
+    try:
+        with engine.connect() as conexion:
+            conexion.execute(text("PRAGMA optimize"))
+            conexion.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    except Exception as e:
+        print(f"Error al optimizar la base de datos: {e}")
+    engine.dispose()
+
+
+atexit.register(cerrar_db)
@@ -0,0 +1,92 @@
+import operator
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import Float, Integer, Numeric
+from sqlalchemy.types import TypeDecorator
+
+# Los montos se guardan como enteros en centavos: las sumas y comparaciones
+# en SQLite son exactas y no se arrastran errores de redondeo de float. Los
+# modelos siguen entregando float (pesos) para no cambiar las vistas.
+
+CENTAVOS = 100
+_CENTAVO = Decimal("0.01")
+
+# Operaciones en las que el otro operando es una cantidad, no un monto
+_ESCALARES = (operator.mul, operator.truediv, operator.floordiv)
+
+
+def a_centavos(valor):
+    """
+    Convierte un monto a centavos (redondeo comercial a dos decimales).
+    Acepta números o textos con formato de miles ("$ 1,500.50").
+    :param valor: Monto en pesos.
+    :return: Entero en centavos o None si el valor es None o vacío.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.replace("$", "").replace(",", "").strip()
+        if not valor:
+            return None
+    try:
+        monto = Decimal(str(valor)).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Monto no válido: {valor!r}")
+    return int(monto * CENTAVOS)
+
+
+def desde_centavos(centavos):
+    """
+    Convierte centavos a pesos.
+    :param centavos: Entero en centavos (o None).
+    :return: Monto en pesos como float, o None.
+    """
+    if centavos is None:
+        return None
+    return round(centavos) / CENTAVOS
+
+
+def redondear_monto(valor):
+    """Redondea un monto a centavos y lo devuelve en pesos."""
+    return desde_centavos(a_centavos(valor))
+
+
+def sumar_montos(valores):
+    """Suma montos en centavos (sin error acumulado) y devuelve pesos."""
+    return desde_centavos(sum(a_centavos(valor) or 0 for valor in valores))
+
+
+def montos_iguales(a, b):
+    """Compara dos montos al centavo."""
+    return a_centavos(a or 0) == a_centavos(b or 0)
+
+
+class Dinero(TypeDecorator):
+    """Monto en pesos guardado como entero en centavos."""
+
+    impl = Integer
+    cache_ok = True
+
+    class comparator_factory(Integer.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            otro = other_comparator.type
+            if op in _ESCALARES:
+                if isinstance(otro, Dinero):
+                    # Monto / monto es una proporción, monto * monto no tiene unidad
+                    return op, Float()
+                return op, self.type
+            if op in (operator.add, operator.sub) and isinstance(otro, (Dinero, Integer, Numeric)):
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    def coerce_compared_value(self, op, value):
+        # Los literales se expresan en pesos salvo cuando multiplican o dividen
+        if op in _ESCALARES:
+            return Numeric() if isinstance(value, (float, Decimal)) else Integer()
+        return self
+
+    def process_bind_param(self, value, dialect):
+        return a_centavos(value)
+
+    def process_result_value(self, value, dialect):
+        return desde_centavos(value)
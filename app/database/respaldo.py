@@ -0,0 +1,320 @@
+import glob
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+
+from app.database.database import (
+    DATABASE_PATH,
+    VERSION_CENTAVOS,
+    VERSION_EGRESOS_HORA_LOCAL,
+    Base,
+    columnas_dinero,
+)
+
+# Páginas copiadas por paso y pausa entre pasos. Entre paso y paso SQLite
+# libera el bloqueo de lectura, así las ventas pueden escribir mientras
+# se genera el respaldo.
+RESPALDO_PAGINAS_POR_PASO = int(os.getenv("SYSTOCK_RESPALDO_PAGINAS", 256))
+RESPALDO_PAUSA = float(os.getenv("SYSTOCK_RESPALDO_PAUSA", 0.01))
+
+# Cantidad de respaldos automáticos que se conservan en la carpeta
+RESPALDO_RETENCION = int(os.getenv("SYSTOCK_RESPALDO_RETENCION", 14))
+
+EXTENSION_CHECKSUM = ".sha256"
+
+# Filas copiadas por transacción al importar un respaldo
+RESPALDO_FILAS_POR_LOTE = int(os.getenv("SYSTOCK_RESPALDO_FILAS_POR_LOTE", 5000))
+
+# Tablas que no se copian al importar: el resumen diario y los saldos del
+# kardex se recalculan y la bandeja de impresión es propia de cada equipo
+TABLAS_NO_IMPORTADAS = {"VENTAS_DIARIAS", "COLA_IMPRESION", "SALDOS_INVENTARIO"}
+
+
+def calcular_checksum(ruta, bloque=1024 * 1024):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for trozo in iter(lambda: archivo.read(bloque), b""):
+            sha.update(trozo)
+    return sha.hexdigest()
+
+
+def crear_respaldo(
+    destino,
+    comprimir=False,
+    origen=DATABASE_PATH,
+    paginas_por_paso=RESPALDO_PAGINAS_POR_PASO,
+    pausa=RESPALDO_PAUSA,
+    informar=None,
+):
+    """
+    Crea un respaldo consistente de la base de datos en uso con la API de
+    respaldo de SQLite (sqlite3.Connection.backup), por pasos de pocas
+    páginas para no bloquear a las demás conexiones.
+
+    El archivo se escribe con otro nombre y se renombra al terminar, así
+    nunca queda un respaldo a medias con el nombre final. Junto al respaldo
+    se guarda su SHA-256 en un archivo <respaldo>.sha256.
+
+    :param destino: Ruta del respaldo (.db). Si se comprime se agrega ".gz".
+    :param comprimir: Si es True el respaldo se guarda comprimido con gzip.
+    :param origen: Base de datos a respaldar.
+    :param paginas_por_paso: Páginas copiadas en cada paso.
+    :param pausa: Segundos de espera entre pasos.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Diccionario con la ruta, el checksum y el tamaño del respaldo.
+    """
+    destino = str(destino)
+    if comprimir and not destino.endswith(".gz"):
+        destino += ".gz"
+    carpeta = os.path.dirname(destino)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+
+    temporal_db = destino + ".tmp"
+
+    def progreso(estado, restantes, total):
+        if informar and total:
+            informar((total - restantes) * 90 / total, "Copiando páginas")
+        if restantes and pausa:
+            # sqlite3 solo espera entre pasos si la base está ocupada; la
+            # pausa aquí deja espacio a las escrituras de las ventas
+            time.sleep(pausa)
+
+    fuente = sqlite3.connect(str(origen), timeout=30, isolation_level=None)
+    copia = sqlite3.connect(temporal_db)
+    try:
+        # Con WAL, una transacción de lectura abierta fija la instantánea que
+        # se copia: las ventas siguen escribiendo en el WAL y el respaldo no
+        # se reinicia en cada paso por cambios de otras conexiones.
+        fuente.execute("BEGIN")
+        fuente.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        fuente.backup(copia, pages=paginas_por_paso, progress=progreso)
+        resultado = copia.execute("PRAGMA quick_check").fetchone()[0]
+        if resultado != "ok":
+            raise sqlite3.DatabaseError(f"El respaldo no pasó la verificación: {resultado}")
+        # El respaldo es un archivo suelto: sin WAL pendiente
+        copia.execute("PRAGMA journal_mode=DELETE")
+    except Exception:
+        copia.close()
+        _eliminar(temporal_db)
+        raise
+    finally:
+        fuente.rollback()
+        fuente.close()
+    copia.close()
+
+    if comprimir:
+        if informar:
+            informar(92, "Comprimiendo")
+        temporal_gz = destino + ".tmp.gz"
+        try:
+            with open(temporal_db, "rb") as entrada, gzip.open(temporal_gz, "wb", compresslevel=6) as salida:
+                shutil.copyfileobj(entrada, salida, 1024 * 1024)
+        finally:
+            _eliminar(temporal_db)
+        temporal = temporal_gz
+    else:
+        temporal = temporal_db
+
+    if informar:
+        informar(96, "Verificando")
+    checksum = calcular_checksum(temporal)
+    os.replace(temporal, destino)
+    with open(destino + EXTENSION_CHECKSUM, "w", encoding="utf-8") as archivo:
+        archivo.write(f"{checksum}  {os.path.basename(destino)}\n")
+
+    return {"ruta": destino, "checksum": checksum, "tamano": os.path.getsize(destino)}
+
+
+def verificar_respaldo(ruta):
+    """
+    Verifica un respaldo contra su archivo .sha256.
+    :param ruta: Ruta del respaldo.
+    :return: True si el checksum coincide, False si no coincide o no existe.
+    """
+    ruta = str(ruta)
+    ruta_checksum = ruta + EXTENSION_CHECKSUM
+    if not os.path.exists(ruta) or not os.path.exists(ruta_checksum):
+        return False
+    with open(ruta_checksum, encoding="utf-8") as archivo:
+        esperado = archivo.read().split()[0]
+    return calcular_checksum(ruta) == esperado
+
+
+def descomprimir_respaldo(ruta, destino):
+    """
+    Descomprime un respaldo .gz en `destino` para poder abrirlo con sqlite3.
+    :return: Ruta del archivo descomprimido.
+    """
+    with gzip.open(ruta, "rb") as entrada, open(destino, "wb") as salida:
+        shutil.copyfileobj(entrada, salida, 1024 * 1024)
+    return destino
+
+
+def _columna(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def fusionar_respaldo(
+    ruta_respaldo,
+    destino=DATABASE_PATH,
+    filas_por_lote=RESPALDO_FILAS_POR_LOTE,
+    informar=None,
+):
+    """
+    Copia los datos de un respaldo a la base en uso sin borrar lo que ya
+    tiene. El respaldo se adjunta con ATTACH DATABASE y cada tabla se copia
+    con INSERT ... SELECT, en orden de dependencias (primero las tablas
+    referenciadas) y por lotes de filas, una transacción por lote para no
+    bloquear las ventas.
+
+    Las filas cuyo ID ya existe se actualizan con los datos del respaldo;
+    las que chocan con otra restricción única se omiten. Solo se copian las
+    columnas que existen en ambas bases. Los montos de respaldos anteriores a
+    VERSION_CENTAVOS se convierten a centavos y las fechas de egresos de
+    respaldos anteriores a VERSION_EGRESOS_HORA_LOCAL pasan de UTC a la hora
+    de Bogotá. Si la copia se interrumpe, los
+    lotes ya confirmados quedan guardados y se puede volver a importar.
+
+    :param ruta_respaldo: Ruta del respaldo (.db sin comprimir).
+    :param destino: Base de datos donde se copian los datos.
+    :param filas_por_lote: Filas copiadas por transacción.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Diccionario con "tablas" ({tabla: {"filas", "existentes",
+        "omitidas"}}) y "violaciones_fk" (lista de (tabla, rowid, tabla_padre)
+        que quedaron sin su registro relacionado).
+    """
+    conexion = sqlite3.connect(str(destino), timeout=30, isolation_level=None)
+    try:
+        conexion.execute("ATTACH DATABASE ? AS respaldo", (str(ruta_respaldo),))
+        version = conexion.execute("PRAGMA respaldo.user_version").fetchone()[0]
+        montos = columnas_dinero() if version < VERSION_CENTAVOS else {}
+        # Bogotá está en UTC-5 todo el año (sin horario de verano)
+        fechas_utc = {"EGRESOS": ["Fecha_Egreso"]} if version < VERSION_EGRESOS_HORA_LOCAL else {}
+        tablas_respaldo = {
+            nombre
+            for (nombre,) in conexion.execute(
+                "SELECT name FROM respaldo.sqlite_master WHERE type = 'table'"
+            )
+        }
+
+        # sorted_tables ordena las tablas por sus claves foráneas
+        tablas = [
+            tabla
+            for tabla in Base.metadata.sorted_tables
+            if tabla.name in tablas_respaldo and tabla.name not in TABLAS_NO_IMPORTADAS
+        ]
+        totales = {
+            tabla.name: conexion.execute(f"SELECT COUNT(*) FROM respaldo.{tabla.name}").fetchone()[0]
+            for tabla in tablas
+        }
+        total = sum(totales.values()) or 1
+        copiadas = 0
+
+        resultado = {"tablas": {}, "violaciones_fk": []}
+        for tabla in tablas:
+            columnas_respaldo = {
+                fila[1] for fila in conexion.execute(f"PRAGMA respaldo.table_info({tabla.name})")
+            }
+            columnas = [c.name for c in tabla.columns if c.name in columnas_respaldo]
+            claves = [c.name for c in tabla.primary_key.columns]
+            if not columnas or not set(claves) <= set(columnas):
+                continue
+
+            lista_columnas = ", ".join(_columna(c) for c in columnas)
+            valores = ", ".join(
+                f"CAST(ROUND(r.{_columna(c)} * 100) AS INTEGER)"
+                if c in montos.get(tabla.name, ())
+                else f"datetime(r.{_columna(c)}, '-5 hours')"
+                if c in fechas_utc.get(tabla.name, ())
+                else f"r.{_columna(c)}"
+                for c in columnas
+            )
+            actualizar = ", ".join(
+                f"{_columna(c)} = excluded.{_columna(c)}" for c in columnas if c not in claves
+            )
+            al_repetirse = f"DO UPDATE SET {actualizar}" if actualizar else "DO NOTHING"
+            copiar = (
+                f"INSERT INTO main.{tabla.name} ({lista_columnas}) "
+                f"SELECT {valores} FROM respaldo.{tabla.name} AS r "
+                "WHERE r.rowid > ? AND r.rowid <= ? "
+                f"ON CONFLICT ({', '.join(_columna(c) for c in claves)}) {al_repetirse} "
+                "ON CONFLICT DO NOTHING"
+            )
+            contar_existentes = (
+                f"SELECT COUNT(*) FROM respaldo.{tabla.name} AS r "
+                f"JOIN main.{tabla.name} AS m ON "
+                + " AND ".join(f"m.{_columna(c)} = r.{_columna(c)}" for c in claves)
+                + " WHERE r.rowid > ? AND r.rowid <= ?"
+            )
+
+            estadisticas = {"filas": 0, "existentes": 0, "omitidas": 0}
+            desde = 0
+            while True:
+                hasta, filas = conexion.execute(
+                    f"SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM respaldo.{tabla.name} "
+                    "WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                    (desde, filas_por_lote),
+                ).fetchone()
+                if not filas:
+                    break
+
+                conexion.execute("BEGIN IMMEDIATE")
+                try:
+                    existentes = conexion.execute(contar_existentes, (desde, hasta)).fetchone()[0]
+                    # rowcount no cuenta las filas que escriben los triggers
+                    escritas = conexion.execute(copiar, (desde, hasta)).rowcount
+                    conexion.execute("COMMIT")
+                except Exception:
+                    conexion.execute("ROLLBACK")
+                    raise
+
+                estadisticas["filas"] += escritas
+                estadisticas["existentes"] += existentes
+                estadisticas["omitidas"] += filas - escritas
+                desde = hasta
+                copiadas += filas
+                if informar:
+                    informar(copiadas * 95 / total, f"Importando {tabla.name}")
+
+            resultado["tablas"][tabla.name] = estadisticas
+
+        # Las claves foráneas no se verifican fila por fila durante la copia
+        # (la conexión no las activa); se revisan al final
+        for nombre, rowid, padre, _ in conexion.execute("PRAGMA main.foreign_key_check"):
+            resultado["violaciones_fk"].append((nombre, rowid, padre))
+        return resultado
+    finally:
+        conexion.close()
+
+
+def rotar_respaldos(carpeta, patron="Backup_*", conservar=RESPALDO_RETENCION):
+    """
+    Elimina los respaldos más antiguos de la carpeta y conserva los últimos
+    `conservar` (con su archivo .sha256).
+    :return: Lista de respaldos eliminados.
+    """
+    respaldos = [
+        ruta
+        for ruta in glob.glob(os.path.join(str(carpeta), patron))
+        if ruta.endswith((".db", ".db.gz"))
+    ]
+    respaldos.sort(key=os.path.getmtime, reverse=True)
+
+    eliminados = []
+    for ruta in respaldos[conservar:]:
+        _eliminar(ruta)
+        _eliminar(ruta + EXTENSION_CHECKSUM)
+        eliminados.append(ruta)
+    return eliminados
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
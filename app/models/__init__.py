@@ -12,3 +12,6 @@ from .egresos import Egresos
 from .analisis_financiero import AnalisisFinanciero
 from .reporte import Reporte
 from .historial import HistorialModificacion, HistorialInicio
+from .cola_impresion import TrabajoImpresion
+from .ventas_diarias import VentaDiaria
+from .movimientos_inventario import MovimientoInventario, SaldoInventario
@@ -1,13 +1,14 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 
 
 class AnalisisFinanciero(Base):
     __tablename__ = "ANALISIS_FINANCIERO"
 
     ID_Analisis_Financiero = Column(Integer, primary_key=True, autoincrement=True)
-    Ganancia = Column(Float, nullable=False)
+    Ganancia = Column(Dinero, nullable=False)
 
     ID_Egreso = Column(Integer, ForeignKey("EGRESOS.ID_Egreso"))
     ID_Tipo_Ingreso = Column(Integer, ForeignKey("TIPO_INGRESO.ID_Tipo_Ingreso"))
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, Float, DateTime, Boolean, ForeignKey, String
+from sqlalchemy import Column, Integer, DateTime, Boolean, ForeignKey, String
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 from datetime import datetime
 from pytz import timezone
 
@@ -15,14 +16,14 @@ class Caja(Base):
     __tablename__ = "CAJA"
 
     ID_Caja = Column(Integer, primary_key=True, autoincrement=True)
-    Monto_Base = Column(Float, nullable=False)
-    Monto_Efectivo = Column(Float, nullable=True)
-    Monto_Transaccion = Column(Float, nullable=True)
-    Monto_Final_calculado = Column(Float, nullable=True)
+    Monto_Base = Column(Dinero, nullable=False)
+    Monto_Efectivo = Column(Dinero, nullable=True)
+    Monto_Transaccion = Column(Dinero, nullable=True)
+    Monto_Final_calculado = Column(Dinero, nullable=True)
     # Las fechas se generan con el sistema de apertura?
     Fecha_Apertura = Column(DateTime, default=get_local_time)
     Fecha_Cierre = Column(DateTime, nullable=True)
-    Estado = Column(Boolean, nullable=False)
+    Estado = Column(Boolean, nullable=False, index=True)
 
     ID_Usuario = Column(String, ForeignKey("USUARIOS.ID_Usuario"))
 
@@ -0,0 +1,44 @@
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
+from app.database.database import Base
+from datetime import datetime
+
+
+class TrabajoImpresion(Base):
+    """
+    Bandeja de salida de impresión: cada ticket se guarda aquí antes de
+    enviarlo a la impresora, así sobrevive a un cierre de la aplicación y
+    se reintenta si la impresora no responde.
+    """
+
+    __tablename__ = "COLA_IMPRESION"
+
+    ID_Trabajo = Column(Integer, primary_key=True, autoincrement=True)
+    Titulo = Column(String(100), nullable=False)
+    # Documento serializado en JSON (lista de comandos de impresión)
+    Documento = Column(Text, nullable=False)
+    Estado = Column(String(20), nullable=False, default="PENDIENTE")
+    Intentos = Column(Integer, nullable=False, default=0)
+    Ultimo_Error = Column(String(255), nullable=True)
+    Fecha_Creacion = Column(DateTime, default=datetime.now)
+    Proximo_Intento = Column(DateTime, default=datetime.now)
+    Fecha_Impresion = Column(DateTime, nullable=True)
+
+    # Al eliminar la factura el ticket queda en la bandeja sin referencia
+    ID_Factura = Column(
+        Integer, ForeignKey("FACTURA.ID_Factura", ondelete="SET NULL"), nullable=True, index=True
+    )
+
+    __table_args__ = (
+        CheckConstraint("Estado IN ('PENDIENTE', 'IMPRESO')"),
+        # El trabajador busca los pendientes por fecha de reintento
+        Index("ix_COLA_IMPRESION_Estado_Proximo_Intento", "Estado", "Proximo_Intento"),
+    )
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 
 
 class DetalleFacturas(Base):
@@ -8,11 +9,15 @@ class DetalleFacturas(Base):
 
     ID_Detalle_Factura = Column(Integer, primary_key=True, autoincrement=True)
     Cantidad = Column(Integer, nullable=False)
-    Precio_unitario = Column(Float, nullable=False)
-    Subtotal = Column(Float, nullable=False)
+    Precio_unitario = Column(Dinero, nullable=False)
+    Subtotal = Column(Dinero, nullable=False)
+    # Costo unitario y ganancia de la línea al momento de la venta: los
+    # reportes no dependen del precio actual del producto
+    Precio_costo = Column(Dinero, nullable=True)
+    Ganancia = Column(Dinero, nullable=True)
 
-    ID_Producto = Column(Integer, ForeignKey("PRODUCTOS.ID_Producto"))
-    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"))
+    ID_Producto = Column(Integer, ForeignKey("PRODUCTOS.ID_Producto"), index=True)
+    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"), index=True)
 
     # Relaciones
     productos = relationship("Productos", back_populates="detallefacturas")
@@ -1,6 +1,16 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, func
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
+from datetime import datetime
+from pytz import timezone
+
+
+def get_local_time():
+    # Misma hora local que la apertura de caja y las facturas
+    local_tz = timezone("America/Bogota")
+    now = datetime.now(local_tz)
+    return now.replace(microsecond=0)
 
 
 class Egresos(Base):
@@ -8,9 +18,9 @@ class Egresos(Base):
 
     ID_Egreso = Column(Integer, primary_key=True, autoincrement=True)
     Tipo_Egreso = Column(String(50), nullable=False)
-    Fecha_Egreso = Column(DateTime, default=func.now())
+    Fecha_Egreso = Column(DateTime, default=get_local_time, index=True)
     Descripcion = Column(String(255), nullable=True)
-    Monto_Egreso = Column(Float, nullable=False)
+    Monto_Egreso = Column(Dinero, nullable=False)
 
     ID_Metodo_Pago = Column(Integer, ForeignKey("METODO_PAGO.ID_Metodo_Pago"))
 
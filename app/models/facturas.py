@@ -2,7 +2,6 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
-    Float,
     ForeignKey,
     DateTime,
     Boolean,
@@ -11,6 +10,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
+from app.database.dinero import Dinero
 from datetime import datetime
 from pytz import timezone
 
@@ -26,10 +26,10 @@ class Facturas(Base):
     __tablename__ = "FACTURA"
 
     ID_Factura = Column(Integer, primary_key=True, autoincrement=True)
-    Fecha_Factura = Column(DateTime(timezone=True), default=get_local_time)
-    Monto_efectivo = Column(Float, nullable=False)
-    Monto_TRANSACCION = Column(Float, nullable=False)
-    Descuento = Column(Float, nullable=False)
+    Fecha_Factura = Column(DateTime(timezone=True), default=get_local_time, index=True)
+    Monto_efectivo = Column(Dinero, nullable=False)
+    Monto_TRANSACCION = Column(Dinero, nullable=False)
+    Descuento = Column(Dinero, nullable=False)
     Estado = Column(Boolean, nullable=False)
     Domicilio = Column(Boolean)
 
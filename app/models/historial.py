@@ -21,7 +21,7 @@ class HistorialModificacion(Base):
     Fecha_Modificacion = Column(DateTime, default=get_local_time)
     Descripcion = Column(String(255), nullable=True)
 
-    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"))
+    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"), index=True)
     ID_Usuario = Column(String, ForeignKey("USUARIOS.ID_Usuario"))
 
     # Relaciones
@@ -7,7 +7,9 @@ class Ingresos(Base):
     __tablename__ = "INGRESOS"
 
     ID_Ingreso = Column(Integer, primary_key=True, autoincrement=True)
-    ID_Tipo_Ingreso = Column(Integer, ForeignKey("TIPO_INGRESO.ID_Tipo_Ingreso"))
+    ID_Tipo_Ingreso = Column(
+        Integer, ForeignKey("TIPO_INGRESO.ID_Tipo_Ingreso"), index=True
+    )
 
     # Relaciones
     tipoingreso = relationship("TipoIngreso", back_populates="ingresos")
@@ -0,0 +1,61 @@
+from sqlalchemy import CheckConstraint, Column, DateTime, Index, Integer, String
+from app.database.database import Base
+from datetime import datetime
+from pytz import timezone
+
+
+def get_local_time():
+    # Misma zona horaria que las facturas
+    local_tz = timezone("America/Bogota")
+    now = datetime.now(local_tz)
+    return now.replace(microsecond=0)
+
+
+class MovimientoInventario(Base):
+    """
+    Kardex: cada cambio de stock de un producto queda como un movimiento con
+    la cantidad que entra (positiva) o sale (negativa). Solo se agregan
+    filas; PRODUCTOS.Stock_actual es la suma de los movimientos.
+    """
+
+    __tablename__ = "MOVIMIENTOS_INVENTARIO"
+
+    ID_Movimiento = Column(Integer, primary_key=True, autoincrement=True)
+    Fecha = Column(DateTime(timezone=True), default=get_local_time, nullable=False, index=True)
+    Tipo = Column(String(20), nullable=False)
+    Cantidad = Column(Integer, nullable=False)
+
+    # Sin llaves foráneas: el histórico se conserva aunque el producto o la
+    # factura se eliminen (las cancelaciones borran la factura)
+    ID_Producto = Column(Integer, nullable=False)
+    ID_Factura = Column(Integer, nullable=True, index=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "Tipo IN ('Inicial', 'Venta', 'Cancelacion', 'Edicion', 'Ajuste', 'Cambio', 'Importacion')"
+        ),
+        # Movimientos de un producto en un rango de fechas (rotación)
+        Index("ix_MOVIMIENTOS_INVENTARIO_Producto_Fecha", "ID_Producto", "Fecha"),
+    )
+
+
+class SaldoInventario(Base):
+    """
+    Punto de control del kardex: saldo de un producto después de un
+    movimiento. El stock a una fecha es el último saldo anterior más los
+    movimientos posteriores, sin sumar todo el histórico.
+    """
+
+    __tablename__ = "SALDOS_INVENTARIO"
+
+    ID_Saldo = Column(Integer, primary_key=True, autoincrement=True)
+    ID_Producto = Column(Integer, nullable=False)
+    # Último movimiento incluido en el saldo
+    ID_Movimiento = Column(Integer, nullable=False)
+    Fecha = Column(DateTime(timezone=True), nullable=False)
+    Saldo = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_SALDOS_INVENTARIO_Producto_Movimiento", "ID_Producto", "ID_Movimiento"),
+        Index("ix_SALDOS_INVENTARIO_Producto_Fecha", "ID_Producto", "Fecha"),
+    )
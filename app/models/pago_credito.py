@@ -1,7 +1,6 @@
 from sqlalchemy import (
     Column,
     Integer,
-    Float,
     ForeignKey,
     DateTime,
     String,
@@ -10,6 +9,7 @@ from sqlalchemy import (
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 from datetime import datetime
 from pytz import timezone
 
@@ -25,10 +25,12 @@ class PagoCredito(Base):
     __tablename__ = "PAGO_CREDITO"
 
     ID_Pago_Credito = Column(Integer, primary_key=True, autoincrement=True)
-    Monto = Column(Float, nullable=False)
-    Fecha_Registro = Column(DateTime, default=get_local_time)
+    Monto = Column(Dinero, nullable=False)
+    Fecha_Registro = Column(DateTime, default=get_local_time, index=True)
 
-    ID_Venta_Credito = Column(Integer, ForeignKey("VENTA_CREDITO.ID_Venta_Credito"))
+    ID_Venta_Credito = Column(
+        Integer, ForeignKey("VENTA_CREDITO.ID_Venta_Credito"), index=True
+    )
     ID_Metodo_Pago = Column(Integer, ForeignKey("METODO_PAGO.ID_Metodo_Pago"))
     ID_Tipo_Pago = Column(Integer, ForeignKey("TIPO_PAGO.ID_Tipo_Pago"))
 
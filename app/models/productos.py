@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 
 
 class Productos(Base):
@@ -9,15 +10,15 @@ class Productos(Base):
     ID_Producto = Column(Integer, primary_key=True, index=True)
     Nombre = Column(String, nullable=False)
 
-    Precio_costo = Column(Float, nullable=False)
+    Precio_costo = Column(Dinero, nullable=False)
 
-    Precio_venta_normal = Column(Float, nullable=False)
-    Precio_venta_mayor = Column(Float, nullable=False)
-    Precio_venta_reventa = Column(Float, nullable=False)
+    Precio_venta_normal = Column(Dinero, nullable=False)
+    Precio_venta_mayor = Column(Dinero, nullable=False)
+    Precio_venta_reventa = Column(Dinero, nullable=False)
 
-    Ganancia_Producto_normal = Column(Float, nullable=False)
-    Ganancia_Producto_mayor = Column(Float, nullable=False)
-    Ganancia_Producto_reventa = Column(Float, nullable=False)
+    Ganancia_Producto_normal = Column(Dinero, nullable=False)
+    Ganancia_Producto_mayor = Column(Dinero, nullable=False)
+    Ganancia_Producto_reventa = Column(Dinero, nullable=False)
 
     Stock_actual = Column(Integer, nullable=False)
     Stock_min = Column(Integer, nullable=False)
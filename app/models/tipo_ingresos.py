@@ -11,8 +11,10 @@ class TipoIngreso(Base):
 
     __table_args__ = (CheckConstraint("Tipo_Ingreso IN ('Venta', 'Abono')"),)
 
-    ID_Pago_Credito = Column(Integer, ForeignKey("PAGO_CREDITO.ID_Pago_Credito"))
-    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"))
+    ID_Pago_Credito = Column(
+        Integer, ForeignKey("PAGO_CREDITO.ID_Pago_Credito"), index=True
+    )
+    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"), index=True)
 
     # Relaciones
     pagocredito = relationship("PagoCredito", back_populates="tipoingreso")
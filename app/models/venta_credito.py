@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from app.database.dinero import Dinero
 from datetime import datetime
 from pytz import timezone
 
@@ -17,12 +18,14 @@ class VentaCredito(Base):
     __tablename__ = "VENTA_CREDITO"
 
     ID_Venta_Credito = Column(Integer, primary_key=True, autoincrement=True)
-    Total_Deuda = Column(Float, nullable=False)
-    Saldo_Pendiente = Column(Float, nullable=False)
+    Total_Deuda = Column(Dinero, nullable=False)
+    Saldo_Pendiente = Column(Dinero, nullable=False)
     Fecha_Registro = Column(DateTime, default=get_local_time)
     Fecha_Limite = Column(DateTime, nullable=True)
 
-    ID_Factura = Column(Integer, ForeignKey("FACTURA.ID_Factura"), nullable=False)
+    ID_Factura = Column(
+        Integer, ForeignKey("FACTURA.ID_Factura"), nullable=False, index=True
+    )
 
     # Relaciones
     facturas = relationship("Facturas", back_populates="ventacredito")
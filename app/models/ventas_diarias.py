@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, UniqueConstraint
+from app.database.database import Base
+from app.database.dinero import Dinero
+
+
+class VentaDiaria(Base):
+    """
+    Resumen de ventas por día, tipo de factura, método de pago y producto.
+    Se acumula al registrar cada venta; los reportes lo leen en lugar de
+    recorrer todo el detalle de facturas.
+    """
+
+    __tablename__ = "VENTAS_DIARIAS"
+
+    ID_Venta_Diaria = Column(Integer, primary_key=True, autoincrement=True)
+    Fecha = Column(Date, nullable=False)
+
+    ID_Tipo_Factura = Column(Integer, ForeignKey("TIPO_FACTURA.ID_Tipo_Factura"), nullable=False)
+    ID_Metodo_Pago = Column(Integer, ForeignKey("METODO_PAGO.ID_Metodo_Pago"), nullable=False)
+    # Sin llave foránea: el histórico se conserva aunque el producto o la
+    # categoría se eliminen
+    ID_Producto = Column(Integer, nullable=False)
+    ID_Categoria = Column(Integer, nullable=True, index=True)
+
+    Cantidad = Column(Integer, nullable=False, default=0)
+    Total_Ventas = Column(Dinero, nullable=False, default=0)
+    # Costo de los productos al momento de la venta
+    Total_Costo = Column(Dinero, nullable=False, default=0)
+    # Descuento de la factura repartido entre sus productos
+    Total_Descuento = Column(Dinero, nullable=False, default=0)
+
+    __table_args__ = (
+        # También sirve de índice para filtrar por rango de fechas
+        UniqueConstraint(
+            "Fecha", "ID_Tipo_Factura", "ID_Metodo_Pago", "ID_Producto",
+            name="uq_VENTAS_DIARIAS_Fecha_Tipo_Metodo_Producto",
+        ),
+    )
@@ -13,15 +13,15 @@ from reportlab.platypus import Image
 from reportlab.platypus import PageBreak, KeepTogether
 from datetime import datetime
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
-from tkinter import  filedialog
-from tkinter import messagebox
 from datetime import datetime
-import matplotlib.pyplot as plt
-import tkinter as tk
+from matplotlib.figure import Figure
+from io import BytesIO
 import numpy as np
 import os
 import tempfile
 
+from ..database.dinero import sumar_montos
+
 
 def generar_pdf_caja_ingresos(caja, ingresos):
     """Genera un PDF estilizado con la información de la caja y los ingresos registrados."""
@@ -102,8 +102,8 @@ def generar_pdf_caja_ingresos(caja, ingresos):
             ])
 
         # Calcular totales
-        total_efectivo = sum(i.monto_efectivo if i.monto_efectivo is not None else 0 for i in ingresos)
-        total_transferencia = sum(i.monto_transaccion if i.monto_transaccion is not None else 0 for i in ingresos)
+        total_efectivo = sumar_montos(i.monto_efectivo for i in ingresos)
+        total_transferencia = sumar_montos(i.monto_transaccion for i in ingresos)
         total_general = total_efectivo + total_transferencia
 
         # Agregar fila de totales
@@ -132,8 +132,8 @@ def generar_pdf_caja_ingresos(caja, ingresos):
         elementos.append(Spacer(1, 0.5 * inch))
 
                 # Sumar los montos de efectivo y transferencia, asegurando que no sean None
-        total_efectivo = sum(i.monto_efectivo if i.monto_efectivo is not None else 0 for i in ingresos)
-        total_transferencia = sum(i.monto_transaccion if i.monto_transaccion is not None else 0 for i in ingresos)
+        total_efectivo = sumar_montos(i.monto_efectivo for i in ingresos)
+        total_transferencia = sumar_montos(i.monto_transaccion for i in ingresos)
 
         # Calcular el total combinado
         total_general = total_efectivo + total_transferencia
@@ -248,21 +248,18 @@ def crear_pdf(ruta_archivo, productos, tipo):
 
     print("✅ PDF generado con éxito en:", ruta_archivo)
 
-def generar_pdf_productos_mas_vendidos(productos):
+def construir_pdf_productos_mas_vendidos(ruta_archivo, productos, informar=None):
+    """
+    Arma el PDF de productos más vendidos sin abrir diálogos, para poder
+    ejecutarlo fuera del hilo de la interfaz.
+    :param ruta_archivo: Ruta del PDF a generar.
+    :param productos: Lista de productos (obtener_productos_mas_vendidos).
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Ruta del PDF generado.
+    """
     fecha_actual = datetime.now().strftime("%Y-%m-%d")
-    default_filename = f"Productos_Mas_Vendido_{fecha_actual}.pdf"
-
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")],
-        initialfile=default_filename,
-        title=f"Guardar Reporte productos mas vendidos"
-    )
-
-    if not file_path:
-        print("Operación cancelada.")
-        return
 
-    doc = SimpleDocTemplate(file_path, pagesize=letter)
+    doc = SimpleDocTemplate(ruta_archivo, pagesize=letter)
     styles = getSampleStyleSheet()
 
     # Estilos personalizados
@@ -347,39 +344,45 @@ def generar_pdf_productos_mas_vendidos(productos):
        
         story.append(top_3_table)
 
+    if informar:
+        informar(80, "Generando PDF")
     doc.build(story)
-    print(f"Reporte guardado en {file_path}")
-    QMessageBox.information(None, "Reporte generado", f"Reporte de productos mas vendidos guardado correctamente")
-    
-    
-def generar_analisis_financiero(analisis, ingresos, egresos_lista):
+    return ruta_archivo
+
+
+def rotar_etiquetas(ax):
+    """Rota las etiquetas del eje X de un gráfico (equivalente a plt.xticks)."""
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(45)
+        etiqueta.set_ha('right')
+
+
+def construir_analisis_financiero(ruta_archivo, analisis, ingresos, egresos_lista, informar=None):
+    """
+    Arma el PDF de análisis financiero (tablas y gráficos) sin abrir
+    diálogos, para poder ejecutarlo fuera del hilo de la interfaz.
+    :param ruta_archivo: Ruta del PDF a generar.
+    :param analisis: Ganancias por día y tipo de factura (obtener_ganancias_diarias).
+    :param ingresos: Ingresos del periodo.
+    :param egresos_lista: Egresos del periodo.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Ruta del PDF generado.
+    """
     fecha_actual = datetime.now().strftime("%Y-%m-%d")
-    
-    default_filename = f"Analisis_financiero_{fecha_actual}.pdf"
-    
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")],
-        initialfile=default_filename,
-        title="Guardar Reporte productos más vendidos"
-    )
 
-    if not file_path:
-        print("Operación cancelada.")
-        return
-
-    save_dir = os.path.dirname(file_path) 
+    save_dir = os.path.dirname(ruta_archivo) 
     
     try:
-        total_ingresos_efectivo = sum([ingreso[3] for ingreso in ingresos if ingreso[2] == "Venta"])
-        total_ingresos_transferencia = sum([ingreso[4] for ingreso in ingresos if ingreso[2] == "Venta"]) 
-        total_ingresos = total_ingresos_efectivo + total_ingresos_transferencia
+        total_ingresos_efectivo = sumar_montos(ingreso[3] for ingreso in ingresos if ingreso[2] == "Venta")
+        total_ingresos_transferencia = sumar_montos(ingreso[4] for ingreso in ingresos if ingreso[2] == "Venta")
+        total_ingresos = sumar_montos([total_ingresos_efectivo, total_ingresos_transferencia])
     except Exception as e:
         print(f"Error al extraer datos: {e}")
     
-    total_egresos = sum([egreso[3] for egreso in egresos_lista])
-    total_ganancias = sum([dato[5] for dato in analisis])
+    total_egresos = sumar_montos(egreso[3] for egreso in egresos_lista)
+    total_ganancias = sumar_montos(dato.Ganancia for dato in analisis)
     
-    doc = SimpleDocTemplate(file_path, pagesize=letter,
+    doc = SimpleDocTemplate(ruta_archivo, pagesize=letter,
                           leftMargin=0.5*inch,
                           rightMargin=0.5*inch,
                           topMargin=0.5*inch,
@@ -419,7 +422,7 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
 
     # 3. Preparar datos formateados
     datos_ingresos = [[str(ing[0])[:8], ing[2][:15], f"${ing[3]+ing[4]:,.0f}"] for ing in ingresos if ing[2] == "Venta"]
-    datos_ganancias = [[str(dato[0])[:8], dato[1][:15], f"${dato[5]:,.0f}"] for dato in analisis]
+    datos_ganancias = [[dato.Fecha.strftime("%d/%m/%y"), dato.Tipo_Factura[:15], f"${dato.Ganancia:,.0f}"] for dato in analisis]
 
     # 4. Función para dividir datos en chunks que caben en una página
     def dividir_en_chunks(datos, max_filas_por_pagina):
@@ -448,7 +451,7 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
 
         # Crear tablas para los chunks actuales
         tabla_ing = crear_tabla_compacta(chunk_ing, ["ID", "INGRESOS", "MONTO"], 2)
-        tabla_gan = crear_tabla_compacta(chunk_gan, ["ID", "GANANCIAS", "MONTO"], 2)
+        tabla_gan = crear_tabla_compacta(chunk_gan, ["FECHA", "GANANCIAS", "MONTO"], 2)
 
         # Contenedor para tablas lado a lado
         container = Table([
@@ -483,29 +486,33 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
     elements.append(Spacer(1, 12))
     
     #graficos
-    save_dir = tempfile.gettempdir()
-    
+    # Se usa Figure (sin pyplot) y PNG en memoria: es seguro fuera del hilo
+    # de la interfaz y dos reportes no comparten archivos temporales.
+    if informar:
+        informar(40, "Generando gráficos")
+
     # Gráfico 1: Ingresos vs Egresos
-    fig1, ax1 = plt.subplots(figsize=(5, 3))
+    fig1 = Figure(figsize=(5, 3))
+    ax1 = fig1.subplots()
     labels = ['Ingresos', 'Egresos']
     sizes = [total_ingresos, total_egresos]
     ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=['#66b3ff', '#ff6666'])
     ax1.set_title('Distribución Ingresos/Egresos')
     ax1.axis('equal')
-    chart1_filename = os.path.join(save_dir, "grafico_ingresos_egresos.png")
-    plt.savefig(chart1_filename, format='png', bbox_inches='tight')
-    plt.close(fig1)
+    chart1 = BytesIO()
+    fig1.savefig(chart1, format='png', bbox_inches='tight')
+    chart1.seek(0)
     
     # Gráfico 2: Evolución de Ganancias Diarias (agrupadas por día)
-    fig2, ax2 = plt.subplots(figsize=(8, 4))
+    fig2 = Figure(figsize=(8, 4))
+    ax2 = fig2.subplots()
     
     # Procesar datos - agrupar por fecha
     from collections import defaultdict
     ganancias_por_dia = defaultdict(float)
     
     for dato in analisis:
-        fecha = dato[4].date()  # Extraemos solo la fecha (sin hora)
-        ganancias_por_dia[fecha] += dato[5]  # Sumamos las ganancias
+        ganancias_por_dia[dato.Fecha] += dato.Ganancia  # Sumamos los tipos de factura del día
     
     # Convertir a listas ordenadas
     fechas = sorted(ganancias_por_dia.keys())
@@ -517,7 +524,8 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
     
     if num_dias == 1:
         # Gráfico de barras para un solo día con todas las ventas
-        fig2, (ax2, ax3) = plt.subplots(1, 2, figsize=(12, 4))
+        fig2 = Figure(figsize=(12, 4))
+        ax2, ax3 = fig2.subplots(1, 2)
         
         # Gráfico 1: Total del día
         ax2.bar(fechas_str, ganancias, color='#2ecc71', width=0.6)
@@ -526,22 +534,21 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
         ax2.text(0, ganancias[0], f'${ganancias[0]:,.2f}', 
                 ha='center', va='bottom', fontweight='bold')
         
-        # Gráfico 2: Desglose por ventas individuales
-        ventas_del_dia = [(dato[4].strftime('%H:%M'), dato[5]) for dato in analisis]
-        horas = [v[0] for v in ventas_del_dia]
+        # Gráfico 2: Desglose por tipo de factura
+        ventas_del_dia = [(dato.Tipo_Factura, dato.Ganancia) for dato in analisis]
+        tipos = [v[0] for v in ventas_del_dia]
         montos = [v[1] for v in ventas_del_dia]
         
-        ax3.bar(horas, montos, color='#3498db')
-        ax3.set_title('Desglose por ventas')
+        ax3.bar(tipos, montos, color='#3498db')
+        ax3.set_title('Desglose por tipo de factura')
         ax3.set_ylabel('Monto ($)')
-        plt.sca(ax3)
-        plt.xticks(rotation=45, ha='right')
+        rotar_etiquetas(ax3)
         
         # Agregar valores a las barras
         for i, val in enumerate(montos):
             ax3.text(i, val, f'${val:,.2f}', ha='center', va='bottom', fontsize=8)
         
-        plt.tight_layout()
+        fig2.tight_layout()
         
     elif num_dias <= 15:
         # Gráfico de barras para pocos días
@@ -550,7 +557,7 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
         ax2.set_ylabel('Monto ($)')
         
         # Rotar etiquetas y agregar valores
-        plt.xticks(rotation=45, ha='right')
+        rotar_etiquetas(ax2)
         for bar in bars:
             height = bar.get_height()
             ax2.text(bar.get_x() + bar.get_width()/2., height,
@@ -561,7 +568,7 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
         ax2.plot(fechas_str, ganancias, marker='o', color='#2ecc71', linestyle='-', linewidth=2)
         ax2.set_title('Evolución de Ganancias Diarias')
         ax2.set_ylabel('Monto ($)')
-        plt.xticks(rotation=45, ha='right')
+        rotar_etiquetas(ax2)
         
         # Destacar punto máximo
         max_idx = np.argmax(ganancias)
@@ -573,11 +580,11 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
                     arrowprops=dict(arrowstyle='->'))
     
     # Ajustar márgenes
-    plt.tight_layout()
+    fig2.tight_layout()
     
-    chart2_filename = os.path.join(save_dir, "grafico_ganancias.png")
-    plt.savefig(chart2_filename, format='png', bbox_inches='tight', dpi=100)
-    plt.close(fig2)
+    chart2 = BytesIO()
+    fig2.savefig(chart2, format='png', bbox_inches='tight', dpi=100)
+    chart2.seek(0)
 
     # Contenedor para gráficos
     elements.append(Paragraph("Análisis Gráfico", section_title_style))
@@ -593,8 +600,8 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
     #     ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
     # ]))
     
-    elements.append(Image(chart1_filename, width=280, height=200))
-    elements.append(Image(chart2_filename, width=400, height=250))
+    elements.append(Image(chart1, width=280, height=200))
+    elements.append(Image(chart2, width=400, height=250))
     elements.append(Spacer(1, 12))
     
     # Conclusión
@@ -606,15 +613,7 @@ def generar_analisis_financiero(analisis, ingresos, egresos_lista):
     elements.append(Paragraph(conclusion_text, styles['Normal']))
     
     # Generar PDF
+    if informar:
+        informar(70, "Generando PDF")
     doc.build(elements)
-    
-    try:
-        os.remove(chart1_filename)
-        os.remove(chart2_filename)
-    except:
-        pass
-    
-    root = tk.Tk()
-    root.withdraw()  
-    messagebox.showinfo("Éxito", f"PDF generado exitosamente: {file_path}")
-    root.quit()
\ No newline at end of file
+    return ruta_archivo
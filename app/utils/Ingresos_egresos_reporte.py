@@ -2,34 +2,19 @@ import os
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from tkinter import Tk, filedialog
-from PyQt5.QtWidgets import QMessageBox
 
-def generar_pdf_transacciones(transacciones, tipo, fecha_inicio=None, fecha_fin=None):
+def construir_pdf_transacciones(ruta_archivo, transacciones, tipo, fecha_inicio=None, fecha_fin=None, informar=None):
     """
-    Genera un PDF con la lista de ingresos o egresos y permite elegir dónde guardarlo.
+    Dibuja el PDF de ingresos o egresos sin abrir diálogos, para poder
+    ejecutarlo fuera del hilo de la interfaz.
+    :param ruta_archivo: Ruta del PDF a generar.
     :param transacciones: Lista de transacciones (ingresos o egresos).
     :param tipo: "ingresos" o "egresos" para personalizar el reporte.
+    :param informar: Función opcional informar(porcentaje, mensaje) para el progreso.
+    :return: Ruta del PDF generado.
     """
-    # Ocultar la ventana de Tkinter
-    root = Tk()
-    root.withdraw()
-    
-    default_filename = f"{tipo}_{fecha_inicio}.pdf"
-
-    # Elegir dónde guardar el archivo con un nombre por defecto
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")],
-        initialfile=default_filename,  # Nombre por defecto
-        title=f"Guardar Reporte de {tipo.capitalize()}"
-    )
-    
-    if not file_path:
-        print("Operación cancelada.")
-        return
-    
     # Crear el PDF
-    c = canvas.Canvas(file_path, pagesize=letter)
+    c = canvas.Canvas(ruta_archivo, pagesize=letter)
     width, height = letter
     
     # Agrega
@@ -72,7 +57,11 @@ def generar_pdf_transacciones(transacciones, tipo, fecha_inicio=None, fecha_fin=
     total_egresos = 0
     
     # Agregar los datos
-    for trans in transacciones:
+    total_filas = len(transacciones)
+    for indice, trans in enumerate(transacciones):
+        if informar and indice % 200 == 0:
+            informar(indice * 95 / max(total_filas, 1), f"Fila {indice + 1} de {total_filas}")
+
         if tipo == "ingresos":
             c.drawString(50, y_position, str(trans[0]))  # ID
             c.drawString(100, y_position, str(trans[1]))  # Tipo
@@ -114,4 +103,4 @@ def generar_pdf_transacciones(transacciones, tipo, fecha_inicio=None, fecha_fin=
         c.drawString(250, y_position, f"{total_egresos:,.2f}")
     
     c.save()
-    QMessageBox.information(None, "Reporte generado", f"Reporte de {tipo} guardado correctamente")
+    return ruta_archivo
@@ -4,3 +4,4 @@ from .autocomplementado import *
 from .validar_campos import *
 from .restructura_ticket import *
 from .buscarCajaAbierta import *
+from .tabla_paginada import *
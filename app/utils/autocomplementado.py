@@ -1,5 +1,11 @@
 from PyQt5.QtWidgets import QCompleter
+from PyQt5.QtCore import QStringListModel
 from PyQt5 import QtCore
+from app.controllers.producto_crud import catalogo
+from app.database.database import SessionLocal
+from app.models.productos import Productos
+import bisect
+import threading
 
 
 def configurar_autocompletado(
@@ -30,3 +36,152 @@ def configurar_autocompletado(
     # Conectar el evento de selección al procesar_func si está definido
     if procesar_func:
         completer.activated.connect(procesar_func)
+
+
+class IndiceAutocompletado:
+    """
+    Índice ordenado de nombres para autocompletado por prefijo de palabra.
+    Cada palabra de cada nombre se guarda como (palabra, id) en una lista
+    ordenada, así una búsqueda es un bisect más un recorrido corto, y las
+    altas, bajas y cambios de nombre se aplican de a una fila. Tras una
+    escritura masiva se reinicia y se vuelve a cargar desde `origen` en la
+    siguiente búsqueda.
+    """
+
+    def __init__(self, limite=50, origen=None):
+        self.limite = limite
+        self.origen = origen
+        self._nombres = {}
+        self._entradas = []
+        self._cargado = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _palabras(nombre):
+        return set(nombre.lower().split())
+
+    def cargar(self, filas):
+        """Carga el índice completo desde filas (id, nombre)."""
+        with self._lock:
+            self._nombres = {id_fila: nombre for id_fila, nombre in filas if nombre}
+            self._entradas = sorted(
+                (palabra, id_fila)
+                for id_fila, nombre in self._nombres.items()
+                for palabra in self._palabras(nombre)
+            )
+            self._cargado = True
+
+    @property
+    def cargado(self):
+        return self._cargado
+
+    def reiniciar(self):
+        """Marca el índice para recargarlo completo en la próxima búsqueda."""
+        with self._lock:
+            self._cargado = False
+
+    def actualizar(self, id_fila, nombre):
+        """Agrega, renombra (nombre nuevo) o elimina (nombre None) una fila."""
+        with self._lock:
+            anterior = self._nombres.pop(id_fila, None)
+            if anterior:
+                for palabra in self._palabras(anterior):
+                    posicion = bisect.bisect_left(self._entradas, (palabra, id_fila))
+                    if posicion < len(self._entradas) and self._entradas[posicion] == (palabra, id_fila):
+                        del self._entradas[posicion]
+            if nombre:
+                self._nombres[id_fila] = nombre
+                for palabra in self._palabras(nombre):
+                    bisect.insort(self._entradas, (palabra, id_fila))
+
+    def buscar(self, texto, limite=None):
+        """
+        Devuelve hasta `limite` nombres en los que cada palabra del texto es
+        prefijo de alguna palabra del nombre.
+        """
+        limite = limite or self.limite
+        consulta = texto.lower().split()
+        if not consulta:
+            return []
+
+        # Recorrer el índice por la palabra más larga (la más selectiva)
+        guia = max(consulta, key=len)
+        resultados = []
+        vistos = set()
+        with self._lock:
+            if not self._cargado and self.origen is not None:
+                self.cargar(self.origen())
+            posicion = bisect.bisect_left(self._entradas, (guia,))
+            while posicion < len(self._entradas) and len(resultados) < limite:
+                palabra, id_fila = self._entradas[posicion]
+                if not palabra.startswith(guia):
+                    break
+                posicion += 1
+                if id_fila in vistos:
+                    continue
+                vistos.add(id_fila)
+                nombre = self._nombres[id_fila]
+                palabras = self._palabras(nombre)
+                if all(any(p.startswith(c) for p in palabras) for c in consulta):
+                    resultados.append(nombre)
+        return resultados
+
+
+def _nombres_productos():
+    db = SessionLocal()
+    try:
+        return db.query(Productos.ID_Producto, Productos.Nombre).all()
+    finally:
+        db.close()
+
+
+# Índice compartido por todas las vistas de ventas
+indice_productos = IndiceAutocompletado(origen=_nombres_productos)
+catalogo.suscribir(indice_productos.actualizar)
+catalogo.suscribir_recarga(indice_productos.reiniciar)
+
+
+def configurar_autocompletado_productos(input_widget, db_session, procesar_func=None):
+    """
+    Configura el autocompletado de nombres de productos sobre el índice
+    compartido. El catálogo se carga una sola vez por proceso; volver a
+    llamar esta función sobre el mismo widget no hace nada.
+
+    Args:
+        input_widget (QLineEdit): El widget de entrada donde se configurará el autocompletado.
+        db_session (Session): Sesión activa de la base de datos (solo para la primera carga).
+        procesar_func (function): Función a ejecutar al seleccionar una sugerencia.
+    """
+    if isinstance(input_widget.completer(), CompletadorProductos):
+        return
+
+    if not indice_productos.cargado:
+        indice_productos.cargar(
+            db_session.query(Productos.ID_Producto, Productos.Nombre).all()
+        )
+
+    completer = CompletadorProductos(indice_productos, input_widget)
+    input_widget.setCompleter(completer)
+
+    if procesar_func:
+        completer.activated.connect(procesar_func)
+
+
+class CompletadorProductos(QCompleter):
+    """QCompleter que muestra solo los resultados acotados del índice compartido."""
+
+    def __init__(self, indice, input_widget):
+        super().__init__(input_widget)
+        self.indice = indice
+        self.modelo = QStringListModel(self)
+        self.setModel(self.modelo)
+        self.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        input_widget.textEdited.connect(self.actualizar_sugerencias)
+
+    def actualizar_sugerencias(self, texto):
+        self.modelo.setStringList(self.indice.buscar(texto))
+        if self.modelo.rowCount():
+            self.complete()
+        else:
+            self.popup().hide()
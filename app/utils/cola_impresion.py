@@ -0,0 +1,440 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import atexit
+import json
+import os
+import socket
+import sys
+import threading
+import traceback
+
+from app.database.database import SessionLocal, app_data_dir
+from app.controllers.impresion_crud import (
+    crear_trabajo_impresion,
+    obtener_trabajos_impresion_pendientes,
+    marcar_trabajo_impreso,
+    registrar_fallo_impresion,
+    contar_trabajos_impresion,
+)
+
+# Un documento de impresión es una lista de comandos serializable en JSON:
+#   ["encabezado", texto]  línea centrada con la fuente grande
+#   ["texto", texto]       línea alineada a la izquierda
+#   ["centro", texto]      línea centrada
+#   ["separador"]          línea de guiones
+#   ["pagina"]             salto de página
+# Cada impresora (GDI, archivo de texto, PDF, ESC/POS) lo dibuja a su manera.
+# app.utils.ticket arma estos documentos a partir de una venta.
+
+# Intentos fallidos antes de avisar que la impresora no responde y espera
+# entre intentos (crece hasta IMPRESION_ESPERA_MAXIMA y se queda ahí)
+IMPRESION_MAX_INTENTOS = int(os.getenv("SYSTOCK_IMPRESION_INTENTOS", 8))
+IMPRESION_ESPERA_BASE = float(os.getenv("SYSTOCK_IMPRESION_ESPERA", 5))
+IMPRESION_ESPERA_MAXIMA = float(os.getenv("SYSTOCK_IMPRESION_ESPERA_MAXIMA", 300))
+
+# Columnas de un rollo de 80 mm con la fuente A
+ANCHO_TICKET = 48
+
+
+def ajustar_linea(texto, ancho):
+    """Corta una línea en trozos de `ancho` caracteres (los separadores se recortan)."""
+    if texto and set(texto) == {"-"}:
+        return ["-" * ancho]
+    if len(texto) <= ancho:
+        return [texto]
+    return [texto[i:i + ancho] for i in range(0, len(texto), ancho)]
+
+
+def documento_a_texto(documento, ancho=ANCHO_TICKET):
+    """
+    Convierte un documento de impresión en texto plano.
+    :param documento: Lista de comandos de impresión.
+    :param ancho: Columnas del ticket.
+    :return: Texto del ticket.
+    """
+    lineas = []
+    for comando in documento:
+        tipo = comando[0]
+        if tipo == "pagina":
+            lineas.append("\f")
+        elif tipo == "separador":
+            lineas.append("-" * ancho)
+        elif tipo in ("encabezado", "centro"):
+            lineas.extend(parte.center(ancho).rstrip() for parte in ajustar_linea(comando[1], ancho))
+        else:
+            lineas.extend(ajustar_linea(comando[1], ancho))
+    return "\n".join(lineas) + "\n"
+
+
+def documento_a_escpos(documento, ancho=ANCHO_TICKET, codificacion="cp850"):
+    """
+    Convierte un documento de impresión en comandos ESC/POS.
+    :param documento: Lista de comandos de impresión.
+    :param ancho: Columnas del ticket con la fuente normal.
+    :param codificacion: Página de códigos de la impresora.
+    :return: Bytes listos para enviar a la impresora.
+    """
+    esc, gs = b"\x1b", b"\x1d"
+    datos = bytearray(esc + b"@")  # Reiniciar la impresora
+    datos += esc + b"t\x02"  # Página de códigos PC850 (tildes y ñ)
+
+    def linea(texto):
+        datos.extend(texto.encode(codificacion, "replace") + b"\n")
+
+    for comando in documento:
+        tipo = comando[0]
+        if tipo == "pagina":
+            datos += esc + b"d\x03"
+        elif tipo == "separador":
+            linea("-" * ancho)
+        elif tipo == "encabezado":
+            datos += esc + b"a\x01" + gs + b"!\x11"  # Centrado, doble alto y ancho
+            for parte in ajustar_linea(comando[1], ancho // 2):
+                linea(parte)
+            datos += gs + b"!\x00" + esc + b"a\x00"
+        elif tipo == "centro":
+            datos += esc + b"a\x01"
+            for parte in ajustar_linea(comando[1], ancho):
+                linea(parte)
+            datos += esc + b"a\x00"
+        else:
+            for parte in ajustar_linea(comando[1], ancho):
+                linea(parte)
+
+    datos += esc + b"d\x04" + gs + b"V\x01"  # Avanzar y cortar el papel
+    return bytes(datos)
+
+
+class ImpresoraGDI:
+    """
+    Imprime en una impresora de Windows con GDI (pywin32), con las mismas
+    fuentes y márgenes que usaban las vistas de ventas.
+
+    Args:
+        impresora (str): Nombre de la impresora (por defecto, la predeterminada).
+    """
+
+    def __init__(self, impresora=None, fuente="Lucida Console", alto_encabezado=28, alto_fuente=18):
+        self.impresora = impresora
+        self.fuente = fuente
+        self.alto_encabezado = alto_encabezado
+        self.alto_fuente = alto_fuente
+
+    def imprimir(self, titulo, documento):
+        import win32print
+        import win32ui
+        import win32con
+
+        impresora = self.impresora or win32print.GetDefaultPrinter()
+        hDC = win32ui.CreateDC()
+        hDC.CreatePrinterDC(impresora)
+        try:
+            hDC.StartDoc(titulo)
+            try:
+                hDC.StartPage()
+                font_encabezado = win32ui.CreateFont({
+                    "name": self.fuente,
+                    "height": self.alto_encabezado,
+                    "weight": win32con.FW_BOLD,
+                })
+                font = win32ui.CreateFont({
+                    "name": self.fuente,
+                    "height": self.alto_fuente,
+                    "weight": win32con.FW_BOLD,
+                })
+                line_height = self.alto_fuente + 10
+                center_x = hDC.GetDeviceCaps(win32con.HORZRES) // 2
+
+                x, y = 2, 10
+                anterior = None
+                for comando in documento:
+                    tipo = comando[0]
+                    if tipo == "pagina":
+                        hDC.EndPage()
+                        hDC.StartPage()
+                        x, y = 2, 2
+                        anterior = None
+                        continue
+
+                    if tipo == "encabezado":
+                        hDC.SelectObject(font_encabezado)
+                    else:
+                        if anterior == "encabezado":
+                            y += line_height  # Espacio bajo los datos de la empresa
+                        hDC.SelectObject(font)
+
+                    texto = "-" * 113 if tipo == "separador" else comando[1]
+                    if tipo in ("encabezado", "centro"):
+                        ancho_texto = hDC.GetTextExtent(texto)[0]
+                        hDC.TextOut(center_x - (ancho_texto // 2), y, texto)
+                    else:
+                        hDC.TextOut(x, y, texto)
+                    y += line_height
+                    anterior = tipo
+
+                hDC.EndPage()
+            except Exception:
+                # No dejar un ticket a medias en la cola de Windows
+                hDC.AbortDoc()
+                raise
+            hDC.EndDoc()
+        finally:
+            hDC.DeleteDC()
+
+
+class ImpresoraArchivo:
+    """
+    Escribe cada ticket como un archivo de texto en una carpeta. Sirve para
+    equipos sin impresora y para revisar los tickets en Linux.
+
+    Args:
+        carpeta (str): Carpeta donde se guardan los tickets.
+        ancho (int): Columnas del ticket.
+    """
+
+    def __init__(self, carpeta, ancho=ANCHO_TICKET):
+        self.carpeta = Path(carpeta)
+        self.ancho = ancho
+
+    def imprimir(self, titulo, documento):
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        nombre = f"{titulo.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.txt"
+        ruta = self.carpeta / nombre
+        temporal = ruta.with_suffix(".tmp")
+        temporal.write_text(documento_a_texto(documento, self.ancho), encoding="utf-8")
+        os.replace(temporal, ruta)
+        return ruta
+
+
+class ImpresoraPDF:
+    """
+    Guarda cada ticket como PDF (ReportLab) en una carpeta.
+
+    Args:
+        carpeta (str): Carpeta donde se guardan los tickets.
+    """
+
+    def __init__(self, carpeta):
+        self.carpeta = Path(carpeta)
+
+    def imprimir(self, titulo, documento):
+        from app.utils.restructura_ticket import dibujar_ticket_pdf
+
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        nombre = f"{titulo.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.pdf"
+        ruta = self.carpeta / nombre
+        temporal = ruta.with_suffix(".tmp")
+        dibujar_ticket_pdf(documento, temporal)
+        os.replace(temporal, ruta)
+        return ruta
+
+
+class ImpresoraESCPOS:
+    """
+    Envía el ticket como comandos ESC/POS a una impresora térmica.
+
+    Args:
+        destino (str): Dispositivo o archivo (por ejemplo /dev/usb/lp0 o
+            \\\\equipo\\impresora) o una impresora de red "tcp://host:9100".
+        ancho (int): Columnas del ticket.
+        codificacion (str): Página de códigos de la impresora.
+    """
+
+    def __init__(self, destino, ancho=ANCHO_TICKET, codificacion="cp850", tiempo_espera=10):
+        self.destino = str(destino)
+        self.ancho = ancho
+        self.codificacion = codificacion
+        self.tiempo_espera = tiempo_espera
+
+    def imprimir(self, titulo, documento):
+        datos = documento_a_escpos(documento, self.ancho, self.codificacion)
+        if self.destino.startswith("tcp://"):
+            host, _, puerto = self.destino[len("tcp://"):].partition(":")
+            with socket.create_connection((host, int(puerto or 9100)), self.tiempo_espera) as conexion:
+                conexion.sendall(datos)
+        else:
+            with open(self.destino, "ab") as salida:
+                salida.write(datos)
+
+
+def crear_impresora(tipo=None, destino=None):
+    """
+    Crea la impresora configurada. Por defecto usa GDI en Windows y archivos
+    de texto en otros sistemas; se cambia con SYSTOCK_IMPRESORA (gdi,
+    archivo, pdf o escpos) y SYSTOCK_IMPRESORA_DESTINO.
+    """
+    tipo = (tipo or os.getenv("SYSTOCK_IMPRESORA") or ("gdi" if sys.platform == "win32" else "archivo")).lower()
+    destino = destino or os.getenv("SYSTOCK_IMPRESORA_DESTINO")
+
+    if tipo == "gdi":
+        return ImpresoraGDI(destino)
+    if tipo == "archivo":
+        return ImpresoraArchivo(destino or app_data_dir / "Tickets")
+    if tipo == "pdf":
+        return ImpresoraPDF(destino or app_data_dir / "Tickets")
+    if tipo == "escpos":
+        if not destino:
+            raise ValueError("SYSTOCK_IMPRESORA_DESTINO es obligatorio para impresoras ESC/POS.")
+        return ImpresoraESCPOS(destino)
+    raise ValueError(f"Tipo de impresora no soportado: {tipo}")
+
+
+class ColaImpresion:
+    """
+    Cola de impresión con bandeja de salida en la base de datos. Los tickets
+    se guardan en COLA_IMPRESION y un hilo propio los imprime en orden;
+    si la impresora falla se reintenta con espera creciente (hasta
+    `espera_maxima`) sin abandonar nunca el ticket, y al llegar a
+    `max_intentos` se avisa con una notificación. Los trabajos pendientes al
+    cerrar la aplicación se imprimen en el siguiente inicio.
+
+    Args:
+        impresora: Objeto con un método imprimir(titulo, documento).
+            Si no se indica se usa crear_impresora().
+        sesion (function): Fábrica de sesiones de base de datos.
+    """
+
+    def __init__(
+        self,
+        impresora=None,
+        sesion=SessionLocal,
+        max_intentos=IMPRESION_MAX_INTENTOS,
+        espera_base=IMPRESION_ESPERA_BASE,
+        espera_maxima=IMPRESION_ESPERA_MAXIMA,
+    ):
+        self._impresora = impresora
+        self.sesion = sesion
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._candado = threading.Lock()
+        self._hilo = None
+
+    @property
+    def impresora(self):
+        if self._impresora is None:
+            self._impresora = crear_impresora()
+        return self._impresora
+
+    @impresora.setter
+    def impresora(self, impresora):
+        self._impresora = impresora
+
+    def iniciar(self):
+        """Inicia el hilo de impresión si no está corriendo."""
+        with self._candado:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ejecutar, name="ColaImpresion", daemon=True)
+            self._hilo.start()
+
+    def detener(self, espera=2):
+        """Detiene el hilo; los trabajos pendientes quedan en la bandeja."""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(espera)
+
+    def encolar(self, titulo, documento, id_factura=None):
+        """
+        Guarda el documento en la bandeja y despierta al hilo de impresión.
+        :return: ID del trabajo de impresión.
+        """
+        db = self.sesion()
+        try:
+            id_trabajo = crear_trabajo_impresion(db, titulo, documento, id_factura)
+        finally:
+            db.close()
+        self.iniciar()
+        self._despertar.set()
+        return id_trabajo
+
+    def estado(self):
+        """Cantidad de trabajos por estado (PENDIENTE, IMPRESO)."""
+        db = self.sesion()
+        try:
+            return contar_trabajos_impresion(db)
+        finally:
+            db.close()
+
+    def procesar_pendientes(self):
+        """
+        Imprime los trabajos pendientes en orden hasta vaciar la bandeja o
+        llegar a uno que todavía debe esperar su reintento.
+        :return: Segundos hasta el próximo reintento, o None si no quedan pendientes.
+        """
+        db = self.sesion()
+        try:
+            while not self._detener.is_set():
+                pendientes = obtener_trabajos_impresion_pendientes(db, limite=1)
+                if not pendientes:
+                    return None
+                trabajo = pendientes[0]
+                espera = (trabajo.Proximo_Intento - datetime.now()).total_seconds()
+                if espera > 0:
+                    return espera
+                self._imprimir(db, trabajo)
+            return None
+        finally:
+            db.close()
+
+    def _imprimir(self, db, trabajo):
+        try:
+            self.impresora.imprimir(trabajo.Titulo, json.loads(trabajo.Documento))
+        except Exception as e:
+            print(f"Error al imprimir el trabajo {trabajo.ID_Trabajo}: {e}")
+            intentos = (trabajo.Intentos or 0) + 1
+            espera = min(self.espera_base * 2 ** min(intentos - 1, 30), self.espera_maxima)
+            registrar_fallo_impresion(
+                db,
+                trabajo.ID_Trabajo,
+                e,
+                datetime.now() + timedelta(seconds=espera),
+            )
+            if intentos == self.max_intentos:
+                self._avisar_fallo(trabajo, e)
+        else:
+            marcar_trabajo_impreso(db, trabajo.ID_Trabajo)
+
+    def _avisar_fallo(self, trabajo, error):
+        try:
+            from app.utils.enviar_notifi import enviar_notificacion
+
+            enviar_notificacion(
+                "Impresora",
+                f"No se pudo imprimir '{trabajo.Titulo}' ({error}). Se sigue reintentando.",
+            )
+        except Exception:
+            traceback.print_exc()
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            # Limpiar antes de procesar: un trabajo encolado mientras tanto
+            # hace que la espera siguiente termine enseguida
+            self._despertar.clear()
+            try:
+                espera = self.procesar_pendientes()
+            except Exception:
+                traceback.print_exc()
+                espera = self.espera_base
+            # Revisar la bandeja al menos cada minuto
+            self._despertar.wait(60 if espera is None else min(espera, 60))
+
+
+# Cola compartida por todas las vistas
+cola_impresion = ColaImpresion()
+atexit.register(cola_impresion.detener)
+
+
+def imprimir_documento(titulo, documento, id_factura=None):
+    """
+    Encola un documento para imprimirlo en segundo plano.
+    :param titulo: Nombre del trabajo (por ejemplo, 'Ticket de Venta').
+    :param documento: Lista de comandos de impresión.
+    :param id_factura: ID de la factura asociada (opcional).
+    :return: ID del trabajo de impresión.
+    """
+    return cola_impresion.encolar(titulo, documento, id_factura)
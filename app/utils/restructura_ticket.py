@@ -1,15 +1,64 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
 from datetime import datetime
-import textwrap
 import locale
-from tkinter import filedialog
+
+from app.utils.ticket import armar_ticket
 
 # Configurar la localización
 locale.setlocale(locale.LC_ALL, "es_CO.UTF-8")  # Ajustar la localización a Colombia
 
 
+def dibujar_ticket_pdf(documento, ruta, ancho_pagina=68 * 5):
+    """
+    Dibuja un ticket (lista de comandos de impresión) en un PDF con ReportLab.
+    Cada salto de página del ticket es una página del PDF, con el alto
+    justo para su contenido.
+    :param documento: Lista de comandos de impresión (ver app.utils.ticket).
+    :param ruta: Ruta del PDF.
+    :param ancho_pagina: Ancho de la página en puntos.
+    """
+    # ReportLab se carga al generar el ticket, no al iniciar
+    from reportlab.pdfgen import canvas
+
+    margen = 20
+    alto_linea = 14
+    alto_encabezado = 20
+
+    paginas = [[]]
+    for comando in documento:
+        if comando[0] == "pagina":
+            paginas.append([])
+        else:
+            paginas[-1].append(comando)
+    paginas = [comandos for comandos in paginas if comandos] or [[]]
+
+    pdf = canvas.Canvas(str(ruta))
+    for comandos in paginas:
+        alto = 2 * margen + sum(
+            alto_encabezado if comando[0] == "encabezado" else alto_linea for comando in comandos
+        )
+        pdf.setPageSize((ancho_pagina, alto))
+        y = alto - margen
+        for comando in comandos:
+            tipo = comando[0]
+            if tipo == "encabezado":
+                y -= alto_encabezado
+                pdf.setFont("Helvetica-Bold", 14)
+                pdf.drawCentredString(ancho_pagina / 2, y + 5, comando[1])
+                continue
+
+            y -= alto_linea
+            # Courier: las columnas de productos quedan alineadas
+            pdf.setFont("Courier-Bold", 9)
+            if tipo == "separador":
+                pdf.line(margen, y + 5, ancho_pagina - margen, y + 5)
+            elif tipo == "centro":
+                pdf.drawCentredString(ancho_pagina / 2, y + 3, comando[1])
+            else:
+                pdf.drawString(margen, y + 3, comando[1])
+        pdf.showPage()
+    pdf.save()
+
+
 def generate_ticket(
     client_name,
     client_id,
@@ -25,172 +74,44 @@ def generate_ticket(
     pago,
     filename,
 ):
+    """
+    Guarda el ticket de una venta en PDF con el mismo diseño que el ticket
+    impreso. `items` es una lista de tuplas (cantidad, descripción, valor unitario).
+    """
+    # Tkinter se carga al generar el ticket, no al iniciar
+    from tkinter import filedialog
+
     # Configuración inicial y ventana de diálogo para guardar archivo
     try:
 
-        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        default_filename = f"{client_name.replace(' ', '')}{current_datetime}.pdf"
-        filename = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf")],
-            initialfile=default_filename,
-        )
+        if not filename:
+            current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            default_filename = f"{client_name.replace(' ', '')}{current_datetime}.pdf"
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF files", "*.pdf")],
+                initialfile=default_filename,
+            )
 
         if not filename:
             return False
-        # Ajustar la dirección con salto de línea
-        max_length = 22
-        wrapped_address = textwrap.fill(client_address, width=max_length)
-
-        # Definición de las medidas de la página y espacio entre líneas
-        pdf_width = 68 * 5
-        line_height = 20
-        header_height = 10
-        footer_height = 80
-        max_lines = (
-            len(items) + 10
-        )  # Añadir algunas líneas de margen para asegurar que el contenido no se corte
-
-        # Cálculo dinámico de la altura de la página en base al número de productos
-        content_height = header_height + footer_height + (line_height * max_lines)
-        min_height = 1000  # Altura mínima de la página
-        pdf_height = max(content_height, min_height)
-
-        # Crear el objeto PDF
-        pdf = canvas.Canvas(filename, pagesize=(pdf_width, pdf_height))
-
-        # Establecer el color de fuente y el tamaño
-        pdf.setStrokeColor(colors.black)
-        pdf.setFillColor(colors.black)
-        font_size = 18
-        pdf.setFont("Helvetica-Bold", font_size)
-
-        # Encabezado del ticket (solo se dibuja en la primera página)
-        pdf.setFont("Helvetica-Bold", 22)
-        pdf.drawCentredString(pdf_width / 2, pdf_height - 30, "EM Collection")
-        pdf.drawCentredString(pdf_width / 2, pdf_height - 60, "Pasto, Colombia")
-        pdf.drawCentredString(
-            pdf_width / 2, pdf_height - 90, "+57 312-768-91-51"
-        )
-        pdf.drawCentredString(
-            pdf_width / 2,
-            pdf_height - 120,
-            f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+
+        documento = armar_ticket(
+            invoice_number,
+            {
+                "nombre": client_name,
+                "cedula": client_id,
+                "telefono": client_phone,
+                "direccion": client_address,
+            },
+            [
+                (description, quantity, float(value), quantity * float(value))
+                for quantity, description, value in items
+            ],
+            metodo_pago=payment_method,
+            domicilio=delivery_fee,
         )
-        pdf.line(
-            20, pdf_height - 130, pdf_width - 20, pdf_height - 130
-        )  # Línea divisoria
-
-        # Información de la factura
-        y = pdf_height - 150
-        pdf.setFont("Helvetica-Bold", font_size)
-        pdf.drawString(20, y, "Factura de Venta")
-        y -= line_height
-        pdf.setFont("Helvetica-Bold", font_size)
-        pdf.drawString(20, y, f"Número de Factura: {invoice_number}")
-        y -= line_height
-        # pdf.drawString(20, y, f"Nit: {pan}")
-        # y -= line_height
-        pdf.drawString(20, y, f"Cliente: {client_name}")
-        y -= line_height
-        pdf.drawString(20, y, f"Cédula: {client_id}")
-        y -= line_height
-        for line in wrapped_address.split("\n"):
-            pdf.drawString(20, y, f"Dirección: {line}")
-            y -= line_height
-        pdf.drawString(20, y, f"Teléfono: {client_phone}")
-
-        # Línea divisoria
-        y -= line_height
-        pdf.line(20, y, pdf_width - 20, y)
-        y -= line_height
-
-        # Descripción de los productos
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(20, y, "Cantidad")
-        pdf.drawString(105, y, "Descripción")
-        pdf.drawString(240, y, "Valor")
-        y -= line_height
-
-        # Imprimir los productos
-        for quantity, description, value in items:
-            pdf.drawString(20, y, str(quantity))
-            pdf.drawString(
-                90, y, description[:15]
-            )  # Limitar descripción a 15 caracteres
-            pdf.drawString(240, y, f"${value:.2f}")
-            y -= line_height
-
-            # Verificar si se necesita nueva página
-            if y < 100:  # Si la página está a punto de llenarse
-                pdf.showPage()  # Añadir una nueva página
-                pdf.setFont(
-                    "Helvetica-Bold", 16
-                )  # Establecer fuente en negrita y tamaño 16
-                # Continuar con los productos en la nueva página
-                y = pdf_height - 50  # Reiniciar la posición Y en la nueva página
-                # Solo mostrar lo que falta (sin repetir encabezado)
-
-        # Subtotales y totales
-        sub = locale.currency(subtotal, grouping=True)
-        descu = locale.currency(delivery_fee, grouping=True)
-        totalpagar = locale.currency(total, grouping=True)
-
-        if (
-            payment_method == "Efectivo"
-            or payment_method == "Transferencia"
-            or payment_method == "Credito"
-        ):
-            pago = locale.currency(float(pago), grouping=True)
-        else:
-            total = pago.split("/")
-            efectivo = float(total[0])
-            tranferencia = float(total[1])
-            efectivo = locale.currency(efectivo, grouping=True)
-            tranferencia = locale.currency(tranferencia, grouping=True)
-
-        # Detallar subtotales (se sigue escribiendo después de la continuación de la página)
-        pdf.setFont("Helvetica-Bold", 18)
-        y -= line_height
-        pdf.drawString(140, y, "Subtotal:")
-        pdf.drawString(225, y, f"{sub}")
-        y -= line_height
-        pdf.drawString(140, y, "Domicilio:")
-        pdf.drawString(230, y, f"{descu}")
-        y -= line_height
-        pdf.drawString(140, y, "Total:")
-        pdf.drawString(220, y, f"{totalpagar}")
-        y -= line_height
-        if (
-            payment_method == "Efectivo"
-            or payment_method == "Transferencia"
-            or payment_method == "Credito"
-        ):
-            pdf.drawString(140, y, "Pago:")
-            pdf.drawString(220, y, pago)
-        else:
-            pdf.drawString(140, y, "Efectivo:")
-            pdf.drawString(220, y, f"{efectivo}")
-            y -= line_height
-            pdf.drawString(140, y, "Transfer:")
-            pdf.drawString(220, y, f"{tranferencia}")
-            y -= line_height
-
-        # Forma de pago
-        y -= line_height * 2
-        pdf.setFont("Helvetica-Bold", font_size)
-        pdf.drawString(20, y, f"Forma de Pago: {payment_method}")
-
-        # Pie de página (solo en la primera página)
-        y -= line_height * 2
-        pdf.setFillColor(colors.lightgrey)
-        pdf.rect(0, 0, pdf_width, footer_height, fill=True, stroke=False)
-        pdf.setFillColor(colors.black)
-        pdf.setFont("Helvetica-Bold", 24)
-        pdf.drawCentredString(pdf_width / 2, 30, "¡Gracias por tu compra!")
-
-        # Guardar el PDF
-        pdf.save()
+        dibujar_ticket_pdf(documento, filename)
 
         return True
 
@@ -0,0 +1,104 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class ModeloTablaPaginada(QAbstractTableModel):
+    """
+    Modelo de tabla que carga las filas por páginas a medida que la vista se
+    desplaza (canFetchMore/fetchMore). Cada página se pide a partir de la
+    clave de la última fila cargada, así abrir la tabla cuesta lo mismo sin
+    importar cuántos registros haya en la base de datos.
+
+    Args:
+        encabezados (list): Títulos de las columnas.
+        cargar_pagina (function): Recibe (despues_de, limite) y devuelve una lista de filas.
+        formatear_fila (function): Convierte una fila en la lista de textos a mostrar.
+        clave_fila (function): Devuelve la clave de paginación de una fila.
+        color_fila (function): Devuelve el QColor del texto de una fila (opcional).
+        tamano_pagina (int): Cantidad de filas por página.
+    """
+
+    def __init__(
+        self,
+        encabezados,
+        cargar_pagina,
+        formatear_fila,
+        clave_fila,
+        color_fila=None,
+        tamano_pagina=100,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.encabezados = list(encabezados)
+        self.cargar_pagina = cargar_pagina
+        self.formatear_fila = formatear_fila
+        self.clave_fila = clave_fila
+        self.color_fila = color_fila
+        self.tamano_pagina = tamano_pagina
+        self._filas = []
+        self._textos = []
+        self._colores = []
+        self._ultima_clave = None
+        self._hay_mas = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.encabezados)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._textos[index.row()][index.column()]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.ForegroundRole:
+            return self._colores[index.row()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.encabezados[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._hay_mas
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._hay_mas:
+            return
+
+        filas = self.cargar_pagina(self._ultima_clave, self.tamano_pagina)
+        if len(filas) < self.tamano_pagina:
+            self._hay_mas = False
+        if not filas:
+            return
+
+        inicio = len(self._filas)
+        self.beginInsertRows(QModelIndex(), inicio, inicio + len(filas) - 1)
+        for fila in filas:
+            self._filas.append(fila)
+            self._textos.append(self.formatear_fila(fila))
+            self._colores.append(self.color_fila(fila) if self.color_fila else None)
+        self._ultima_clave = self.clave_fila(filas[-1])
+        self.endInsertRows()
+
+    def fila(self, indice):
+        """Devuelve la fila original (sin formatear) en la posición indicada."""
+        return self._filas[indice]
+
+    def limpiar(self):
+        """Vacía el modelo; la próxima carga empieza desde la primera página."""
+        self.beginResetModel()
+        self._filas = []
+        self._textos = []
+        self._colores = []
+        self._ultima_clave = None
+        self._hay_mas = True
+        self.endResetModel()
+
+    def reiniciar(self):
+        """Vacía el modelo y carga la primera página."""
+        self.limpiar()
+        self.fetchMore()
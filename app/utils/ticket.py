@@ -0,0 +1,330 @@
+from collections import OrderedDict
+from datetime import datetime
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.controllers.facturas_crud import obtener_factura_completa
+from app.controllers.impresion_crud import obtener_ultimo_documento_factura
+from app.models.facturas import Facturas
+from app.models.detalle_facturas import DetalleFacturas
+from app.models.venta_credito import VentaCredito
+from app.utils.cola_impresion import imprimir_documento
+
+# Motor de diseño de tickets: convierte una venta en la lista de comandos de
+# impresión que entienden todas las impresoras (GDI, ESC/POS, texto, PDF).
+# El ticket se arma una sola vez por factura y queda en caché para las
+# reimpresiones.
+
+ENCABEZADO_EMPRESA = ["EM Collection", "Cra 31B No. 19A-34", "Pasto, Colombia", "+57 312-768-91-51"]
+ENCABEZADO_CREDITO = ["LadyNailShop", "Pasto, Colombia", "+57 316-144-44-74"]
+
+FORMATO_PRODUCTO = "{:<18} {:>6} {:>10} {:>10}"
+LINEAS_POR_PAGINA = 30  # Productos por página
+ANCHO_DIRECCION = 35
+
+# Título de la columna de precio según el tipo de factura
+COLUMNA_PRECIO = {"Detal": "P.Unit", "Reventa": "P.Reventa", "Mayorista": "P.Mayor"}
+
+TICKETS_EN_CACHE = 200
+
+# Títulos de los trabajos de impresión; el ticket de una factura y los
+# comprobantes de sus abonos se guardan por separado
+TITULO_TICKET_VENTA = "Ticket de Venta"
+TITULO_COMPROBANTE_ABONO = "Comprobante de Abono"
+
+
+def formatear_moneda(valor):
+    return f"${float(valor):,.2f}"
+
+
+def formatear_envio(valor):
+    valor = float(valor or 0)
+    if valor.is_integer():
+        return f"${int(valor):,.0f}"
+    return f"${valor:,.2f}"
+
+
+def formatear_linea_producto(nombre, cantidad, precio_unitario, total):
+    """Línea de producto con columnas fijas (nombre de hasta 18 caracteres)."""
+    return FORMATO_PRODUCTO.format(
+        str(nombre).strip().replace("\n", " ")[:18].ljust(18),
+        str(cantidad),
+        f"{precio_unitario:,.0f}".replace(",", "."),
+        f"{total:,.0f}".replace(",", "."),
+    )
+
+
+def armar_ticket(
+    numero,
+    cliente,
+    items,
+    metodo_pago=None,
+    domicilio=0.0,
+    descuento=0.0,
+    columna_precio="P.Unit",
+    encabezado=ENCABEZADO_EMPRESA,
+    fecha=None,
+    deuda=None,
+    fecha_limite=None,
+    abonos=None,
+):
+    """
+    Arma el ticket de una venta como lista de comandos de impresión.
+    :param numero: Número de la factura.
+    :param cliente: Diccionario con nombre, cedula, telefono y direccion.
+    :param items: Lista de tuplas (nombre, cantidad, precio_unitario, total).
+    :param metodo_pago: Método de pago (ventas de contado).
+    :param domicilio: Valor del envío; None para no mostrarlo.
+    :param descuento: Descuento aplicado (solo se muestra si es mayor a cero).
+    :param columna_precio: Título de la columna de precio.
+    :param encabezado: Líneas con los datos de la empresa.
+    :param fecha: Fecha de la venta (por defecto, la actual).
+    :param deuda: Total de la deuda; si se indica el ticket es de crédito.
+    :param fecha_limite: Fecha límite de pago del crédito.
+    :param abonos: Lista de tuplas (fecha, método, monto) de los abonos.
+    :return: Lista de comandos de impresión.
+    """
+    fecha = fecha or datetime.now()
+    if isinstance(fecha, datetime):
+        fecha = fecha.strftime("%d/%m/%Y %H:%M:%S")
+
+    documento = [["encabezado", linea] for linea in [*encabezado, fecha]]
+    documento.append(["separador"])
+
+    # Información del cliente
+    if deuda is not None:
+        documento.append(["texto", "Crédito"])
+    direccion = str(cliente.get("direccion") or "")
+    documento += [
+        ["texto", f"COT No. {numero}"],
+        ["texto", f"Cliente: {cliente.get('nombre', '')}"],
+        ["texto", f"Cédula: {cliente.get('cedula', '')}"],
+        ["texto", f"Teléfono: {cliente.get('telefono', '')}"],
+        ["texto", f"Dirección: {direccion[:ANCHO_DIRECCION]}"],
+    ]
+    if len(direccion) > ANCHO_DIRECCION:
+        documento.append(["texto", direccion[ANCHO_DIRECCION:]])
+    documento.append(["separador"])
+
+    # Productos, con salto de página cada LINEAS_POR_PAGINA líneas
+    documento.append(["texto", FORMATO_PRODUCTO.format("Producto", "Cant.", columna_precio, "Total")])
+    for i, (nombre, cantidad, precio_unitario, total_producto) in enumerate(items, start=1):
+        documento.append(["texto", formatear_linea_producto(nombre, cantidad, precio_unitario, total_producto)])
+        if i % LINEAS_POR_PAGINA == 0:
+            documento.append(["pagina"])
+
+    subtotal = sum(float(item[3]) for item in items)
+    documento += [["texto", ""], ["separador"]]
+
+    if deuda is not None:
+        return documento + armar_pie_credito(deuda, fecha_limite, domicilio, abonos)
+
+    total = subtotal + float(domicilio or 0) - float(descuento or 0)
+    documento.append(["texto", f"Subtotal: {formatear_moneda(subtotal)}"])
+    if domicilio is not None:
+        documento.append(["texto", f"Envío: {formatear_envio(domicilio)}"])
+    if descuento:
+        documento.append(["texto", f"Descuento: {formatear_moneda(descuento)}"])
+    documento += [
+        ["texto", f"Total: {formatear_moneda(total)}"],
+        ["texto", f"Método de Pago: {metodo_pago}"],
+        ["separador"],
+        ["texto", "¡Gracias por tu compra!"],
+        ["separador"],
+    ]
+    return documento
+
+
+def armar_pie_credito(deuda, fecha_limite, domicilio=None, abonos=None):
+    """
+    Arma el cierre de un ticket de crédito: deuda, fecha límite y abonos.
+    :param deuda: Total de la deuda.
+    :param fecha_limite: Fecha límite de pago del crédito.
+    :param domicilio: Valor del envío; None para no mostrarlo.
+    :param abonos: Lista de tuplas (fecha, método, monto) de los abonos.
+    :return: Lista de comandos de impresión.
+    """
+    documento = [["texto", f"Deuda Total: {formatear_moneda(deuda)}"]]
+    if domicilio is not None:
+        documento.append(["texto", f"Envío: {formatear_envio(domicilio)}"])
+    documento.append(["texto", f"Fecha Limite: {fecha_limite}"])
+    documento += [["separador"], ["texto", ""]]
+    if abonos is None:
+        documento.append(["texto", "¡Gracias por tu compra!"])
+        return documento
+
+    documento.append(["texto", "Abonos:"])
+    for fecha_abono, metodo, monto in abonos:
+        abono_linea = f"{fecha_abono} x {metodo} - {monto}"
+        # Dividir la línea en fragmentos de 50 caracteres
+        while abono_linea:
+            documento.append(["texto", abono_linea[:50]])
+            abono_linea = abono_linea[50:]
+    documento.append(["separador"])
+    documento.append(["centro", "¡Gracias Por cumplir con tu pago!"])
+    return documento
+
+
+def armar_comprobante_abono(ticket_factura, deuda, fecha_limite, abonos, fecha=None):
+    """
+    Arma el comprobante de un abono a partir del ticket de la factura a
+    crédito: reutiliza el encabezado, el cliente y los productos, pone la
+    fecha del abono y cambia el cierre por la deuda y los abonos.
+    :param ticket_factura: Ticket de la factura (obtener_ticket_factura).
+    :param deuda: Total de la deuda.
+    :param fecha_limite: Fecha límite de pago del crédito.
+    :param abonos: Lista de tuplas (fecha, método, monto) de los abonos.
+    :param fecha: Fecha del abono (por defecto, la actual).
+    :return: Lista de comandos de impresión.
+    """
+    fecha = (fecha or datetime.now()).strftime("%d/%m/%Y %H:%M:%S")
+    # El cierre de un ticket de crédito empieza en la línea de la deuda
+    corte = next(
+        (
+            i for i, comando in enumerate(ticket_factura)
+            if comando[0] == "texto" and comando[1].startswith("Deuda Total:")
+        ),
+        len(ticket_factura),
+    )
+    documento = [list(comando) for comando in ticket_factura[:corte]]
+    # La última línea del encabezado es la fecha del ticket
+    encabezados = [i for i, comando in enumerate(documento) if comando[0] == "encabezado"]
+    if encabezados:
+        documento[encabezados[-1]] = ["encabezado", fecha]
+    return documento + armar_pie_credito(deuda, fecha_limite, abonos=abonos)
+
+
+def armar_ticket_factura(factura_completa, venta_credito=None):
+    """
+    Arma el ticket de una factura guardada.
+    :param factura_completa: Resultado de obtener_factura_completa.
+    :param venta_credito: Venta a crédito de la factura (opcional).
+    :return: Lista de comandos de impresión.
+    """
+    factura = factura_completa["Factura"]
+    cliente = factura_completa["Cliente"]
+    items = [
+        (d["Producto"], d["Cantidad"], float(d["Precio_Unitario"]), float(d["Subtotal"]))
+        for d in factura_completa["Detalles"]
+    ]
+    datos_cliente = {
+        "nombre": f"{cliente['Nombre']} {cliente['Apellido']}",
+        "cedula": cliente["ID_Cliente"],
+        "telefono": cliente["Teléfono"],
+        "direccion": cliente["Direccion"],
+    }
+
+    if venta_credito is not None:
+        return armar_ticket(
+            factura["ID_Factura"],
+            datos_cliente,
+            items,
+            domicilio=None,
+            columna_precio="Precio",
+            encabezado=ENCABEZADO_CREDITO,
+            fecha=factura["Fecha_Factura"],
+            deuda=venta_credito.Total_Deuda,
+            fecha_limite=venta_credito.Fecha_Limite,
+        )
+
+    return armar_ticket(
+        factura["ID_Factura"],
+        datos_cliente,
+        items,
+        metodo_pago=factura["MetodoPago"],
+        domicilio=None,
+        descuento=factura["Descuento"] or 0.0,
+        columna_precio=COLUMNA_PRECIO.get(factura["TipoFactura"], "P.Unit"),
+        fecha=factura["Fecha_Factura"],
+    )
+
+
+class CacheTickets:
+    """Últimos tickets armados, por ID de factura y título (LRU, segura entre hilos)."""
+
+    def __init__(self, capacidad=TICKETS_EN_CACHE):
+        self.capacidad = capacidad
+        self._tickets = OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, id_factura, titulo=TITULO_TICKET_VENTA):
+        clave = (int(id_factura), titulo)
+        with self._candado:
+            documento = self._tickets.get(clave)
+            if documento is not None:
+                self._tickets.move_to_end(clave)
+            return documento
+
+    def guardar(self, id_factura, documento, titulo=TITULO_TICKET_VENTA):
+        clave = (int(id_factura), titulo)
+        with self._candado:
+            self._tickets[clave] = documento
+            self._tickets.move_to_end(clave)
+            while len(self._tickets) > self.capacidad:
+                self._tickets.popitem(last=False)
+
+    def invalidar(self, *ids):
+        """Quita los documentos de las facturas indicadas (o todos si no se indica ninguna)."""
+        with self._candado:
+            if not ids:
+                self._tickets.clear()
+                return
+            ids = {int(id_factura) for id_factura in ids}
+            for clave in [clave for clave in self._tickets if clave[0] in ids]:
+                del self._tickets[clave]
+
+
+cache_tickets = CacheTickets()
+
+
+@event.listens_for(Session, "after_flush")
+def invalidar_tickets_modificados(session, flush_context):
+    """Invalida los tickets de las facturas que el ORM modificó o eliminó."""
+    ids = {
+        objeto.ID_Factura
+        for objeto in (*session.dirty, *session.deleted)
+        if isinstance(objeto, (Facturas, DetalleFacturas)) and objeto.ID_Factura is not None
+    }
+    if ids:
+        cache_tickets.invalidar(*ids)
+
+
+def obtener_ticket_factura(db, id_factura):
+    """
+    Devuelve el ticket de una factura sin volver a armarlo si ya existe:
+    primero la caché, después el último ticket de la bandeja de impresión
+    y, si no hay ninguno, lo arma desde la base de datos.
+    :param db: Sesión de base de datos.
+    :param id_factura: ID de la factura.
+    :return: Lista de comandos de impresión o None si la factura no existe.
+    """
+    documento = cache_tickets.obtener(id_factura)
+    if documento is not None:
+        return documento
+
+    documento = obtener_ultimo_documento_factura(db, id_factura, TITULO_TICKET_VENTA)
+    if documento is None:
+        factura_completa = obtener_factura_completa(db, id_factura)
+        if not factura_completa:
+            return None
+        venta_credito = db.query(VentaCredito).filter(VentaCredito.ID_Factura == id_factura).first()
+        documento = armar_ticket_factura(factura_completa, venta_credito)
+
+    cache_tickets.guardar(id_factura, documento)
+    return documento
+
+
+def imprimir_ticket(id_factura, documento, titulo=TITULO_TICKET_VENTA):
+    """
+    Guarda el ticket en la caché y lo envía a la cola de impresión.
+    :param id_factura: ID de la factura (opcional).
+    :param documento: Lista de comandos de impresión.
+    :param titulo: Título del trabajo; los comprobantes de abono usan
+        TITULO_COMPROBANTE_ABONO para no reemplazar el ticket de la factura.
+    :return: ID del trabajo de impresión.
+    """
+    if id_factura is not None:
+        cache_tickets.guardar(id_factura, documento, titulo)
+    return imprimir_documento(titulo, documento, id_factura)
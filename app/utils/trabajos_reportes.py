@@ -0,0 +1,125 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+import threading
+import traceback
+
+
+class ReporteCancelado(Exception):
+    """Se lanza dentro de un trabajo cuando el usuario lo cancela."""
+
+
+class SenalesTrabajo(QObject):
+    """
+    Señales de un trabajo de reporte. Se emiten desde el hilo del trabajo y
+    Qt las entrega en el hilo de la interfaz.
+    """
+
+    iniciado = pyqtSignal(str)
+    progreso = pyqtSignal(int, str)
+    terminado = pyqtSignal(object)
+    fallido = pyqtSignal(str)
+    cancelado = pyqtSignal()
+
+
+class TrabajoReporte(QRunnable):
+    """
+    Ejecuta la consulta, los gráficos y el armado del PDF de un reporte
+    fuera del hilo de la interfaz.
+
+    La función recibe un argumento `informar(porcentaje, mensaje)` que
+    publica el progreso y corta el trabajo si fue cancelado.
+
+    Args:
+        nombre (str): Nombre del reporte (para mostrar en la interfaz).
+        funcion (function): Función que genera el reporte.
+    """
+
+    def __init__(self, nombre, funcion, *args, **kwargs):
+        super().__init__()
+        self.nombre = nombre
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.senales = SenalesTrabajo()
+        self._cancelar = threading.Event()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def informar(self, porcentaje, mensaje=""):
+        if self._cancelar.is_set():
+            raise ReporteCancelado()
+        self.senales.progreso.emit(int(porcentaje), mensaje)
+
+    def run(self):
+        if self._cancelar.is_set():
+            self.senales.cancelado.emit()
+            return
+
+        self.senales.iniciado.emit(self.nombre)
+        try:
+            resultado = self.funcion(*self.args, informar=self.informar, **self.kwargs)
+        except ReporteCancelado:
+            self.senales.cancelado.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.senales.fallido.emit(str(e))
+        else:
+            self.senales.progreso.emit(100, "Listo")
+            self.senales.terminado.emit(resultado)
+
+
+class ColaReportes(QObject):
+    """
+    Cola de reportes en segundo plano. Los trabajos se ejecutan de a uno
+    (matplotlib y ReportLab comparten estado global) en un QThreadPool
+    propio, así el hilo de la interfaz y las ventas no se bloquean.
+    """
+
+    cola_cambiada = pyqtSignal(int)
+
+    def __init__(self, parent=None, hilos=1):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(hilos)
+        self.trabajos = []
+
+    def encolar(self, nombre, funcion, *args, **kwargs):
+        """
+        Agrega un reporte a la cola.
+        :return: El TrabajoReporte creado, para conectar sus señales.
+        """
+        trabajo = TrabajoReporte(nombre, funcion, *args, **kwargs)
+        for senal in (
+            trabajo.senales.terminado,
+            trabajo.senales.fallido,
+            trabajo.senales.cancelado,
+        ):
+            senal.connect(lambda *_, t=trabajo: self._finalizar(t))
+
+        self.trabajos.append(trabajo)
+        # Iniciar en la próxima vuelta del ciclo de eventos, así quien encola
+        # alcanza a conectar las señales del trabajo antes de que se emitan
+        QTimer.singleShot(0, lambda: self.pool.start(trabajo))
+        self.cola_cambiada.emit(len(self.trabajos))
+        return trabajo
+
+    def _finalizar(self, trabajo):
+        if trabajo in self.trabajos:
+            self.trabajos.remove(trabajo)
+        self.cola_cambiada.emit(len(self.trabajos))
+
+    def cancelar_actual(self):
+        """Cancela el primer trabajo de la cola (el que se está ejecutando)."""
+        if self.trabajos:
+            self.trabajos[0].cancelar()
+
+    def cancelar_todos(self):
+        for trabajo in list(self.trabajos):
+            trabajo.cancelar()
+
+    def pendientes(self):
+        return len(self.trabajos)
@@ -3,25 +3,33 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QStackedWidget,
 )
+from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QIcon
-from app.view import (
-    Navbar_View,
-    Respaldo_View,
-    ControlUsuario_View,
-    VentasCredito_View,
-    Facturas_View,
-    CrediFactura_View,
-    VentasA_View,
-    VentasB_View,
-    VentasC_View,
-    Caja_View,
-    Egreso_View,
-    Productos_View,
-    Reportes_View,
-    PagoCredito_View,
-    Cliente_View,
-    #Cambio_View,
-)
+import importlib
+
+from app.view import Navbar_View
+
+# Vistas del contenido: nombre -> (módulo, clase). Cada vista se importa y se
+# construye la primera vez que se muestra, no al iniciar la aplicación.
+VISTAS = {
+    "caja": ("app.view.CajaView", "Caja_View"),
+    "ventasA": ("app.view.VentasAView", "VentasA_View"),
+    "ventasB": ("app.view.VentasBView", "VentasB_View"),
+    "ventasC": ("app.view.VentasCView", "VentasC_View"),
+    "ventasCredito": ("app.view.VentasCreditoView", "VentasCredito_View"),
+    "facturas": ("app.view.FacturasView", "Facturas_View"),
+    #"crediFactura": ("app.view.CrediFacturaView", "CrediFactura_View"),
+    "egreso": ("app.view.EgresoView", "Egreso_View"),
+    "productos": ("app.view.ProductosView", "Productos_View"),
+    "respaldo_view": ("app.view.RespaldoView", "Respaldo_View"),
+    "control_usuario_view": ("app.view.ControlUsuarioView", "ControlUsuario_View"),
+    "reportes": ("app.view.ReportesView", "Reportes_View"),
+    "pagoCredito": ("app.view.PagoCreditoView", "PagoCredito_View"),
+    "Clientes": ("app.view.ClientesView", "Cliente_View"),
+    #"cambio": ("app.view.CambioView", "Cambio_View"),
+}
+
+
 class MainApp(QWidget):
     def __init__(self, parent=None):
         super(MainApp, self).__init__(parent)
@@ -48,125 +56,111 @@ class MainApp(QWidget):
             self.stacked_widget
         )  # Agregar el QStackedWidget al lado derecho
 
-        # Crear y agregar vistas al QStackedWidget
-        self.caja = Caja_View()
-        self.ventasA = VentasA_View()
-        self.ventasB = VentasB_View()
-        #self.ventasCredito = VentasCredito_View()
-
-        self.ventasC = VentasC_View()
-        self.ventasCredito = VentasCredito_View()
-        self.facturas = Facturas_View()
-        self.egreso = Egreso_View()
-        self.productos = Productos_View()
-        self.respaldo_view = Respaldo_View()
-        self.control_usuario_view = ControlUsuario_View()
-        self.reportes = Reportes_View()
-        #self.crediFactura = CrediFactura_View()
-        self.pagoCredito = PagoCredito_View()
-        self.Clientes = Cliente_View()
-        #self.cambio = Cambio_View()
-        
-        self.stacked_widget.addWidget(self.caja)  # Índice 4
-        self.stacked_widget.addWidget(self.ventasA)  # Índice 0
-        self.stacked_widget.addWidget(self.ventasB)  # Índice 1
-        #self.stacked_widget.addWidget(self.cambio)  # Índice 1
-        #self.stacked_widget.addWidget(self.ventasCredito)  # Índice 1
-        self.stacked_widget.addWidget(self.ventasC)  # Índice 1
-        self.stacked_widget.addWidget(self.facturas)  # Índice 2
-        # self.stacked_widget.addWidget(self.crediFactura)  # Índice 3
-        self.stacked_widget.addWidget(self.egreso)  # Índice 5
-        self.stacked_widget.addWidget(self.productos)  # Índice 6
-        self.stacked_widget.addWidget(self.respaldo_view)  # Índice 7
-        self.stacked_widget.addWidget(self.control_usuario_view)  # Índice 8
-        self.stacked_widget.addWidget(self.reportes)  # Índice 9
-        self.stacked_widget.addWidget(self.pagoCredito)  # Índice 9
-        self.stacked_widget.addWidget(self.Clientes)  # Índice 9
+        # Vistas ya construidas y usuario que se les asigna al crearlas
+        self.vistas = {}
+        self.usuario_actual_id = None
 
         # Conectar los botones del Navbar para cambiar las vistas del contenido
-        self.navbar.BtnVentas.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasA)
-        )
-        self.navbar.BtnCaja.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.caja)
-        )
-        """self.navbar.BtnCambio.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.cambio)
-        )"""
-        """self.navbar.BtnCredito.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasCredito)
-        )"""
-        self.navbar.BtnEgreso.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.egreso)
-        )
-        self.navbar.BtnRespaldo.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.respaldo_view)
-        )
-        self.navbar.BtnProductos.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.productos)
-        )
-        """self.navbar.BtnCrediFactura.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.crediFactura)
-        )"""
-        self.navbar.BtnFacturas.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.facturas)
-        )
-        self.navbar.BtnReportes.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.reportes)
-        )
-        self.navbar.BtnControlUsuario.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.control_usuario_view)
-        )
-
-        self.ventasA.cambiar_a_ventanab.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasB)
-        )
-        self.ventasA.cambiar_a_ventanac.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasC)
-        )
-        self.ventasB.cambiar_a_ventanaA.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasA)
-        )
-        self.ventasB.cambiar_a_ventanaC.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasC)
-        )
-        self.ventasC.cambiar_a_ventanaA.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasA)
-        )
-        self.ventasC.cambiar_a_ventanaB.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.ventasB)
-        )
-        self.navbar.BtnClientes.clicked.connect(
-            lambda: self.stacked_widget.setCurrentWidget(self.Clientes)
-        )
-        
-        self.facturas.enviar_facturas_A.connect(self.cambiar_a_ventasA)
-        self.facturas.enviar_facturas_B.connect(self.cambiar_a_ventasB)
-        self.facturas.enviar_facturas_C.connect(self.cambiar_a_ventasC)
-        #self.facturas.enviar_facturas_Credito.connect(self.cambiar_a_ventasCredito)
-        #self.crediFactura.enviar_facturas_Credito.connect(self.cambiar_a_ventasCredito)
-        #self.crediFactura.enviar_ventaCredito.connect(self.cambiar_a_pagoCredito)
+        botones = {
+            self.navbar.BtnVentas: "ventasA",
+            self.navbar.BtnCaja: "caja",
+            #self.navbar.BtnCambio: "cambio",
+            #self.navbar.BtnCredito: "ventasCredito",
+            self.navbar.BtnEgreso: "egreso",
+            self.navbar.BtnRespaldo: "respaldo_view",
+            self.navbar.BtnProductos: "productos",
+            #self.navbar.BtnCrediFactura: "crediFactura",
+            self.navbar.BtnFacturas: "facturas",
+            self.navbar.BtnReportes: "reportes",
+            self.navbar.BtnControlUsuario: "control_usuario_view",
+            self.navbar.BtnClientes: "Clientes",
+        }
+        for boton, nombre in botones.items():
+            boton.clicked.connect(lambda _=False, n=nombre: self.mostrar_vista(n))
+
+        # El respaldo automático corre con el temporizador de su vista: se
+        # crea apenas arranca el ciclo de eventos, sin demorar la ventana.
+        QTimer.singleShot(0, lambda: self.vista("respaldo_view"))
+
+    def vista(self, nombre):
+        """
+        Devuelve la vista indicada, creándola y agregándola al
+        QStackedWidget la primera vez que se pide.
+        :param nombre: Nombre de la vista en VISTAS.
+        :return: La vista.
+        """
+        vista = self.vistas.get(nombre)
+        if vista is not None:
+            return vista
+
+        modulo, clase = VISTAS[nombre]
+        vista = getattr(importlib.import_module(modulo), clase)()
+        self.vistas[nombre] = vista
+        self.stacked_widget.addWidget(vista)
+        if hasattr(vista, "usuario_actual_id"):
+            vista.usuario_actual_id = self.usuario_actual_id
+        self.conectar_vista(nombre, vista)
+        return vista
+
+    def conectar_vista(self, nombre, vista):
+        """Conecta las señales de navegación de una vista recién creada."""
+        if nombre == "ventasA":
+            vista.cambiar_a_ventanab.connect(lambda: self.mostrar_vista("ventasB"))
+            vista.cambiar_a_ventanac.connect(lambda: self.mostrar_vista("ventasC"))
+        elif nombre == "ventasB":
+            vista.cambiar_a_ventanaA.connect(lambda: self.mostrar_vista("ventasA"))
+            vista.cambiar_a_ventanaC.connect(lambda: self.mostrar_vista("ventasC"))
+        elif nombre == "ventasC":
+            vista.cambiar_a_ventanaA.connect(lambda: self.mostrar_vista("ventasA"))
+            vista.cambiar_a_ventanaB.connect(lambda: self.mostrar_vista("ventasB"))
+        elif nombre == "facturas":
+            vista.enviar_facturas_A.connect(self.cambiar_a_ventasA)
+            vista.enviar_facturas_B.connect(self.cambiar_a_ventasB)
+            vista.enviar_facturas_C.connect(self.cambiar_a_ventasC)
+            #vista.enviar_facturas_Credito.connect(self.cambiar_a_ventasCredito)
+        #elif nombre == "crediFactura":
+            #vista.enviar_facturas_Credito.connect(self.cambiar_a_ventasCredito)
+            #vista.enviar_ventaCredito.connect(self.cambiar_a_pagoCredito)
+
+    def mostrar_vista(self, nombre):
+        """Muestra la vista indicada, creándola si todavía no existe."""
+        vista = self.vista(nombre)
+        self.stacked_widget.setCurrentWidget(vista)
+        return vista
+
+    def establecer_usuario(self, id_usuario):
+        """
+        Guarda el usuario autenticado y lo asigna a las vistas ya creadas;
+        las que se creen después lo reciben en vista().
+        """
+        self.usuario_actual_id = id_usuario
+        for vista in self.vistas.values():
+            if hasattr(vista, "usuario_actual_id"):
+                vista.usuario_actual_id = id_usuario
+
+    def __getattr__(self, nombre):
+        # Compatibilidad con self.caja, self.ventasA, ... de antes del registro
+        if nombre in VISTAS:
+            return self.vista(nombre)
+        raise AttributeError(nombre)
 
     def cambiar_a_ventasA(self, factura_completa):
         try:
-            self.stacked_widget.setCurrentWidget(self.ventasA)
-            self.ventasA.cargar_información(factura_completa)
+            self.mostrar_vista("ventasA").cargar_información(factura_completa)
 
         except Exception as e:
             print(f"Error al cargar datos VentasA: {e}")
 
     def cambiar_a_ventasB(self, factura_completa):
         try:
-            self.stacked_widget.setCurrentWidget(self.ventasB)
-            self.ventasB.cargar_información(factura_completa)
+            self.mostrar_vista("ventasB").cargar_información(factura_completa)
 
         except Exception as e:
             print(f"Error al cargar datos VentasB: {e}")
     
     def cambiar_a_ventasC(self, factura_completa):
         try:
-            self.stacked_widget.setCurrentWidget(self.ventasC)
-            self.ventasC.cargar_información(factura_completa)
+            self.mostrar_vista("ventasC").cargar_información(factura_completa)
 
         except Exception as e:
             print(f"Error al cargar datos VentasB: {e}")
@@ -7,7 +7,7 @@ from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtCore import pyqtSignal
 from PyQt5 import QtGui
 from PyQt5.QtCore import Qt
-from ..utils.Estructura_Reporte import *
+from datetime import datetime
 
 from ..ui import Ui_Caja
 from ..database.database import *
@@ -119,6 +119,8 @@ class Caja_View(QWidget, Ui_Caja):
                 )
 
                 # Enviar los datos a la función de generación de PDF
+                # (ReportLab se carga solo al generar el reporte)
+                from ..utils.Estructura_Reporte import generar_pdf_caja_ingresos
                 generar_pdf_caja_ingresos(caja, ingresos)
 
             else:
@@ -236,22 +238,20 @@ class Caja_View(QWidget, Ui_Caja):
             
     def sumar_total(self):
         
+        # Los totales se acumulan en la caja abierta con cada venta, abono y egreso
+        db = SessionLocal()
         try:
-            monto = []
-            for row in range(self.TablaIngresos.rowCount()):  
-                
-                efectivo = self.TablaIngresos.item(row, 2).text()
-                trasferencia = self.TablaIngresos.item(row, 3).text()
-                monto.append((float(efectivo), float(trasferencia)))
-                
-            efectivo = sum(monto[0] for monto in monto)
-            trasferencia = sum(monto[1] for monto in monto)
+            totales = obtener_totales_caja_abierta(db)
+            efectivo = totales["efectivo"] if totales else 0.0
+            trasferencia = totales["transaccion"] if totales else 0.0
             
             self.OutEfectivo.setText(f"{efectivo:,.2f}")
             self.OutTransferencia.setText(f"{trasferencia:,.2f}")
             self.OutTotal.setText(f"{efectivo + trasferencia:,.2f}")
         except Exception as e:
             print(f"Error al sumar total: {e}")
+        finally:
+            db.close()
         
     def crear_caja(self):
 
@@ -306,34 +306,21 @@ class Caja_View(QWidget, Ui_Caja):
         finally:
             self.db.close()
         
-        count = 0
-        for row in range(self.TablaCaja.rowCount()):    
-            if self.TablaCaja.item(row, 8).text() == "Cerrada":
-                count += 1
-                if count == self.TablaCaja.rowCount():
-                    QMessageBox.warning(self, "Error", "No se encontró ninguna caja Abierta.")
-                    return
+        self.db = SessionLocal()
+        try:
+            caja = buscar_caja_abierta(self.db)
+            if not caja:
+                QMessageBox.warning(self, "Error", "No se encontró ninguna caja Abierta.")
+                return
             
-            if self.TablaCaja.item(row, 8).text() == "Abierta":
-                
-                efectivo = self.OutEfectivo.text().strip()
-                efectivo = float(efectivo.replace(",", ""))
-                trasferencia = self.OutTransferencia.text().strip()
-                trasferencia = float(trasferencia.replace(",", ""))
-                total = self.OutTotal.text().strip()
-                total = float(total.replace(",", ""))
-        
-                id_caja = self.TablaCaja.item(row, 0).text()
-                self.db = SessionLocal()
-                try:
-                    actualizar_caja(db=self.db, id_caja=id_caja, estado=False, monto_efectivo=efectivo, monto_transaccion=trasferencia, monto_final_calculado=total, fecha_cierre=datetime.now().replace(microsecond=0))
-                    self.limpiar_tabla()
-                    self.mostrar_tabla()
-                    QMessageBox.information(self, "Caja cerrada", "La caja ha sido cerrada exitosamente.")
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Error al cerrar la caja en bd: {str(e)}")
-                finally:
-                    self.db.close()
+            cerrar_caja(db=self.db, id_caja=caja.ID_Caja, fecha_cierre=datetime.now().replace(microsecond=0))
+            self.limpiar_tabla()
+            self.mostrar_tabla()
+            QMessageBox.information(self, "Caja cerrada", "La caja ha sido cerrada exitosamente.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al cerrar la caja en bd: {str(e)}")
+        finally:
+            self.db.close()
                     
         self.OutEfectivo.setText("0.00")
         self.OutTotal.setText("0.00")
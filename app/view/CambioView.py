@@ -3,7 +3,8 @@ from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
 from ..ui import Ui_Cambio
 from ..database.database import SessionLocal
-from ..controllers.producto_crud import buscar_productos, actualizar_producto
+from ..controllers.producto_crud import buscar_productos
+from ..controllers.movimientos_inventario_crud import ajustar_stock
 from ..controllers.caja_crud import Caja
 from ..controllers.ingresos_crud import crear_ingreso
 from ..models.pago_credito import PagoCredito
@@ -196,17 +197,14 @@ class Cambio_View(QWidget, Ui_Cambio):
             devuelto_valor = self.SpinDevuelto.value()
             cambio_valor = self.SpinCambio.value()
 
-            # Actualizar stocks
-            actualizar_producto(
+            # Actualizar stocks en una sola transacción, sobre el stock vigente
+            ajustar_stock(
                 self.db,
-                self.producto_devuelto.ID_Producto,
-                stock_actual=self.producto_devuelto.Stock_actual + devuelto_valor
-            )
-
-            actualizar_producto(
-                self.db,
-                self.producto_cambio.ID_Producto,
-                stock_actual=self.producto_cambio.Stock_actual - cambio_valor
+                {
+                    self.producto_devuelto.ID_Producto: devuelto_valor,
+                    self.producto_cambio.ID_Producto: -cambio_valor,
+                },
+                tipo="Cambio",
             )
 
             QMessageBox.information(self, "Éxito", "Cambio realizado correctamente")
@@ -11,8 +11,11 @@ from ..controllers.facturas_crud import *
 from ..controllers.producto_crud import *
 from ..controllers.tipo_ingreso_crud import *
 from ..controllers.ingresos_crud import *
+from ..controllers.checkout_crud import cancelar_ventas
 from ..utils.enviar_notifi import enviar_notificacion
-from ..utils.restructura_ticket import generate_ticket
+from ..utils.ticket import obtener_ticket_factura, imprimir_ticket, cache_tickets
+from ..utils.cola_impresion import documento_a_texto
+from ..utils.tabla_paginada import ModeloTablaPaginada
 
 
 class Facturas_View(QWidget, Ui_Facturas):
@@ -29,6 +32,18 @@ class Facturas_View(QWidget, Ui_Facturas):
         )
         self.InputBuscador.textChanged.connect(self.buscar_facturas)
 
+        self.busqueda = None
+        self.reemplazar_tabla_facturas()
+        self.modelo_facturas = ModeloTablaPaginada(
+            encabezados=self.encabezados_facturas,
+            cargar_pagina=self.cargar_pagina_facturas,
+            formatear_fila=self.formatear_factura,
+            clave_fila=lambda row: (row.Fecha_Factura, row.ID_Factura),
+            color_fila=lambda row: QtGui.QColor("green" if row.Domicilio == True else "black"),
+            parent=self,
+        )
+        self.TablaFacturas.setModel(self.modelo_facturas)
+
         self.TablaFacturas.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.TablaFacturas.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
         self.TablaFacturas.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
@@ -59,108 +74,80 @@ class Facturas_View(QWidget, Ui_Facturas):
             )
             return
         
-        for id_factura in ids:
-            facturas = obtener_factura_por_id(self.db, id_factura)
-            if facturas.Estado == True:
-                QMessageBox.warning(self, "Factura", f"La factura {id_factura} ya está pagada.")
-                return 
-            
-            if facturas.tipofactura == "Credito":
-                QMessageBox.warning(self, "Factura", f"La factura {id_factura} no es una factura de venta.")
-                return
+        db = SessionLocal()
+        try:
+            cancelar_ventas(db, ids)
+        except ValueError as e:
+            QMessageBox.warning(self, "Factura", str(e))
+            return
+        except Exception as e:
+            enviar_notificacion("Error", f"Error al cancelar factura(s): {e}")
+            return
+        finally:
+            db.close()
+        cache_tickets.invalidar(*ids)
 
-            factura_completa = obtener_factura_completa(self.db, id_factura)
-            
-            productos = factura_completa["Detalles"]
-            
-            for producto in productos:
-                id_producto = producto["ID_Producto"]
-                cantidad = producto["Cantidad"]
-                
-                producto = obtener_producto_por_id(self.db, id_producto)
-                
-                stock = producto[0].Stock_actual
-                cantidad = cantidad + stock
-                actualizar_producto(db=self.db, id_producto=id_producto, stock_actual=cantidad)
-                
-            eliminar_factura(self.db, id_factura)
-            
         self.limpiar_tabla_facturas()
         self.mostrar_facturas()
         enviar_notificacion("Éxito", "Factura(s) cancelada(s) correctamente.")
         
+    def reemplazar_tabla_facturas(self):
+        """
+        Cambia la QTableWidget del diseño por una QTableView con el mismo
+        aspecto, para poder mostrar las facturas desde un modelo paginado.
+        """
+        tabla_widget = self.TablaFacturas
+        self.encabezados_facturas = [
+            tabla_widget.horizontalHeaderItem(col).text()
+            for col in range(tabla_widget.columnCount())
+        ]
+
+        tabla = QtWidgets.QTableView(tabla_widget.parentWidget())
+        tabla.setSizePolicy(tabla_widget.sizePolicy())
+        tabla.setMinimumSize(tabla_widget.minimumSize())
+        tabla.setFont(tabla_widget.font())
+        tabla.setStyleSheet(tabla_widget.styleSheet().replace("QTableWidget", "QTableView"))
+        tabla.setObjectName("TablaFacturas")
+
+        self.verticalLayout_3.replaceWidget(tabla_widget, tabla)
+        tabla_widget.deleteLater()
+        self.TablaFacturas = tabla
+
+    def cargar_pagina_facturas(self, despues_de, limite):
+        db = SessionLocal()
+        try:
+            return obtener_facturas_pagina(db, despues_de, limite, self.busqueda)
+        finally:
+            db.close()
+
+    def formatear_factura(self, row):
+        total = row.Monto_efectivo + row.Monto_TRANSACCION
+        return [
+            str(row.ID_Factura),
+            str(row.usuario),
+            str(row.metodopago),
+            str(row.cliente),
+            str(row.tipofactura),
+            str(row.Fecha_Factura),
+            str(row.fecha_modificacion) if row.fecha_modificacion else "Actual",
+            str(row.Monto_efectivo),
+            str(row.Monto_TRANSACCION),
+            str(total),
+            "Pagado" if row.Estado else "Pendiente",
+        ]
+
     def mostrar_facturas(self):
-        # Obtener datos de la tabla
+        # Sesión para las acciones sobre las facturas seleccionadas
         self.db = SessionLocal()
-        rows = obtener_facturas(self.db)
 
-        self.actualizar_tabla_facturas(rows)
-        print("Mostrar facturas en la tabla")
+        # Cargar solo la primera página; el resto llega al desplazar la tabla
+        self.busqueda = None
+        self.modelo_facturas.reiniciar()
 
-        # Cerrar la conexión a la base de datos
         self.db.close()
 
     def limpiar_tabla_facturas(self):
-        self.TablaFacturas.setRowCount(0)
-
-    def actualizar_tabla_facturas(self, rows):
-        if not rows:
-            print("No hay filas para mostrar.")
-            self.TablaFacturas.setRowCount(0)
-            return
-
-        try:
-            self.TablaFacturas.setRowCount(0)
-
-             # Ordenar filas por ID en orden descendente (de mayor a menor)
-            rows.sort(key=lambda x: x.ID_Factura, reverse=False)
-            # Iterar sobre las filas
-            for row_idx, row in enumerate(rows):
-                # Datos de la fila
-                id_factura = str(row.ID_Factura)
-                fecha = str(row.Fecha_Factura)
-                fecha_conf = str(row.fecha_modificacion) if row.fecha_modificacion else "Actual"
-                cliente = str(row.cliente)
-                monto_efectivo = str(row.Monto_efectivo)
-                monto_transaccion = str(row.Monto_TRANSACCION)
-                estado = "Pagado" if row.Estado else "Pendiente"
-                id_tipo_factura = str(row.tipofactura)
-                id_metodo_pago = str(row.metodopago)
-                usuario = str(row.usuario)
-                total = row.Monto_efectivo + row.Monto_TRANSACCION
-                domicilio = row.Domicilio
-
-                self.TablaFacturas.insertRow(0)
-                # Configurar items de la tabla
-                items = [
-                    (id_factura, 0),
-                    (usuario, 1),
-                    (id_metodo_pago, 2),
-                    (cliente, 3),
-                    (id_tipo_factura, 4),
-                    (fecha, 5),
-                    (fecha_conf, 6),  # Texto fijo
-                    (monto_efectivo, 7),
-                    (monto_transaccion, 8),
-                    (str(total), 9),
-                    (estado, 10),
-                ]
-
-                # Determinar color de texto
-                if domicilio == True:
-                    color = QtGui.QColor("green")
-                else:
-                    color = QtGui.QColor("black")
-
-                # Añadir items a la tabla
-                for value, col_idx in items:
-                    item = QtWidgets.QTableWidgetItem(value)
-                    item.setTextAlignment(QtCore.Qt.AlignCenter)
-                    item.setForeground(QtGui.QBrush(color))
-                    self.TablaFacturas.setItem(0, col_idx, item)
-                    
-        except Exception as e:
-            print(f"Error al mostrar las facturas: {e}")
+        self.modelo_facturas.limpiar()
 
     def obtener_ids_seleccionados(self):
         """
@@ -170,10 +157,7 @@ class Facturas_View(QWidget, Ui_Facturas):
         ids = []
 
         for fila in filas_seleccionadas:
-            id_producto = self.TablaFacturas.item(
-                fila.row(), 0
-            ).text()  # Columna 0: ID del producto
-            ids.append(int(id_producto))
+            ids.append(self.modelo_facturas.fila(fila.row()).ID_Factura)
 
         return ids
 
@@ -233,12 +217,8 @@ class Facturas_View(QWidget, Ui_Facturas):
             self.mostrar_facturas()
             return
 
-        self.db = SessionLocal()
-
-        facturas = buscar_facturas(self.db, busqueda)
-        self.actualizar_tabla_facturas(facturas)
-
-        self.db.close()
+        self.busqueda = busqueda
+        self.modelo_facturas.reiniciar()
 
     def generar_ticket(self):
         ids = self.obtener_ids_seleccionados()
@@ -249,59 +229,29 @@ class Facturas_View(QWidget, Ui_Facturas):
 
         db = SessionLocal()
         try:
-            factura_completa = obtener_factura_completa(db, ids[0])
-
-            if not factura_completa:
-                QMessageBox.warning(self, "Error", "Factura no encontrada.")
-                return
-
-            factura = factura_completa["Factura"]
-            cliente = factura_completa["Cliente"]
-            detalles = factura_completa["Detalles"]
-
-            subtotal = sum(d["Subtotal"] for d in detalles)
-            descuento = factura["Descuento"]
-            total = subtotal - descuento
-
-            # 🧾 TEXTO TIPO TICKET
-            texto = f"""
-    ════════════════════════════
-            TICKET DE VENTA
-    ════════════════════════════
-    Factura #: {factura['ID_Factura']}
-    Fecha   : {factura['Fecha_Factura']}
-
-    Cliente : {cliente['Nombre']} {cliente['Apellido']}
-    Tel     : {cliente['Teléfono']}
-    Dirección:
-    {cliente['Direccion']}
-    ────────────────────────────
-    ITEM                TOTAL
-    ────────────────────────────
-    """
-
-            for d in detalles:
-                producto = d['Producto'][:16]  # corta para alinear
-                texto += f"{producto:<16} x{d['Cantidad']:<2} ${d['Subtotal']:>8,.2f}\n"
-
-            texto += f"""
-    ────────────────────────────
-    Subtotal        ${subtotal:>10,.2f}
-    Descuento       ${descuento:>10,.2f}
-    ────────────────────────────
-    TOTAL           ${total:>10,.2f}
-    ────────────────────────────
-    Pago: {factura['MetodoPago']}
-    ════════════════════════════
-        ¡GRACIAS POR SU COMPRA!
-    ════════════════════════════
-    """
-
-            QMessageBox.information(self, "🧾 Ticket de Venta", texto)
-
+            # El ticket se arma una sola vez por factura: si ya se imprimió
+            # se reutiliza sin volver a consultar ni formatear la factura
+            documento = obtener_ticket_factura(db, ids[0])
         finally:
             db.close()
 
+        if not documento:
+            QMessageBox.warning(self, "Error", "Factura no encontrada.")
+            return
+
+        # 🧾 TEXTO TIPO TICKET
+        mensaje = QMessageBox(self)
+        mensaje.setWindowTitle("🧾 Ticket de Venta")
+        mensaje.setText(documento_a_texto(documento))
+        mensaje.setStyleSheet("QLabel { font-family: 'Lucida Console', monospace; }")
+        boton_reimprimir = mensaje.addButton("Reimprimir", QMessageBox.AcceptRole)
+        mensaje.addButton("Cerrar", QMessageBox.RejectRole)
+        mensaje.exec_()
+
+        if mensaje.clickedButton() == boton_reimprimir:
+            imprimir_ticket(ids[0], documento)
+            enviar_notificacion("Ticket", "El ticket se envió a la impresora.")
+
 
     def factura_pagada(self):
         """
@@ -1,5 +1,8 @@
 from PyQt5.QtWidgets import (
+    QFileDialog,
+    QInputDialog,
     QMessageBox,
+    QPushButton,
     QWidget,
 )
 from PyQt5 import QtWidgets, QtCore, QtGui
@@ -9,6 +12,8 @@ from ..database.database import SessionLocal
 from ..controllers.producto_crud import *
 from ..controllers.marca_crud import *
 from ..controllers.categorias_crud import *
+from ..controllers.archivo_productos_crud import importar_productos, exportar_productos
+from ..utils.trabajos_reportes import ColaReportes
 from ..ui import Ui_Productos
 from PyQt5.QtCore import Qt
 
@@ -97,6 +102,19 @@ class Productos_View(QWidget, Ui_Productos):
         self.TablaProductos.cellClicked.connect(self.cargar_datos_fila)
         self.BtnIngresarProducto.clicked.connect(self.ingresar_producto)
         self.BtnEliminar.clicked.connect(self.eliminar_productos)
+
+        # Importación y exportación del catálogo en segundo plano
+        self.cola_archivos = ColaReportes(self)
+        self.BtnImportarProductos = QPushButton("Importar catálogo", self.widget_3)
+        self.BtnExportarProductos = QPushButton("Exportar catálogo", self.widget_3)
+        self.gridLayout_2.addWidget(self.BtnImportarProductos, 8, 1, 1, 1)
+        self.gridLayout_2.addWidget(self.BtnExportarProductos, 8, 2, 1, 1)
+        self.BtnImportarProductos.clicked.connect(self.importar_catalogo)
+        self.BtnExportarProductos.clicked.connect(self.exportar_catalogo)
+
+        self.BtnReajustarPrecios = QPushButton("Reajustar precios", self.widget_3)
+        self.gridLayout_2.addWidget(self.BtnReajustarPrecios, 8, 4, 1, 1)
+        self.BtnReajustarPrecios.clicked.connect(self.reajustar_precios)
         
     def verififcarInput(self):
         """ Borra los demás campos si InputTipoGasto está vacío. """
@@ -732,3 +750,169 @@ class Productos_View(QWidget, Ui_Productos):
                 self.db.close()
                 
             self.InputCodigo.setFocus()
+
+    def reajustar_precios(self):
+        """
+        Cambia en porcentaje el costo de los productos seleccionados o de una
+        marca o categoría, recalculando sus precios. Muestra una vista previa
+        antes de guardar.
+        """
+        alcance, ok = QInputDialog.getItem(
+            self,
+            "Reajustar precios",
+            "Aplicar a:",
+            ["Productos seleccionados", "Marca", "Categoría"],
+            0,
+            False,
+        )
+        if not ok:
+            return
+
+        db = SessionLocal()
+        try:
+            filtros = {}
+            if alcance == "Productos seleccionados":
+                ids = self.obtener_ids_seleccionados()
+                if not ids:
+                    enviar_notificacion("Advertencia", "No se seleccionaron productos.")
+                    return
+                filtros["ids_producto"] = ids
+            else:
+                if alcance == "Marca":
+                    opciones = {m.Nombre: m.ID_Marca for m in obtener_marcas(db)}
+                else:
+                    opciones = {c.Nombre: c.ID_Categoria for c in obtener_categorias(db)}
+                nombre, ok = QInputDialog.getItem(
+                    self, "Reajustar precios", f"{alcance}:", sorted(opciones), 0, False
+                )
+                if not ok:
+                    return
+                clave = "id_marca" if alcance == "Marca" else "id_categoria"
+                filtros[clave] = opciones[nombre]
+
+            porcentaje, ok = QInputDialog.getDouble(
+                self, "Reajustar precios", "Variación del costo (%):", 0, -90, 500, 2
+            )
+            if not ok or not porcentaje:
+                return
+
+            cambios = reajustar_precios(db, variacion=porcentaje / 100, simular=True, **filtros)
+            if not cambios:
+                enviar_notificacion("Info", "No hay productos para reajustar.")
+                return
+
+            vista_previa = "\n".join(
+                f"{c['Nombre'][:25]}: costo {c['Precio_costo'][0]:,.0f} → {c['Precio_costo'][1]:,.0f}, "
+                f"detal {c['Precio_venta_normal'][0]:,.0f} → {c['Precio_venta_normal'][1]:,.0f}"
+                for c in cambios[:15]
+            )
+            if len(cambios) > 15:
+                vista_previa += f"\n... y {len(cambios) - 15} más"
+            respuesta = QMessageBox.question(
+                self,
+                "Confirmar reajuste",
+                f"Se reajustarán {len(cambios)} producto(s):\n\n{vista_previa}\n\n¿Desea continuar?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if respuesta != QMessageBox.Yes:
+                return
+
+            cambios = reajustar_precios(db, variacion=porcentaje / 100, **filtros)
+            enviar_notificacion("Éxito", f"{len(cambios)} producto(s) reajustado(s).")
+            self.limpiar_tabla_productos()
+            self.mostrar_productos()
+        except Exception as e:
+            enviar_notificacion("Error", f"Error al reajustar precios: {e}")
+        finally:
+            db.close()
+
+    def importar_catalogo(self):
+        """
+        Importa productos desde un CSV o XLSX en segundo plano y muestra las
+        filas rechazadas al terminar.
+        """
+        ruta, _ = QFileDialog.getOpenFileName(
+            self, "Importar catálogo", "", "Catálogo (*.csv *.xlsx)"
+        )
+        if not ruta:
+            return
+
+        self.BtnImportarProductos.setEnabled(False)
+        trabajo = self.cola_archivos.encolar("Importar catálogo", importar_catalogo, ruta)
+        trabajo.senales.progreso.connect(
+            lambda porcentaje, mensaje: self.BtnImportarProductos.setText(f"{mensaje} ({porcentaje}%)")
+        )
+        trabajo.senales.terminado.connect(self.importacion_terminada)
+        trabajo.senales.fallido.connect(
+            lambda error: self.archivo_fallido("Error al importar el catálogo", error)
+        )
+
+    def importacion_terminada(self, resultado):
+        self.restaurar_botones_catalogo()
+        mensaje = (
+            f"Productos creados: {resultado['creados']}\n"
+            f"Productos actualizados: {resultado['actualizados']}"
+        )
+        rechazados = resultado["rechazados"]
+        if rechazados:
+            detalle = "\n".join(f"Fila {fila}: {motivo}" for fila, motivo in rechazados[:20])
+            if len(rechazados) > 20:
+                detalle += f"\n... y {len(rechazados) - 20} más"
+            mensaje += f"\nFilas rechazadas: {len(rechazados)}\n\n{detalle}"
+            QMessageBox.warning(self, "Importación terminada", mensaje)
+        else:
+            QMessageBox.information(self, "Importación terminada", mensaje)
+        self.limpiar_tabla_productos()
+        self.mostrar_productos()
+
+    def exportar_catalogo(self):
+        """Exporta todos los productos a un CSV o XLSX en segundo plano."""
+        ruta, _ = QFileDialog.getSaveFileName(
+            self, "Exportar catálogo", "productos.xlsx", "Excel (*.xlsx);;CSV (*.csv)"
+        )
+        if not ruta:
+            return
+
+        self.BtnExportarProductos.setEnabled(False)
+        trabajo = self.cola_archivos.encolar("Exportar catálogo", exportar_catalogo, ruta)
+        trabajo.senales.terminado.connect(
+            lambda resultado: (
+                self.restaurar_botones_catalogo(),
+                QMessageBox.information(
+                    self,
+                    "Éxito",
+                    f"{resultado['productos']} productos exportados en: {resultado['ruta']}",
+                ),
+            )
+        )
+        trabajo.senales.fallido.connect(
+            lambda error: self.archivo_fallido("Error al exportar el catálogo", error)
+        )
+
+    def archivo_fallido(self, mensaje, error):
+        self.restaurar_botones_catalogo()
+        QMessageBox.critical(self, "Error", f"{mensaje}: {error}")
+
+    def restaurar_botones_catalogo(self):
+        self.BtnImportarProductos.setText("Importar catálogo")
+        self.BtnImportarProductos.setEnabled(True)
+        self.BtnExportarProductos.setEnabled(True)
+
+
+def importar_catalogo(ruta, informar):
+    informar(0, "Leyendo archivo")
+    db = SessionLocal()
+    try:
+        return importar_productos(db, ruta, informar=informar)
+    finally:
+        db.close()
+
+
+def exportar_catalogo(ruta, informar):
+    informar(0, "Consultando productos")
+    db = SessionLocal()
+    try:
+        return exportar_productos(db, ruta, informar=informar)
+    finally:
+        db.close()
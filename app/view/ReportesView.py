@@ -1,4 +1,4 @@
-from PyQt5.QtWidgets import QWidget, QFileDialog
+from PyQt5.QtWidgets import QWidget, QFileDialog, QHBoxLayout, QLabel, QProgressBar, QPushButton
 from PyQt5.QtCore import QDate
 from PyQt5.QtWidgets import QMessageBox
 from ..database.database import SessionLocal
@@ -10,16 +10,11 @@ from ..controllers.venta_credito_crud import *
 from ..controllers.producto_crud import *
 from ..controllers.ingresos_crud import *
 from ..controllers.egresos_crud import *
-from ..controllers.facturas_crud import obtener_reporte_facturas
-from ..utils.Estructura_Reporte import crear_pdf, generar_analisis_financiero
-from ..utils.Credito__Reporte import generar_pdf_creditos
-from ..utils.Estructura_Reporte import crear_pdf, generar_pdf_productos_mas_vendidos
-from ..utils import Ingresos_egresos_reporte
+from ..controllers.ventas_diarias_crud import obtener_ganancias_diarias
+from ..utils.trabajos_reportes import ColaReportes
 from sqlalchemy import and_
 import os
 from datetime import datetime
-import tkinter as tk
-from tkinter import messagebox
 from sqlalchemy import and_, func
 
 
@@ -59,6 +54,10 @@ class Reportes_View(QWidget, Ui_Reportes):
         # Deshabilitar calendarios por defecto
         self.CalendarioCaja.setEnabled(True)
         self.CalendarioAnalisis.setEnabled(True)
+
+        # Cola de reportes en segundo plano
+        self.cola_reportes = ColaReportes(self)
+        self.crear_panel_progreso()
     
     def cambiar_estado(self):
         """
@@ -77,6 +76,9 @@ class Reportes_View(QWidget, Ui_Reportes):
             print(e)
             
     def obtener_creditos(self, tipo):
+        # Tkinter se carga al mostrar el mensaje, no al iniciar
+        from tkinter import messagebox
+
         tipo = "Análisis de crédito"
         resultado = self.obtener_creditos_analisis(tipo)
         if resultado:
@@ -87,177 +89,114 @@ class Reportes_View(QWidget, Ui_Reportes):
     
     
     def obtener_creditos_analisis(self, tipo):
-        db = SessionLocal()  # Iniciamos la sesión de base de datos
-        try:
-            if tipo == "Análisis de crédito":
-                
-                ventas = obtener_ventas_credito(db)
-                resultado = [] 
-
-                for venta in ventas:
-                    # Obtener los pagos asociados a cada venta usando el ID_Venta_Credito
-                    pagos = db.query(PagoCredito).filter(PagoCredito.ID_Venta_Credito == venta.ID_Venta_Credito).all()
-
-                    # Agregar los datos de la venta y sus pagos al resultado
-                    resultado.append({
-                        "venta": {
-                            "ID_Venta_Credito": venta.ID_Venta_Credito,
-                            "Total_Deuda": venta.Total_Deuda,
-                            "Saldo_Pendiente": venta.Saldo_Pendiente,
-                            "Fecha_Registro": venta.Fecha_Registro
-                        },
-                        "pagos": [{
-                            "ID_Pago_Credito": pago.ID_Pago_Credito,
-                            "Monto": pago.Monto,
-                            "Fecha_Registro": pago.Fecha_Registro,
-                            "Metodo_Pago": self.obtener_metodo_pago(db, pago.ID_Metodo_Pago),
-                            "Tipo_Pago": self.obtener_tipo_pago(db, pago.ID_Tipo_Pago)
-                        } for pago in pagos]
-                    })
-
-                # Enviar el resultado a la función que genera el reporte (por ejemplo, generar_pdf_creditos)
-                generar_pdf_creditos(self, resultado)
-
-            else:
-                #Reporte Comparación Financiera
-                if not self.fecha_inicio_analisis:
-                    QMessageBox.warning(self, "Error", "Debes seleccionar una fecha inicial")
-                    return
-                print(f"Fecha inicio seleccionada: {self.fecha_inicio_analisis}")
-                print(f"Fecha fin seleccionada: {self.fecha_fin_analisis}")
-                # Filtramos por las fechas si están definidas
-                if self.fecha_inicio_analisis and self.fecha_fin_analisis:
-                    fecha_inicio = self.fecha_inicio_analisis.toString('yyyy-MM-dd')
-                    fecha_fin = self.fecha_fin_analisis.toString('yyyy-MM-dd')
-                    # Asegurarse de que la fecha fin tenga la hora hasta el último minuto
-                    fecha_fin += " 23:59:59"  # Añadir las horas al final de la fecha de fin
-                    analisis = obtener_reporte_facturas(db=db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-                    ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio, FechaFin=fecha_fin)
-                    egresos = obtener_egresos_reporte(db=db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-                                        
-                    try:
-                        generar_analisis_financiero(analisis, ingresos, egresos)
-                    
-                    except Exception as e:
-                        print(f"Error al generar pdf Comparación Financiera - Intervalo de días: {e}")
-                                        
-                    #Generar_pdf(analisis)
-                    #analisis.ID_Factura
-                    #analisis.Tipo_Ingreso,
-                    #analisis.Monto_efectivo,
-                    #analisis.Monto_TRANSACCION,
-                    #analisis.ganancia_por_factura
-                    #analisis.Fecha_Factura,
-                    
-                elif self.fecha_inicio_analisis:
-                    
-                    fecha_inicio = self.fecha_inicio_analisis.toString('yyyy-MM-dd')
-                    fecha_fin = None
-                    
-                    analisis = obtener_reporte_facturas(db=db, fecha_inicio=fecha_inicio)
-                    ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio)
-                    egresos = obtener_egresos_reporte(db=db, fecha_inicio=fecha_inicio)
-                                    
-                    try: 
-                        generar_analisis_financiero(analisis, ingresos, egresos)
-                    except Exception as e:
-                        print(f"Error al generar pdf Análisis de crédito por fecha: {e}")
-                    #Generar_pdf(analisis)
-                    #analisis.ID_Factura
-                    #analisis.Tipo_Ingreso,
-                    #analisis.Monto_efectivo,
-                    #analisis.Monto_TRANSACCION,
-                    #analisis.ganancia_por_factura
-                    #analisis.Fecha_Factura,
-            
-        except Exception as e:
-            print(f"Error al generar el reporte Comparación Financiera: {e}")
-        finally:
-            db.close()  # Cerrar la sesión
-
-    # Funciones auxiliares para obtener los detalles del método de pago y tipo de pago
-    def obtener_metodo_pago(self, db, id_metodo_pago):
-        # Obtiene el nombre o detalle del método de pago
-        metodo_pago = db.query(MetodoPago).filter(MetodoPago.ID_Metodo_Pago == id_metodo_pago).first()
-        return metodo_pago.Nombre if metodo_pago else "Desconocido"
-
-    def obtener_tipo_pago(self, db, id_tipo_pago):
-        # Obtiene el nombre o detalle del tipo de pago
-        tipo_pago = db.query(TipoPago).filter(TipoPago.ID_Tipo_Pago == id_tipo_pago).first()
-        return tipo_pago.Nombre if tipo_pago else "Desconocido"
+        fecha_actual = datetime.now().strftime("%Y-%m-%d")
+
+        if tipo == "Análisis de crédito":
+            ruta = self.pedir_ruta_pdf(f"analisiscredito_{fecha_actual}.pdf", "Guardar análisis de crédito")
+            if ruta:
+                self.encolar_reporte("Análisis de crédito", reporte_creditos, ruta)
+            return
+
+        #Reporte Comparación Financiera
+        if not self.fecha_inicio_analisis:
+            QMessageBox.warning(self, "Error", "Debes seleccionar una fecha inicial")
+            return
+        print(f"Fecha inicio seleccionada: {self.fecha_inicio_analisis}")
+        print(f"Fecha fin seleccionada: {self.fecha_fin_analisis}")
+
+        fecha_inicio = self.fecha_inicio_analisis.toString('yyyy-MM-dd')
+        fecha_fin = None
+        if self.fecha_fin_analisis:
+            # Asegurarse de que la fecha fin tenga la hora hasta el último minuto
+            fecha_fin = self.fecha_fin_analisis.toString('yyyy-MM-dd') + " 23:59:59"
+
+        ruta = self.pedir_ruta_pdf(f"Analisis_financiero_{fecha_actual}.pdf", "Guardar análisis financiero")
+        if ruta:
+            self.encolar_reporte(
+                "Comparación Financiera", reporte_analisis_financiero, ruta, fecha_inicio, fecha_fin
+            )
 
     def obtener_ingresos_egresos(self, tipo):
-       
-        db = SessionLocal()
-        try:
-            if not self.fecha_inicio_caja:
-                QMessageBox.warning(self, "Error", "Debes seleccionar una fecha inicial")
-                return
-            
-            if tipo == "Egresos":
-                query = db.query(Egresos)  # Asegúrate de que "Egresos" es el nombre de tu modelo
-
-                # Depurar: Verificar las fechas seleccionadas
-                print(f"Fecha inicio seleccionada: {self.fecha_inicio_caja}")
-                print(f"Fecha fin seleccionada: {self.fecha_fin_caja}")
-
-                # Filtramos por las fechas si están definidas
-                if self.fecha_inicio_caja and self.fecha_fin_caja:
-                    fecha_inicio = self.fecha_inicio_caja.toString('yyyy-MM-dd')
-                    fecha_fin = self.fecha_fin_caja.toString('yyyy-MM-dd')
-                    
-                    # Asegurarse de que la fecha fin tenga la hora hasta el último minuto
-                    fecha_fin += " 23:59:59"  # Añadir las horas al final de la fecha de fin
-                    query = query.filter(and_(
-                        func.date(Egresos.Fecha_Egreso) >= fecha_inicio, 
-                        func.date(Egresos.Fecha_Egreso) <= fecha_fin))
-                    
-                elif self.fecha_inicio_caja:
-                    fecha_inicio = self.fecha_inicio_caja.toString('yyyy-MM-dd')
-                    fecha_fin = None
-                    # Ajustar la fecha de inicio para considerar solo el día, sin hora
-                    query = query.filter(func.date(Egresos.Fecha_Egreso) == fecha_inicio)
-
-                egresos = query.all()                    
-                datos = [(e.ID_Egreso, e.Tipo_Egreso, e.Monto_Egreso, e.Fecha_Egreso) for e in egresos]
-
-                Ingresos_egresos_reporte.generar_pdf_transacciones(datos, "egresos", fecha_inicio, fecha_fin)
+        if not self.fecha_inicio_caja:
+            QMessageBox.warning(self, "Error", "Debes seleccionar una fecha inicial")
+            return
+
+        print(f"Fecha inicio seleccionada: {self.fecha_inicio_caja}")
+        print(f"Fecha fin seleccionada: {self.fecha_fin_caja}")
+
+        fecha_inicio = self.fecha_inicio_caja.toString('yyyy-MM-dd')
+        fecha_fin = None
+        if self.fecha_fin_caja:
+            # Asegurarse de que la fecha fin tenga la hora hasta el último minuto
+            fecha_fin = self.fecha_fin_caja.toString('yyyy-MM-dd') + " 23:59:59"
+
+        tipo_reporte = "egresos" if tipo == "Egresos" else "ingresos"
+        ruta = self.pedir_ruta_pdf(f"{tipo_reporte}_{fecha_inicio}.pdf", f"Guardar Reporte de {tipo_reporte.capitalize()}")
+        if ruta:
+            self.encolar_reporte(
+                f"Reporte de {tipo_reporte}", reporte_transacciones, ruta, tipo_reporte, fecha_inicio, fecha_fin
+            )
+
+    def crear_panel_progreso(self):
+        """Agrega debajo de los reportes una barra de progreso con botón para cancelar."""
+        self.PanelProgreso = QWidget(self.widget)
+        layout = QHBoxLayout(self.PanelProgreso)
+        self.LabelProgreso = QLabel(self.PanelProgreso)
+        self.BarraProgreso = QProgressBar(self.PanelProgreso)
+        self.BarraProgreso.setRange(0, 100)
+        self.BtnCancelarReporte = QPushButton("Cancelar reporte", self.PanelProgreso)
+        self.BtnCancelarReporte.clicked.connect(self.cola_reportes.cancelar_actual)
+        layout.addWidget(self.LabelProgreso)
+        layout.addWidget(self.BarraProgreso)
+        layout.addWidget(self.BtnCancelarReporte)
+        self.verticalLayout_3.addWidget(self.PanelProgreso)
+        self.PanelProgreso.hide()
+
+        self.cola_reportes.cola_cambiada.connect(self.actualizar_panel_progreso)
+
+    def actualizar_panel_progreso(self, pendientes):
+        if pendientes == 0:
+            self.PanelProgreso.hide()
+            return
+        self.PanelProgreso.show()
+        if pendientes > 1:
+            self.BtnCancelarReporte.setText(f"Cancelar reporte ({pendientes - 1} en cola)")
+        else:
+            self.BtnCancelarReporte.setText("Cancelar reporte")
 
-            else:
-                print(f"Fecha inicio seleccionada: {self.fecha_inicio_caja}")
-                print(f"Fecha fin seleccionada: {self.fecha_fin_caja}")
-                ingresos = []
-                # Filtramos por las fechas si están definidas
-                if self.fecha_inicio_caja and self.fecha_fin_caja:
-                    fecha_inicio = self.fecha_inicio_caja.toString('yyyy-MM-dd')
-                    fecha_fin = self.fecha_fin_caja.toString('yyyy-MM-dd')
-                    # Asegurarse de que la fecha fin tenga la hora hasta el último minuto
-                    fecha_fin += " 23:59:59"  # Añadir las horas al final de la fecha de fin
-                    ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio, FechaFin=fecha_fin)
-                    
-                elif self.fecha_inicio_caja:
-                    fecha_inicio = self.fecha_inicio_caja.toString('yyyy-MM-dd')
-                    fecha_fin = None
-                    # Ajustar la fecha de inicio para considerar solo el día, sin hora
-                    ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio)
-
-                datos = []
-                for e in ingresos:
-                    if e.tipo_ingreso == "Venta":
-                        datos.append((e.ID_Ingreso, e.tipo_ingreso, e.monto_efectivo, e.monto_transaccion, e.fecha_venta))
-                    else:
-                        if e.metodo_pago == "Efectivo":
-                            efectivo = str(e.monto)
-                            tranferencia = "0.0"
-                        else:
-                            tranferencia = str(e.monto)
-                            efectivo = "0.0"
-                        datos.append((e.ID_Ingreso, e.tipo_ingreso, efectivo, tranferencia, e.fecha_abono))
-                Ingresos_egresos_reporte.generar_pdf_transacciones(datos, "ingresos", fecha_inicio, fecha_fin)
+    def pedir_ruta_pdf(self, nombre_por_defecto, titulo):
+        ruta_archivo, _ = QFileDialog.getSaveFileName(self, titulo, nombre_por_defecto, "PDF Files (*.pdf)")
+        if ruta_archivo and not ruta_archivo.lower().endswith(".pdf"):
+            ruta_archivo += ".pdf"
+        return ruta_archivo
+
+    def encolar_reporte(self, nombre, funcion, *args):
+        """
+        Envía un reporte a la cola de segundo plano. La interfaz sigue
+        respondiendo mientras se consulta la base de datos y se arma el PDF.
+        """
+        trabajo = self.cola_reportes.encolar(nombre, funcion, *args)
+        senales = trabajo.senales
+        senales.iniciado.connect(lambda nombre: self.LabelProgreso.setText(nombre))
+        senales.progreso.connect(self.mostrar_progreso)
+        senales.terminado.connect(
+            lambda ruta: QMessageBox.information(self, "Reporte generado", f"PDF generado en: {ruta}")
+        )
+        senales.fallido.connect(
+            lambda error: QMessageBox.critical(self, "Error", f"Error al generar {nombre}: {error}")
+        )
+        senales.cancelado.connect(self.reiniciar_progreso)
+
+    def mostrar_progreso(self, porcentaje, mensaje):
+        self.BarraProgreso.setValue(porcentaje)
+        self.BarraProgreso.setFormat(f"{mensaje} %p%")
+
+    def reiniciar_progreso(self):
+        """Deja la barra vacía para que un reporte cancelado no muestre su último avance."""
+        self.BarraProgreso.reset()
+        self.BarraProgreso.setFormat("%p%")
+        self.LabelProgreso.clear()
 
-        finally:
-            db.close()
-    
     def mostrar_mensaje(self, titulo, mensaje):
         """
         Muestra un mensaje emergente en caso de error o advertencia.
@@ -310,14 +249,14 @@ class Reportes_View(QWidget, Ui_Reportes):
 
     def generar_pdf(self):
         
-        from app.controllers.producto_crud import obtener_productos_mas_vendidos
         # Obtener el tipo de productos seleccionado en el ComboBox
         tipo_seleccionado = self.TipoProductosComboBox.currentText()  # Obtener el valor del ComboBox
         
         if tipo_seleccionado == "Más  Vendidos - Menos Vendidos":
-            db = SessionLocal()
-            productos =obtener_productos_mas_vendidos(db=db, limite=30)
-            generar_pdf_productos_mas_vendidos(productos)
+            fecha_actual = datetime.now().strftime("%Y-%m-%d")
+            ruta = self.pedir_ruta_pdf(f"Productos_Mas_Vendido_{fecha_actual}.pdf", "Guardar Reporte productos mas vendidos")
+            if ruta:
+                self.encolar_reporte("Productos más vendidos", reporte_mas_vendidos, ruta)
         
         else:
             # Obtener los productos de la base de datos según el tipo seleccionado
@@ -331,7 +270,10 @@ class Reportes_View(QWidget, Ui_Reportes):
             ruta_archivo, _ = QFileDialog.getSaveFileName(self, "Guardar PDF", nombre_pdf_por_defecto, "PDF Files (*.pdf)")
 
             # Verificar si se ha seleccionado una ruta y proceder con la creación del PDF
+            from tkinter import messagebox
+
             if ruta_archivo:  
+                from ..utils.Estructura_Reporte import crear_pdf
                 crear_pdf(ruta_archivo, productos, tipo_seleccionado)
 
                 # Mostrar mensaje de confirmación
@@ -342,6 +284,8 @@ class Reportes_View(QWidget, Ui_Reportes):
                 messagebox.showinfo("Operación cancelada", "No se ha seleccionado ninguna ruta para guardar el archivo.")
 
     def closeEvent(self, event):
+        from tkinter import messagebox
+
         # Verificar si el cuadro de diálogo de guardado ha sido abierto y no se ha seleccionado un archivo
         respuesta = messagebox.askyesno("Salir", "¿Estás seguro de que deseas salir sin guardar?")
 
@@ -417,3 +361,83 @@ class Reportes_View(QWidget, Ui_Reportes):
                 print("[Análisis] Modo Intervalo: Selecciona dos fechas.")
             else:
                 self.CalendarioAnalisis.setEnabled(False)
+
+
+# Trabajos de reporte: se ejecutan en la cola de segundo plano, abren su
+# propia sesión y no tocan widgets. Los módulos de PDF (ReportLab,
+# matplotlib, numpy) se importan dentro de cada trabajo, fuera del arranque.
+def reporte_creditos(ruta, informar):
+    informar(0, "Consultando créditos")
+    db = SessionLocal()
+    try:
+        resultado = obtener_libro_creditos(db)
+    finally:
+        db.close()
+    from ..utils.Credito__Reporte import construir_pdf_creditos
+
+    return construir_pdf_creditos(ruta, resultado, informar)
+
+
+def reporte_analisis_financiero(ruta, fecha_inicio, fecha_fin, informar):
+    informar(0, "Consultando ventas diarias")
+    db = SessionLocal()
+    try:
+        analisis = obtener_ganancias_diarias(db=db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        informar(15, "Consultando ingresos y egresos")
+        ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio, FechaFin=fecha_fin)
+        egresos = obtener_egresos_reporte(db=db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    finally:
+        db.close()
+    from ..utils.Estructura_Reporte import construir_analisis_financiero
+
+    return construir_analisis_financiero(ruta, analisis, ingresos, egresos, informar)
+
+
+def reporte_transacciones(ruta, tipo, fecha_inicio, fecha_fin, informar):
+    informar(0, f"Consultando {tipo}")
+    db = SessionLocal()
+    try:
+        if tipo == "egresos":
+            query = db.query(Egresos)
+            if fecha_fin:
+                query = query.filter(and_(
+                    func.date(Egresos.Fecha_Egreso) >= fecha_inicio,
+                    func.date(Egresos.Fecha_Egreso) <= fecha_fin))
+            else:
+                # Ajustar la fecha de inicio para considerar solo el día, sin hora
+                query = query.filter(func.date(Egresos.Fecha_Egreso) == fecha_inicio)
+
+            datos = [(e.ID_Egreso, e.Tipo_Egreso, e.Monto_Egreso, e.Fecha_Egreso) for e in query.all()]
+
+        else:
+            ingresos = obtener_ingresos_reportes(db=db, FechaInicio=fecha_inicio, FechaFin=fecha_fin)
+
+            datos = []
+            for e in ingresos:
+                if e.tipo_ingreso == "Venta":
+                    datos.append((e.ID_Ingreso, e.tipo_ingreso, e.monto_efectivo, e.monto_transaccion, e.fecha_venta))
+                else:
+                    if e.metodo_pago == "Efectivo":
+                        efectivo = str(e.monto)
+                        tranferencia = "0.0"
+                    else:
+                        tranferencia = str(e.monto)
+                        efectivo = "0.0"
+                    datos.append((e.ID_Ingreso, e.tipo_ingreso, efectivo, tranferencia, e.fecha_abono))
+    finally:
+        db.close()
+    from ..utils.Ingresos_egresos_reporte import construir_pdf_transacciones
+
+    return construir_pdf_transacciones(ruta, datos, tipo, fecha_inicio, fecha_fin, informar)
+
+
+def reporte_mas_vendidos(ruta, informar):
+    informar(0, "Consultando productos")
+    db = SessionLocal()
+    try:
+        productos = obtener_productos_mas_vendidos(db=db, limite=30)
+    finally:
+        db.close()
+    from ..utils.Estructura_Reporte import construir_pdf_productos_mas_vendidos
+
+    return construir_pdf_productos_mas_vendidos(ruta, productos, informar)
@@ -1,9 +1,26 @@
 from PyQt5.QtCore import QTimer, QDate
 from PyQt5.QtWidgets import QWidget, QFileDialog, QMessageBox, QInputDialog
 from ..ui import Ui_Respaldo
-import shutil
+from ..database.respaldo import (
+    crear_respaldo,
+    descomprimir_respaldo,
+    fusionar_respaldo,
+    rotar_respaldos,
+    verificar_respaldo,
+    EXTENSION_CHECKSUM,
+)
+from ..database.database import SessionLocal
+from ..controllers.ventas_diarias_crud import reconstruir_ventas_diarias
+from ..controllers.detalle_factura_crud import completar_costos_detalles
+from ..controllers.movimientos_inventario_crud import (
+    conciliar_inventario,
+    registrar_saldos_inventario,
+)
+from ..controllers.producto_crud import catalogo
+from ..utils.ticket import cache_tickets
+from ..utils.trabajos_reportes import ColaReportes
 import os
-import sqlite3
+import tempfile
 from datetime import datetime
 from pathlib import Path
 
@@ -20,6 +37,10 @@ class Respaldo_View(QWidget, Ui_Respaldo):
         )
         self.intentos_respaldo = 0  # Contador de intentos de respaldo en el día
         self.ultima_fecha_respaldo = None  # Última fecha de respaldo registrado
+        self.respaldo_en_curso = False
+
+        # Los respaldos se generan en segundo plano, de a uno
+        self.cola_respaldos = ColaReportes(self)
 
         self.BtnRespaldoExportar.clicked.connect(self.exportar_base_datos)
         self.BtnRespaldoImportar.clicked.connect(self.importar_base_datos)
@@ -61,17 +82,13 @@ class Respaldo_View(QWidget, Ui_Respaldo):
             )
 
             if ruta_exportar:
-                try:
-                    # Aquí se incluiría la lógica para exportar una tabla específica
-                    # Por simplicidad, copiaremos toda la base de datos como ejemplo
-                    shutil.copy(DATABASE_PATH, ruta_exportar)
-                    QMessageBox.information(
-                        self, "Éxito", f"Tabla '{tabla}' exportada correctamente."
-                    )
-                except Exception as e:
-                    QMessageBox.critical(
-                        self, "Error", f"Error al exportar la tabla:{str(e)}"
-                    )
+                # Aquí se incluiría la lógica para exportar una tabla específica
+                # Por simplicidad, se respalda toda la base de datos como ejemplo
+                self.exportar_respaldo(
+                    ruta_exportar,
+                    f"Tabla '{tabla}' exportada correctamente.",
+                    "Error al exportar la tabla:",
+                )
 
         elif opcion == "Exportar toda la base de datos":
             fecha_actual = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -84,20 +101,29 @@ class Respaldo_View(QWidget, Ui_Respaldo):
             )
 
             if ruta_exportar:
-                try:
-                    shutil.copy(DATABASE_PATH, ruta_exportar)
-                    QMessageBox.information(
-                        self, "Éxito", "Base de datos exportada correctamente."
-                    )
-                except Exception as e:
-                    QMessageBox.critical(
-                        self, "Error", f"Error al exportar la base de datos:{str(e)}"
-                    )
+                self.exportar_respaldo(
+                    ruta_exportar,
+                    "Base de datos exportada correctamente.",
+                    "Error al exportar la base de datos:",
+                )
+
+    def exportar_respaldo(self, ruta_exportar, mensaje_exito, mensaje_error):
+        """
+        Genera el respaldo en segundo plano con la API de respaldo de SQLite,
+        seguro aunque haya ventas escribiendo en la base.
+        """
+        trabajo = self.cola_respaldos.encolar("Exportar base de datos", crear_respaldo, ruta_exportar)
+        trabajo.senales.terminado.connect(
+            lambda _: QMessageBox.information(self, "Éxito", mensaje_exito)
+        )
+        trabajo.senales.fallido.connect(
+            lambda error: QMessageBox.critical(self, "Error", f"{mensaje_error}{error}")
+        )
 
 
     def importar_base_datos(self):
         ruta_importar, _ = QFileDialog.getOpenFileName(
-            self, "Importar Base de Datos", "", "Archivos de Base de Datos (*.db)"
+            self, "Importar Base de Datos", "", "Archivos de Base de Datos (*.db *.db.gz)"
         )
         if not ruta_importar:
             return
@@ -116,6 +142,12 @@ class Respaldo_View(QWidget, Ui_Respaldo):
         if respuesta != QMessageBox.Yes:
             return
 
+        if os.path.exists(ruta_importar + EXTENSION_CHECKSUM) and not verificar_respaldo(ruta_importar):
+            QMessageBox.critical(
+                self, "Error", "El respaldo está dañado: su checksum no coincide."
+            )
+            return
+
         self.importar_y_migrar_datos(ruta_importar)
 
     def respaldo_automatico(self):
@@ -140,91 +172,108 @@ class Respaldo_View(QWidget, Ui_Respaldo):
             print("Se alcanzó el límite de intentos de respaldo para hoy.")
             return
 
-        # Intentar realizar respaldo (máximo 2 veces por día)
-        for _ in range(2):  # Solo permite ejecutar una iteración
-            # Verificar si ya hay un archivo de respaldo con la fecha actual
-            nombre_respaldo_hoy = f"Backup_{fecha_actual}.db"
-            ruta_respaldo_hoy = os.path.join(
-                self.ruta_carpeta_respaldos, nombre_respaldo_hoy
-            )
-            if os.path.exists(ruta_respaldo_hoy):
-                print(f"Ya existe un respaldo para hoy en: {ruta_respaldo_hoy}")
+        if self.respaldo_en_curso:
+            return
+
+        # Verificar si ya hay un archivo de respaldo con la fecha actual
+        nombre_respaldo_hoy = f"Backup_{fecha_actual}.db"
+        ruta_respaldo_hoy = os.path.join(
+            self.ruta_carpeta_respaldos, nombre_respaldo_hoy
+        )
+        for ruta in (ruta_respaldo_hoy, ruta_respaldo_hoy + ".gz"):
+            if os.path.exists(ruta):
+                print(f"Ya existe un respaldo para hoy en: {ruta}")
                 self.ultima_fecha_respaldo = (
                     fecha_actual  # Actualizar para evitar bucles
                 )
                 return
 
-            # Crear carpeta de respaldos si no existe
-            os.makedirs(self.ruta_carpeta_respaldos, exist_ok=True)
-
-            # Crear respaldo
-            try:
-                shutil.copy(DATABASE_PATH, ruta_respaldo_hoy)
-                print(f"Respaldo automático creado: {ruta_respaldo_hoy}")
-                self.ultima_fecha_respaldo = fecha_actual
-                self.intentos_respaldo += 1  # Incrementar contador de intentos
-                return  # Salir después de un respaldo exitoso
-            
-            except Exception as e:
-                print(f"Error al crear el respaldo automático: {str(e)}")
-                self.intentos_respaldo += 1  # Incrementar contador en caso de error
+        # Crear respaldo comprimido en segundo plano y rotar los antiguos
+        self.respaldo_en_curso = True
+        self.intentos_respaldo += 1  # Incrementar contador de intentos
+        trabajo = self.cola_respaldos.encolar(
+            "Respaldo automático", respaldo_diario, ruta_respaldo_hoy, self.ruta_carpeta_respaldos
+        )
+        trabajo.senales.terminado.connect(
+            lambda resultado: self.respaldo_automatico_terminado(resultado, fecha_actual)
+        )
+        trabajo.senales.fallido.connect(self.respaldo_automatico_fallido)
+
+    def respaldo_automatico_terminado(self, resultado, fecha_actual):
+        print(f"Respaldo automático creado: {resultado['ruta']}")
+        self.ultima_fecha_respaldo = fecha_actual
+        self.respaldo_en_curso = False
+
+    def respaldo_automatico_fallido(self, error):
+        print(f"Error al crear el respaldo automático: {error}")
+        self.respaldo_en_curso = False
 
     def importar_y_migrar_datos(self, ruta_importar):
-        # Crear conexión a la base actual (estructura nueva)
-        nueva_conn = sqlite3.connect(DATABASE_PATH)
-        nueva_cursor = nueva_conn.cursor()
-
-        # Crear conexión a la base antigua (archivo a importar)
-        antigua_conn = sqlite3.connect(ruta_importar)
-        antigua_cursor = antigua_conn.cursor()
-
-        try:
-            # Obtener nombres de tablas en la base antigua
-            antigua_cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tablas = [fila[0] for fila in antigua_cursor.fetchall()]
-
-            for tabla in tablas:
-                if tabla == "sqlite_sequence":
-                    continue  # Saltar tabla interna
-
-                # Leer todas las filas de la tabla antigua
-                antigua_cursor.execute(f"SELECT * FROM {tabla}")
-                filas = antigua_cursor.fetchall()
-
-                # Obtener columnas comunes entre vieja y nueva base
-                antigua_cursor.execute(f"PRAGMA table_info({tabla})")
-                columnas_antiguas = [col[1] for col in antigua_cursor.fetchall()]
-
-                nueva_cursor.execute(f"PRAGMA table_info({tabla})")
-                columnas_nuevas = [col[1] for col in nueva_cursor.fetchall()]
-
-                columnas_comunes = [col for col in columnas_antiguas if col in columnas_nuevas]
-                if not columnas_comunes:
-                    continue  # No hay columnas en común, saltar tabla
-
-                columnas_str = ", ".join(columnas_comunes)
-                placeholders = ", ".join("?" for _ in columnas_comunes)
-
-                # Insertar cada fila en la tabla nueva
-                for fila in filas:
-                    # Usar solo los datos de las columnas comunes
-                    datos = [
-                        fila[columnas_antiguas.index(col)] for col in columnas_comunes
-                    ]
-                    nueva_cursor.execute(
-                        f"INSERT OR REPLACE INTO {tabla} ({columnas_str}) VALUES ({placeholders})",
-                        datos
-                    )
-
-            nueva_conn.commit()
-            QMessageBox.information(
-                self, "Éxito", "Datos migrados correctamente desde el respaldo."
+        """
+        Importa el respaldo en segundo plano con fusionar_respaldo y al
+        terminar muestra cuántas filas se copiaron y los conflictos.
+        """
+        trabajo = self.cola_respaldos.encolar("Importar respaldo", importar_respaldo, ruta_importar)
+        trabajo.senales.terminado.connect(self.importacion_terminada)
+        trabajo.senales.fallido.connect(
+            lambda error: QMessageBox.critical(
+                self, "Error", f"Ocurrió un error durante la migración:\n{error}"
             )
-        except Exception as e:
-            QMessageBox.critical(
-                self, "Error", f"Ocurrió un error durante la migración:\n{str(e)}"
+        )
+
+    def importacion_terminada(self, resultado):
+        # Los datos cambiaron sin pasar por el ORM: catálogo, índice de
+        # autocompletado y tickets se vuelven a cargar
+        catalogo.recargar()
+        cache_tickets.invalidar()
+
+        tablas = resultado["tablas"]
+        mensaje = (
+            f"Filas importadas: {sum(t['filas'] for t in tablas.values())}\n"
+            f"Filas existentes actualizadas: {sum(t['existentes'] for t in tablas.values())}"
+        )
+        omitidas = {nombre: t["omitidas"] for nombre, t in tablas.items() if t["omitidas"]}
+        if omitidas:
+            mensaje += "\n\nFilas omitidas por datos repetidos:\n" + "\n".join(
+                f"{nombre}: {cantidad}" for nombre, cantidad in omitidas.items()
             )
-            print(e)
-        finally:
-            nueva_conn.close()
-            antigua_conn.close()
\ No newline at end of file
+        violaciones = resultado["violaciones_fk"]
+        if violaciones:
+            mensaje += f"\n\nRegistros sin su registro relacionado: {len(violaciones)}"
+
+        if omitidas or violaciones:
+            QMessageBox.warning(self, "Importación con conflictos", mensaje)
+        else:
+            QMessageBox.information(
+                self, "Éxito", f"Datos migrados correctamente desde el respaldo.\n\n{mensaje}"
+            )
+
+
+def importar_respaldo(ruta, informar):
+    """Copia el respaldo (descomprimido si es .gz) y recalcula los datos derivados."""
+    informar(0, "Abriendo respaldo")
+    with tempfile.TemporaryDirectory() as carpeta_temporal:
+        if ruta.endswith(".gz"):
+            ruta = descomprimir_respaldo(ruta, os.path.join(carpeta_temporal, "respaldo.db"))
+        resultado = fusionar_respaldo(ruta, DATABASE_PATH, informar=informar)
+
+    informar(96, "Recalculando ventas diarias")
+    db = SessionLocal()
+    try:
+        completar_costos_detalles(db)
+        reconstruir_ventas_diarias(db)
+        # El stock del respaldo entra al kardex como importación
+        registrar_saldos_inventario(db, reconstruir=True)
+        conciliar_inventario(db, "Importacion")
+        registrar_saldos_inventario(db)
+        db.commit()
+    finally:
+        db.close()
+    return resultado
+
+
+def respaldo_diario(ruta_respaldo, carpeta, informar):
+    """Respaldo automático: copia comprimida y rotación de los antiguos."""
+    resultado = crear_respaldo(ruta_respaldo, comprimir=True, informar=informar)
+    rotar_respaldos(carpeta)
+    return resultado
@@ -13,25 +13,25 @@ from PyQt5.QtCore import Qt
 
 # Relative imports
 from ..database.database import SessionLocal
+from ..database.dinero import montos_iguales, redondear_monto
 from ..controllers.producto_crud import *
 from ..controllers.detalle_factura_crud import *
 from ..controllers.facturas_crud import *
+from ..controllers.checkout_crud import registrar_venta, modificar_venta
 from ..controllers.metodo_pago_crud import *
 from ..controllers.ingresos_crud import *
 from ..controllers.tipo_ingreso_crud import *
 from ..controllers.historial_modificacion_crud import *
 from ..ui import Ui_VentasB
 from ..utils.restructura_ticket import generate_ticket
-from ..utils.autocomplementado import configurar_autocompletado
+from ..utils.autocomplementado import configurar_autocompletado, configurar_autocompletado_productos
 from ..utils.buscarCajaAbierta import buscar_cajas_abierta
+from ..utils.ticket import armar_ticket, imprimir_ticket
 from ..controllers.clientes_crud import *
 
 # Standard library imports
 import os
 import locale
-import win32print
-import win32ui
-import win32con
 import datetime  # Asegúrate de importar el módulo 'time'
 
 
@@ -76,7 +76,7 @@ class VentasB_View(QWidget, Ui_VentasB):
         self.InputCedula.returnPressed.connect(self.completar_campos)
         # self.InputDescuentoB.textChanged.connect(self.aplicar_descuento)
         self.MetodoPagoBox.currentIndexChanged.connect(self.configuracion_pago)
-        configurar_autocompletado(self.InputNombre, obtener_productos, "Nombre", self.db, self.procesar_codigo)
+        configurar_autocompletado_productos(self.InputNombre, self.db, self.procesar_codigo)
         #configurar_autocompletado(self.InputNombreCli, obtener_cliente_nombre_apellido, "NombreCompleto", self.db, self.insertar_cliente)
         
         #placeholder
@@ -114,7 +114,6 @@ class VentasB_View(QWidget, Ui_VentasB):
         self.limpiar_campos()
         self.InputDomicilio.clear()
         self.limpiar_datos_cliente()
-        configurar_autocompletado(self.InputNombre, obtener_productos, "Nombre", self.db, self.procesar_codigo)
         #configurar_autocompletado(self.InputNombreCli, obtener_cliente_nombre_apellido, "NombreCompleto", self.db, self.insertar_cliente)
 
     def cargar_información(self, factura_completa):
@@ -235,7 +234,7 @@ class VentasB_View(QWidget, Ui_VentasB):
             payment_method = self.MetodoPagoBox.currentText().strip()
             # descuento = float(self.InputDescuentoB.text().strip())  if self.InputDescuentoB.text() else 0.0
             subtotal = self.LabelSubtotal.text()
-            subtotal = float(subtotal.replace(",", ""))
+            subtotal = redondear_monto(subtotal)
             
 
             # Validaciones
@@ -266,7 +265,7 @@ class VentasB_View(QWidget, Ui_VentasB):
                 self.InputPago.setFocus()
                 return
             if payment_method == "Efectivo" or payment_method == "Transferencia":
-                if float(monto_pago) != subtotal:
+                if not montos_iguales(monto_pago, subtotal):
                     QMessageBox.warning(self, "Error", "El monto pagado no puede ser diferente al subtotal.")
                     return 
             elif payment_method == "Mixto":
@@ -282,7 +281,7 @@ class VentasB_View(QWidget, Ui_VentasB):
                     QMessageBox.warning(self, "Error", "Ingrese el monto efectivo y el monto transferencia separados por un barra (/).")
                     return
                 
-                if total != subtotal:
+                if not montos_iguales(total, subtotal):
                     QMessageBox.warning(self, "Error", "El monto pagado no puede ser diferente al subtotal.")
                     return
 
@@ -330,177 +329,28 @@ class VentasB_View(QWidget, Ui_VentasB):
 
             if self.invoice_number and self.invoice_number != "":
                 self.actualizar_factura(db, self.invoice_number, payment_method, produc_datos, monto_pago, delivery_fee, self.usuario_actual_id)
+                id_factura = self.invoice_number
                 mensaje = "Factura actualizada exitosamente."
             else:
-                for codigo, quantity, _ in produc_datos:
-                    producto = obtener_producto_por_id(db, codigo)
-                    producto = producto[0]
-                    stock_actual = producto.Stock_actual - quantity
-                    actualizar_producto(db, id_producto=int(codigo), stock_actual=stock_actual)
-
                 id_factura = self.guardar_factura(db, client_id, payment_method, produc_datos, monto_pago, 0.0, self.usuario_actual_id, domicilio)
                 self.invoice_number = f"0000{id_factura}"
                 mensaje = "Factura generada exitosamente."
 
-            # Generar el contenido del ticket
-            # Configuración inicial
-            max_lines_per_page = 30  # Límite de líneas por página
-            current_line = 0  # Contador de líneas
-            empresa_nombre = "EM Collection"
-            empresa_direccion = "Pasto, Colombia"
-            empresa_telefono = "+57 312-768-91-51"
-            empresa_local = "Cra 31B No. 19A-34"
-
-            # Obtener la fecha actual
-            fecha_actual = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-
-            # Formatear valores monetarios
-            subtotal_formateado = f"${subtotal:,.2f}"
-            total_formateado = f"${total:,.2f}"
-
-            # Formatear el costo de envío
-            delivery_fee = float(delivery_fee)
-            if delivery_fee.is_integer():
-                delivery_fee_formateado = f"${int(delivery_fee):,.0f}"
-            else:
-                delivery_fee_formateado = f"${delivery_fee:,.2f}"
-
-            # Limitar la dirección del cliente a 35 caracteres por línea
-            direccion = client_address
-            direccion_linea1 = direccion[:35]
-            direccion_linea2 = direccion[35:] if len(direccion) > 35 else ""
-            # Obtener la impresora predeterminada
-            impresora = win32print.GetDefaultPrinter()
-            hDC = win32ui.CreateDC()
-            hDC.CreatePrinterDC(impresora)
-
-            # Crear un documento de impresión
-            hDC.StartDoc("Ticket de Venta")
-            hDC.StartPage()
-            # Generar el contenido del ticket
-            ticket_content = f"""
-            Ticket No. {self.invoice_number}
-            Cliente: {client_name}
-            Cédula: {client_id}
-            Teléfono: {client_phone}
-            Dirección: {direccion_linea1}
-            {direccion_linea2}
-            -----------------------------------------------------------------------------------------------------
-            Productos:
-            """
-
-           
-
-            # Fuente grande SOLO para encabezado
-            font_encabezado = win32ui.CreateFont({
-                "name": "Lucida Console",
-                "height": 28,  # Más grande
-                "weight": win32con.FW_BOLD
-            })
-
-            
-            # Configurar la fuente
-            font_size = 18
-            line_height = font_size + 10
-            font = win32ui.CreateFont({
-                "name": "Lucida Console",
-                "height": font_size,
-                "weight": win32con.FW_BOLD
-            })
-            #hDC.SelectObject(font)
-            # Seleccionar la fuente grande
-            hDC.SelectObject(font_encabezado)
-
-            # Obtener el tamaño del papel para centrar el texto
-            printer_width = hDC.GetDeviceCaps(win32con.HORZRES)
-            center_x = printer_width // 2  # Punto central
-            # Mostrar información útil
-            print(f"🖨️ Impresora predeterminada: {impresora}")
-            print(f"📄 Tamaño del papel: {printer_width}  píxeles")
-            
-            
-            # Ajuste de coordenadas iniciales para el contenido del ticket
-            x, y = 2, 2 + 5 * line_height  # Espacio después de la información de la empresa, la línea y la fecha
-            # Imprimir la información del cliente
-
-            # Calcular y centrar texto con precisión
-            for i, linea in enumerate([empresa_nombre, empresa_local, empresa_direccion, empresa_telefono, fecha_actual]):
-                text_size = hDC.GetTextExtent(linea)  # (ancho, alto)
-                text_width = text_size[0]
-                hDC.TextOut(center_x - (text_width // 2), 10 + (i * line_height), linea)
-            y += line_height
-            hDC.SelectObject(font)
-            
-            # Línea separadora
-            hDC.TextOut(x, y, "-----------------------------------------------------------------------------------------------------------------")  # Imprime la línea separadora
-            
-            y += line_height
-            hDC.TextOut(x, y, f"COT No. {self.invoice_number}")# Aquí se agrega el número de factura
-            y += line_height
-            hDC.TextOut(x, y, f"Cliente: {client_name}")
-            y += line_height
-            hDC.TextOut(x, y, f"Cédula: {client_id}")
-            y += line_height
-            hDC.TextOut(x, y, f"Teléfono: {client_phone}")
-            y += line_height
-            hDC.TextOut(x, y, f"Dirección: {direccion_linea1}")
-            y += line_height
-            if direccion_linea2:  # Si hay una segunda línea de dirección, imprimirla
-                hDC.TextOut(x, y, direccion_linea2)
-                y += line_height
-
-            # 🔹 Imprimir "Productos:" y la línea separadora
-            
-            hDC.TextOut(x, y, "-----------------------------------------------------------------------------------------------------------------")  # Imprime la línea separadora
-            y += line_height  # Mueve la posición para empezar a imprimir los productos
-            
-            # Encabezado de tabla productos
-            header = "{:<18} {:>6} {:>10} {:>10}".format("Producto", "Cant.", "P.Reventa", "Total")
-            hDC.TextOut(x, y, header)
-            y += line_height
-
-           # Productos
-                        # Productos
-            for item in items:
-                # Limitar y alinear nombre del producto
-                nombre_producto = item[0].strip().replace('\n', ' ')[:18].ljust(18)
-
-                cantidad = str(item[1])
-                precio_unitario = f"{item[2]:,.0f}".replace(",", ".")
-                total_producto = f"{item[3]:,.0f}".replace(",", ".")
-
-                # Formatear la línea con alineación fija
-                linea = "{:<18} {:>6} {:>10} {:>10}".format(
-                    nombre_producto, cantidad, precio_unitario, total_producto
-                )
-                hDC.TextOut(x, y, linea)
-                y += line_height
-                current_line += 1
-                # Si se alcanza el límite de líneas, crear una nueva página
-                if current_line >= max_lines_per_page:
-                    hDC.EndPage()  # Finalizar la página actual
-                    hDC.StartPage()  # Iniciar una nueva página
-                    y = 2  # Reiniciar la posición Y
-                    current_line = 0  # Reiniciar el contador de líneas
-
-            # Imprimir los totales y el mensaje final
-            totales = f"""
-            -----------------------------------------------------------------------------------------------------
-            Subtotal: {subtotal_formateado}
-            Envío: {delivery_fee_formateado}
-            Total: {total_formateado}
-            Método de Pago: {payment_method}
-            -----------------------------------------------------------------------------------------------------
-            ¡Gracias por tu compra!
-            """
-            for line in totales.split("\n"):
-                hDC.TextOut(x, y, line.strip())
-                y += line_height
-
-            # Finalizar la impresión
-            hDC.EndPage()
-            hDC.EndDoc()
-            hDC.DeleteDC()
+            # Armar el ticket y enviarlo a la cola de impresión
+            documento = armar_ticket(
+                self.invoice_number,
+                {
+                    "nombre": client_name,
+                    "cedula": client_id,
+                    "telefono": client_phone,
+                    "direccion": client_address,
+                },
+                items,
+                metodo_pago=payment_method,
+                domicilio=delivery_fee,
+                columna_precio="P.Reventa",
+            )
+            imprimir_ticket(id_factura, documento)
 
             # Cerrar la base de datos y mostrar mensaje de éxito
             db.close()
@@ -516,64 +366,8 @@ class VentasB_View(QWidget, Ui_VentasB):
         self.invoice_number = None
 
     def actualizar_factura(self, db, id_factura, payment_method, produc_datos, monto_pago, delivery_fee, usuario_actual_id):
-        # Obtener los detalles actuales de la factura
-        detalles_actuales = db.query(DetalleFacturas).filter(DetalleFacturas.ID_Factura == id_factura).all()
-
-        # Convertir los detalles actuales en un diccionario para comparar
-        productos_actuales = {detalle.ID_Producto: detalle.Cantidad for detalle in detalles_actuales}
-
-        # Productos enviados desde la interfaz (nuevos o editados)
-        productos_nuevos = {int(codigo): cantidad for codigo, cantidad, _ in produc_datos}
-
-        # Productos eliminados (presentes en la factura actual, pero no en la nueva lista)
-        productos_eliminados = set(productos_actuales.keys()) - set(productos_nuevos.keys())
-
-        # Restaurar stock de productos eliminados
-        for id_producto in productos_eliminados:
-            cantidad_vendida = productos_actuales[id_producto]
-            producto = db.query(Productos).filter(Productos.ID_Producto == id_producto).first()
-            producto.Stock_actual += cantidad_vendida  # Restaurar el stock
-            db.delete(db.query(DetalleFacturas).filter(
-                DetalleFacturas.ID_Factura == id_factura,
-                DetalleFacturas.ID_Producto == id_producto
-            ).first())  # Eliminar el detalle de la factura
-
-        # Actualizar cantidades de productos existentes y agregar nuevos
-        for id_producto, nueva_cantidad in productos_nuevos.items():
-            if id_producto in productos_actuales:
-                # Producto ya existe, verificar cambios en la cantidad
-                detalle = db.query(DetalleFacturas).filter(
-                    DetalleFacturas.ID_Factura == id_factura,
-                    DetalleFacturas.ID_Producto == id_producto
-                ).first()
-
-                diferencia_cantidad = nueva_cantidad - productos_actuales[id_producto]
-                detalle.Cantidad = nueva_cantidad
-                detalle.Subtotal = nueva_cantidad * detalle.Precio_unitario
-
-                # Ajustar el stock del producto
-                producto = db.query(Productos).filter(Productos.ID_Producto == id_producto).first()
-                producto.Stock_actual -= diferencia_cantidad
-            else:
-                # Producto nuevo, agregarlo a la factura y ajustar el stock
-                precio_unitario = db.query(Productos).filter(Productos.ID_Producto == id_producto).first().Precio_venta_normal
-                subtotal = nueva_cantidad * precio_unitario
-
-                nuevo_detalle = DetalleFacturas(
-                    ID_Factura=id_factura,
-                    ID_Producto=id_producto,
-                    Cantidad=nueva_cantidad,
-                    Precio_unitario=precio_unitario,
-                    Subtotal=subtotal,
-                )
-                db.add(nuevo_detalle)
-
-                # Ajustar el stock
-                producto = db.query(Productos).filter(Productos.ID_Producto == id_producto).first()
-                producto.Stock_actual -= nueva_cantidad
-                
         id_metodo_pago = obtener_metodo_pago_por_nombre(db, payment_method)
-                
+
         if '/' in monto_pago:
             total = monto_pago.split("/") 
             efectivo = float(total[0])
@@ -581,19 +375,18 @@ class VentasB_View(QWidget, Ui_VentasB):
         else:
             efectivo = float(monto_pago)
             tranferencia = float(monto_pago)
-    
-        # Actualizar información general de la factura
-        factura = db.query(Facturas).filter(Facturas.ID_Factura == id_factura).first()
-        factura.Monto_TRANSACCION = tranferencia if payment_method == "Transferencia" or payment_method == "Mixto" else 0.0
-        factura.Monto_efectivo = efectivo if payment_method == "Efectivo" or payment_method == "Mixto" else 0.0
-        factura.ID_Metodo_Pago = id_metodo_pago.ID_Metodo_Pago
-        factura.ID_Usuario = usuario_actual_id
-
-        crear_historial_modificacion(db=db,id_usuario=usuario_actual_id, descripcion="Factura actualizada", id_factura=id_factura)
 
-        # Confirmar los cambios
-        db.commit()
-    
+        # Detalle, stock e historial se aplican en una sola transacción
+        modificar_venta(
+            db,
+            int(id_factura),
+            produc_datos,
+            usuario_actual_id,
+            id_metodo_pago=id_metodo_pago.ID_Metodo_Pago,
+            monto_efectivo=efectivo if payment_method == "Efectivo" or payment_method == "Mixto" else 0.0,
+            monto_transaccion=tranferencia if payment_method == "Transferencia" or payment_method == "Mixto" else 0.0,
+        )
+     
     def verificar_cliente(self, cedula, nombre_completo , direccion, telefono): 
 
         # Crear una sesión de base de datos 
@@ -652,45 +445,21 @@ class VentasB_View(QWidget, Ui_VentasB):
                 efectivo = float(monto_pago)
                 tranferencia = float(monto_pago)
             
-            # Crear registro en la tabla 'facturas'
-            factura = crear_factura(
+            # Registrar factura, detalles, stock e ingreso en una sola transacción
+            id_factura = registrar_venta(
                 db=db,
+                items=items,
+                id_cliente=client_id,
+                id_usuario=id_usuario,
+                id_metodo_pago=id_metodo_pago.ID_Metodo_Pago,
+                id_tipo_factura=2,
                 monto_efectivo= efectivo if payment_method != "Transferencia" else 0.0,
                 monto_transaccion= tranferencia if payment_method != "Efectivo" else 0.0,
                 descuento=descuento,
                 estado=estado,
-                id_metodo_pago=id_metodo_pago.ID_Metodo_Pago,
-                id_tipo_factura=2,
-                id_cliente=client_id,
-                id_usuario=id_usuario,
                 domicilio=domicilio,
+                registrar_ingreso=self.valor_domicilio == 0.0,
             )
-            
-            # Obtener el ID de la factura recién creada
-            id_factura = factura.ID_Factura
-
-            # Crear registros en la tabla 'detalle_factura' para cada producto
-            for item in items:
-                codigo, quantity, value = item
-                
-                total = quantity * value
-
-                # Crear detalle de factura
-                crear_detalle_factura(
-                    db=db,
-                    cantidad=quantity,
-                    precio_unitario=value,
-                    subtotal=total,
-                    id_producto=codigo,
-                    id_factura=id_factura
-                )
-
-            # Confirmar cambios en la base de datos
-            db.commit()
-            if self.valor_domicilio == 0.0:
-                tipo_ingreso = crear_tipo_ingreso(db=db, tipo_ingreso="Venta", id_factura=id_factura)
-                crear_ingreso(db=db, id_tipo_ingreso=tipo_ingreso.ID_Tipo_Ingreso)
-             
             return id_factura
 
         except Exception as e:
@@ -14,21 +14,20 @@ from ..controllers.producto_crud import *
 from ..controllers.detalle_factura_crud import *
 from ..controllers.clientes_crud import *
 from ..controllers.facturas_crud import *
+from ..controllers.checkout_crud import registrar_venta, modificar_venta
 from ..controllers.metodo_pago_crud import *
 from ..controllers.venta_credito_crud import *
 from ..controllers.pago_credito_crud import *
 from ..controllers.historial_modificacion_crud import *
 from ..ui import Ui_VentasCredito
-from ..utils.autocomplementado import configurar_autocompletado
+from ..utils.autocomplementado import configurar_autocompletado, configurar_autocompletado_productos
 from ..utils.restructura_ticket import *
+from ..utils.ticket import ENCABEZADO_CREDITO, armar_ticket, imprimir_ticket
 
 # Standard library imports
 import os
 from PyQt5.QtCore import Qt
 import locale
-import win32print
-import win32ui
-import win32con
 
 
 
@@ -78,9 +77,7 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
         self.InputDomicilio.textChanged.connect(self.actualizar_total)
         self.InputCedula.textChanged.connect(self.validar_campos)
         self.comboBoxPrecio.currentIndexChanged.connect(self.cambiar_precio)
-        configurar_autocompletado(
-            self.InputNombre, obtener_productos, "Nombre", self.db, self.procesar_codigo
-        )
+        configurar_autocompletado_productos(self.InputNombre, self.db, self.procesar_codigo)
         configurar_autocompletado(self.InputNombreCli, obtener_cliente_nombre_apellido, "NombreCompleto", self.db, self.insertar_cliente)
 
         # Conexiones de señales - Botones y tabla
@@ -177,118 +174,16 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
         deuda,
         limite_pago,
     ):
-        
-        venta_credito = obtener_ventaCredito_id(db, self.id_venta_credito)
-        venta = venta_credito[0]
-        
-        pagado = venta.Total_Deuda - venta.Saldo_Pendiente 
-        
-        # Obtener los detalles actuales de la factura
-        detalles_actuales = (
-            db.query(DetalleFacturas)
-            .filter(DetalleFacturas.ID_Factura == id_factura)
-            .all()
-        )
-
-        # Convertir los detalles actuales en un diccionario para comparar
-        productos_actuales = {
-            detalle.ID_Producto: detalle.Cantidad for detalle in detalles_actuales
-        }
-
-        # Productos enviados desde la interfaz (nuevos o editados)
-        productos_nuevos = {
-            int(codigo): cantidad for codigo, cantidad, _ in produc_datos
-        }
-
-        # Productos eliminados (presentes en la factura actual, pero no en la nueva lista)
-        productos_eliminados = set(productos_actuales.keys()) - set(
-            productos_nuevos.keys()
-        )
-
-        # Restaurar stock de productos eliminados
-        for id_producto in productos_eliminados:
-            cantidad_vendida = productos_actuales[id_producto]
-            producto = (
-                db.query(Productos).filter(Productos.ID_Producto == id_producto).first()
-            )
-            producto.Stock_actual += cantidad_vendida  # Restaurar el stock
-            db.delete(
-                db.query(DetalleFacturas)
-                .filter(
-                    DetalleFacturas.ID_Factura == id_factura,
-                    DetalleFacturas.ID_Producto == id_producto,
-                )
-                .first()
-            )  # Eliminar el detalle de la factura
-
-        # Actualizar cantidades de productos existentes y agregar nuevos
-        for id_producto, nueva_cantidad in productos_nuevos.items():
-            if id_producto in productos_actuales:
-                # Producto ya existe, verificar cambios en la cantidad
-                detalle = (
-                    db.query(DetalleFacturas)
-                    .filter(
-                        DetalleFacturas.ID_Factura == id_factura,
-                        DetalleFacturas.ID_Producto == id_producto,
-                    )
-                    .first()
-                )
-
-                diferencia_cantidad = nueva_cantidad - productos_actuales[id_producto]
-                detalle.Cantidad = nueva_cantidad
-                detalle.Subtotal = nueva_cantidad * detalle.Precio_unitario
-
-                # Ajustar el stock del producto
-                producto = (
-                    db.query(Productos)
-                    .filter(Productos.ID_Producto == id_producto)
-                    .first()
-                )
-                producto.Stock_actual -= diferencia_cantidad
-            else:
-                # Producto nuevo, agregarlo a la factura y ajustar el stock
-                precio_unitario = (
-                    db.query(Productos)
-                    .filter(Productos.ID_Producto == id_producto)
-                    .first()
-                    .Precio_venta_normal
-                )
-                subtotal = nueva_cantidad * precio_unitario
-
-                nuevo_detalle = DetalleFacturas(
-                    ID_Factura=id_factura,
-                    ID_Producto=id_producto,
-                    Cantidad=nueva_cantidad,
-                    Precio_unitario=precio_unitario,
-                    Subtotal=subtotal,
-                )
-                db.add(nuevo_detalle)
-
-                # Ajustar el stock
-                producto = (
-                    db.query(Productos)
-                    .filter(Productos.ID_Producto == id_producto)
-                    .first()
-                )
-                producto.Stock_actual -= nueva_cantidad
-        
-        saldo = deuda - pagado
-        actualizar_venta_credito(
-            db=db,
-            id_venta_credito=self.id_venta_credito,
+        # Detalle, stock, deuda e historial se aplican en una sola transacción;
+        # el saldo pendiente conserva lo ya abonado
+        modificar_venta(
+            db,
+            int(id_factura),
+            produc_datos,
+            usuario_actual_id,
             total_deuda=deuda,
-            saldo_pendiente=saldo,
             fecha_limite=limite_pago,
         )
-        
-        # Actualizar información general de la factura
-        factura = db.query(Facturas).filter(Facturas.ID_Factura == id_factura).first()
-        factura.ID_Usuario = usuario_actual_id
-
-        crear_historial_modificacion(db=db,id_usuario=usuario_actual_id, descripcion="Factura actualizada", id_factura=id_factura)
-
-        # Confirmar los cambios
-        db.commit()
 
         self.invoice_number = None
         self.id_venta_credito = None
@@ -299,9 +194,6 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
         self.limpiar_tabla()
         self.limpiar_campos()
         self.invoice_number = None
-        configurar_autocompletado(
-            self.InputNombre, obtener_productos, "Nombre", self.db, self.procesar_codigo
-        )
         configurar_autocompletado(self.InputNombreCli, obtener_cliente_nombre_apellido, "NombreCompleto", self.db, self.insertar_cliente)
 
     def calcular_fecha_futura(self, dias):
@@ -401,16 +293,9 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
                     subtotal,
                     limite_pago,
                 )
+                id_factura = self.invoice_number
                 mensaje = "Factura actualizada exitosamente."
             else:
-                for codigo, quantity, _ in produc_datos:
-                    producto = obtener_producto_por_id(db, codigo)
-                    producto = producto[0]
-                    stock_actual = producto.Stock_actual - quantity
-                    actualizar_producto(
-                        db, id_producto=int(codigo), stock_actual=stock_actual
-                    )
-
                 id_factura = self.guardar_factura(
                     db,
                     client_id,
@@ -426,158 +311,23 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
                 self.invoice_number = f"0000{id_factura}"
                 mensaje = "Factura generada exitosamente."
 
-            # Configuración inicial
-            max_lines_per_page = 30  # Límite de líneas por página
-            current_line = 0  # Contador de líneas
-            empresa_nombre = "LadyNailShop"
-            empresa_direccion = "Pasto, Colombia"
-            empresa_telefono = "+57 316-144-44-74"
-
-            # Obtener la fecha actual
-            fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")  # ✅ Correcto
-
-            # Formatear valores monetarios
-            subtotal_formateado = f"${subtotal:,.2f}"
-            total_formateado = f"${total:,.2f}"
-            
-
-            # Formatear el costo de envío
-            delivery_fee = float(delivery_fee)
-            if delivery_fee.is_integer():
-                delivery_fee_formateado = f"${int(delivery_fee):,.0f}"
-            else:
-                delivery_fee_formateado = f"${delivery_fee:,.2f}"
-
-            # Limitar la dirección del cliente a 25 caracteres por línea
-            direccion = client_address
-            direccion_linea1 = direccion[:35]
-            direccion_linea2 = direccion[35:] if len(direccion) > 35 else ""
-            
-            # Obtener la impresora predeterminada
-            impresora = win32print.GetDefaultPrinter()
-            hDC = win32ui.CreateDC()
-            hDC.CreatePrinterDC(impresora)
-
-            # Crear un documento de impresión
-            hDC.StartDoc("Ticket de Venta")
-            hDC.StartPage()
-            # Generar el contenido del ticket
-            ticket_content = f"""
-            Ticket No. {self.invoice_number}
-            Cliente: {client_name}
-            Cédula: {client_id}
-            Teléfono: {client_phone}
-            Dirección: {direccion_linea1}
-            {direccion_linea2}
-            -----------------------------------------------------------------------------------------------------
-            Productos:
-            """
-            # Fuente grande SOLO para encabezado
-            font_encabezado = win32ui.CreateFont({
-                "name": "Lucida Console",
-                "height": 28,  # Más grande
-                "weight": win32con.FW_BOLD
-            })
-
-            
-            # Configurar la fuente
-            font_size = 18
-            line_height = font_size + 10
-            font = win32ui.CreateFont({
-                "name": "Lucida Console",
-                "height": font_size,
-                "weight": win32con.FW_BOLD
-            })
-            # Seleccionar la fuente grande
-            hDC.SelectObject(font_encabezado)
-
-            # Obtener el tamaño del papel para centrar el texto
-            printer_width = hDC.GetDeviceCaps(win32con.HORZRES)
-            center_x = printer_width // 2  # Punto central
-
-            x, y = 2, 2 + 5 * line_height  # Espacio después de la información de la empresa, la línea y la fecha
-            
-            # Imprimir los datos de la empresa
-            # Calcular y centrar texto con precisión
-            for i, linea in enumerate([empresa_nombre, empresa_direccion, empresa_telefono, fecha_actual]):
-                text_size = hDC.GetTextExtent(linea)  # (ancho, alto)
-                text_width = text_size[0]
-                hDC.TextOut(center_x - (text_width // 2), 50 + (i * line_height), linea)
-            y += line_height
-            hDC.SelectObject(font)
-
-            # Línea separadora
-            hDC.TextOut(x, y, "-----------------------------------------------------------------------------------------------------------------")  # Imprime la línea separadora
-            
-            y += line_height
-            hDC.TextOut(x, y, "Crédito")  # Imprime el título "Productos:"
-            y += line_height
-            hDC.TextOut(x, y, f"COT No. {self.invoice_number}")# Aquí se agrega el número de factura
-            y += line_height
-            hDC.TextOut(x, y, f"Cliente: {client_name}")
-            y += line_height
-            hDC.TextOut(x, y, f"Cédula: {client_id}")
-            y += line_height
-            hDC.TextOut(x, y, f"Teléfono: {client_phone}")
-            y += line_height
-            hDC.TextOut(x, y, f"Dirección: {direccion_linea1}")
-            y += line_height
-            if direccion_linea2:  # Si hay una segunda línea de dirección, imprimirla
-                hDC.TextOut(x, y, direccion_linea2)
-                y += line_height
-
-            # 🔹 Imprimir "Productos:" y la línea separadora
-            
-            hDC.TextOut(x, y, "-----------------------------------------------------------------------------------------------------------------")  # Imprime la línea separadora
-            y += line_height  # Mueve la posición para empezar a imprimir los productos
-           # Encabezado de tabla productos
-            header = "{:<18} {:>6} {:>10} {:>10}".format("Producto", "Cant.", "Precio", "Total")
-            hDC.TextOut(x, y, header)
-            y += line_height
-
-           # Productos
-                        # Productos
-            for item in items:
-                # Limitar y alinear nombre del producto
-                nombre_producto = item[0].strip().replace('\n', ' ')[:18].ljust(18)
-
-                cantidad = str(item[1])
-                precio_unitario = f"{item[2]:,.0f}".replace(",", ".")
-                total_producto = f"{item[3]:,.0f}".replace(",", ".")
-
-                # Formatear la línea con alineación fija
-                linea = "{:<18} {:>6} {:>10} {:>10}".format(
-                    nombre_producto, cantidad, precio_unitario, total_producto
-                )
-                hDC.TextOut(x, y, linea)
-                y += line_height
-                current_line += 1
-
-                # Si se alcanza el límite de líneas, crear una nueva página
-                if current_line >= max_lines_per_page:
-                    hDC.EndPage()  # Finalizar la página actual
-                    hDC.StartPage()  # Iniciar una nueva página
-                    y = 2  # Reiniciar la posición Y
-                    current_line = 0  # Reiniciar el contador de líneas
-
-            # Imprimir los totales y el mensaje final
-            totales = f"""
-            -----------------------------------------------------------------------------------------------------
-            Deuda Total: {subtotal_formateado}
-            Envío: {delivery_fee_formateado}
-            Fecha Limite: {limite_pago}
-            -----------------------------------------------------------------------------------------------------
-
-            ¡Gracias por tu compra!
-            """
-            for line in totales.split("\n"):
-                hDC.TextOut(x, y, line.strip())
-                y += line_height
-
-            # Finalizar la impresión
-            hDC.EndPage()
-            hDC.EndDoc()
-            hDC.DeleteDC()
+            # Armar el ticket y enviarlo a la cola de impresión
+            documento = armar_ticket(
+                self.invoice_number,
+                {
+                    "nombre": client_name,
+                    "cedula": client_id,
+                    "telefono": client_phone,
+                    "direccion": client_address,
+                },
+                items,
+                domicilio=delivery_fee,
+                columna_precio="Precio",
+                encabezado=ENCABEZADO_CREDITO,
+                deuda=subtotal,
+                fecha_limite=limite_pago,
+            )
+            imprimir_ticket(id_factura, documento)
 
             # Cerrar la base de datos y mostrar mensaje de éxito
             db.close()
@@ -631,51 +381,24 @@ class VentasCredito_View(QWidget, Ui_VentasCredito):
                 efectivo = float(monto_pago)
                 tranferencia = float(monto_pago)
 
-            # Crear registro en la tabla 'facturas'
-            factura = crear_factura(
+            # Registrar factura, detalles, stock y venta a crédito en una sola transacción
+            id_factura = registrar_venta(
                 db=db,
+                items=items,
+                id_cliente=client_id,
+                id_usuario=id_usuario,
+                id_metodo_pago=id_metodo_pago.ID_Metodo_Pago,
+                id_tipo_factura=3,
                 monto_efectivo=efectivo if payment_method != "Transferencia" else 0.0,
                 monto_transaccion=tranferencia if payment_method != "Efectivo" else 0.0,
                 descuento=descuento,
                 estado=False,
-                id_metodo_pago=id_metodo_pago.ID_Metodo_Pago,
-                id_tipo_factura=3,
-                id_cliente=client_id,
-                id_usuario=id_usuario,
                 domicilio=domicilio,
-            )
-
-            # Obtener el ID de la factura recién creada
-            id_factura = factura.ID_Factura
-
-            # Crear registros en la tabla 'detalle_factura' para cada producto
-            for item in items:
-                codigo, quantity, precio_unitario = item
-
-                total = quantity * precio_unitario
-
-                # Crear detalle de factura
-                crear_detalle_factura(
-                    db=db,
-                    cantidad=quantity,
-                    precio_unitario=precio_unitario,
-                    subtotal=total,
-                    id_producto=codigo,
-                    id_factura=id_factura,
-                )
-
-            # Crear registro en la tabla ventasCredito
-            crear_venta_credito(
-                db=db,
+                registrar_ingreso=False,
                 total_deuda=deuda,
-                saldo_pendiente=deuda,
                 fecha_limite=limite_pago,
-                id_factura=id_factura,
             )
 
-            # Confirmar cambios en la base de datos
-            db.commit()
-
             return id_factura
 
         except Exception as e:
@@ -1,17 +1,36 @@
-from .Navbar import *
-from .CajaView import *
-from .CrediFacturaView import *
-from .ControlUsuarioView import *
-from .EgresoView import *
-from .FacturasView import *
-from .ProductosView import *
-from .RespaldoView import *
-from .ReportesView import *
-from .VentasCView import *
-from .VentasBView import *
-from .VentasAView import *
-from .VentasCreditoView import *
-from .LoginView import *
-from .PagoCreditoView import *
-from .ClientesView import *
-#from .CambioView import *
+import importlib
+
+# Las vistas se importan al pedirlas (from app.view import Caja_View), así
+# el arranque solo carga la pantalla de inicio de sesión.
+_VISTAS = {
+    "Navbar_View": ".Navbar",
+    "Caja_View": ".CajaView",
+    "CrediFactura_View": ".CrediFacturaView",
+    "ControlUsuario_View": ".ControlUsuarioView",
+    "Egreso_View": ".EgresoView",
+    "Facturas_View": ".FacturasView",
+    "Productos_View": ".ProductosView",
+    "Respaldo_View": ".RespaldoView",
+    "Reportes_View": ".ReportesView",
+    "VentasC_View": ".VentasCView",
+    "VentasB_View": ".VentasBView",
+    "VentasA_View": ".VentasAView",
+    "VentasCredito_View": ".VentasCreditoView",
+    "Login_View": ".LoginView",
+    "PagoCredito_View": ".PagoCreditoView",
+    "Cliente_View": ".ClientesView",
+    #"Cambio_View": ".CambioView",
+}
+
+
+def __getattr__(nombre):
+    modulo = _VISTAS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    clase = getattr(importlib.import_module(modulo, __name__), nombre)
+    globals()[nombre] = clase
+    return clase
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_VISTAS))
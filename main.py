@@ -9,9 +9,10 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QIcon, QScreen
 from PyQt5 import QtWidgets
 from init_db import conectar_base, inicializar_db
+from app.database.database import init_db
 from app.utils.enviar_notifi import enviar_notificacion
+from app.utils.cola_impresion import cola_impresion
 from app.controllers.usuario_crud import verificar_credenciales, obtener_usuario_por_id
-from app.ventanasView import MainApp
 from app.view import Login_View
 from dotenv import load_dotenv
 import os
@@ -33,6 +34,8 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("EM collection - Sistema de Gestión de Ventas y Stock")
         self.setWindowIcon(QIcon("assets/logo1.ico"))
         self.inicializar_db()
+        # Imprimir en segundo plano los tickets pendientes de la sesión anterior
+        cola_impresion.iniciar()
         self.resize(800, 600)
         
 
@@ -50,12 +53,10 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.stacked_widget)
 
         self.Login = Login_View()
-        self.MainApp = MainApp()
-
         self.stacked_widget.addWidget(self.Login)
-        self.stacked_widget.addWidget(self.MainApp)
 
-        self.MainApp.navbar.BtnCerrarSesion.clicked.connect(self.cerrar_sesion)
+        # La ventana principal se construye al primer inicio de sesión
+        self.MainApp = None
 
         self.Login.BtnLogin.clicked.connect(self.iniciar_sesion)
         self.Login.InputPassword.returnPressed.connect(self.iniciar_sesion)
@@ -83,6 +84,19 @@ class MainWindow(QMainWindow):
             progress.close()  # Cierra el mensaje cuando termine
         else:
             print("✅ La base de datos ya existe. Continuando con el programa...")
+            init_db()  # Aplica tablas e índices nuevos sobre la base existente
+
+    def crear_main_app(self):
+        """
+        Crea la ventana principal la primera vez que se necesita.
+        """
+        if self.MainApp is None:
+            from app.ventanasView import MainApp
+
+            self.MainApp = MainApp()
+            self.stacked_widget.addWidget(self.MainApp)
+            self.MainApp.navbar.BtnCerrarSesion.clicked.connect(self.cerrar_sesion)
+        return self.MainApp
 
     def cerrar_sesion(self):
         """
@@ -162,12 +176,7 @@ class MainWindow(QMainWindow):
 
         # Generar el token JWT
         self.usuario_actual_id = usuario_autenticado.ID_Usuario
-        self.MainApp.ventasA.usuario_actual_id = usuario_autenticado.ID_Usuario
-        self.MainApp.ventasB.usuario_actual_id = usuario_autenticado.ID_Usuario
-        self.MainApp.ventasC.usuario_actual_id = usuario_autenticado.ID_Usuario
-        #self.MainApp.ventasCredito.usuario_actual_id = usuario_autenticado.ID_Usuario
-        #self.MainApp.pagoCredito.usuario_actual_id = usuario_autenticado.ID_Usuario
-        self.MainApp.caja.usuario_actual_id = usuario_autenticado.ID_Usuario
+        self.crear_main_app().establecer_usuario(usuario_autenticado.ID_Usuario)
         token = self.generar_token(usuario_autenticado.ID_Usuario, rol)
 
         # Almacenar el token en el objeto MainWindow
@@ -201,7 +210,7 @@ class MainWindow(QMainWindow):
         """
         Configurar accesos según el rol del usuario autenticado.
         """
-        self.MainApp.stacked_widget.setCurrentIndex(0)
+        self.MainApp.mostrar_vista("caja")
         navbar = self.MainApp.navbar
 
         if rol == "ADMINISTRADOR":